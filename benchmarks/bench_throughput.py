@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure the throughput of replify and dereplify on synthetic corpora.
+
+Run with ``python benchmarks/bench_throughput.py``. Each corpus is
+replified, and the resulting transcript dereplified, and the best of
+several runs is reported in input lines per second, along with the peak
+memory allocated by python (measured with tracemalloc, in a separate
+run, on python 3.4+). ``--scale`` multiplies the size of every corpus.
+
+``--save`` stores the results as a baseline in ``--baseline`` (by default
+``benchmarks/baseline.json``, which is specific to the machine it was
+made on and not kept in the repository). When a baseline exists, every
+measurement is compared with it, and the script exits with status 1 if
+any is worse by more than ``--threshold`` (by default 20%).
+"""
+from __future__ import print_function
+
+import os
+import sys
+import json
+import timeit
+import argparse
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from replify.replify import replify  # noqa
+from replify.dereplify import dereplify  # noqa
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def short_statements(n):
+    """Many one-line assignments and expressions."""
+    return ''.join('x{0} = {0}\nx{0} + 1\n'.format(i) for i in range(n))
+
+
+def long_def(n):
+    """A function with a very long body, and a call to it."""
+    body = ''.join('    a{0} = {0}\n'.format(i) for i in range(n * 2))
+    return 'def f():\n' + body + '    return a0\n\nf()\n'
+
+
+def long_class(n):
+    """A class with many methods."""
+    # no empty lines in the body, which would end the class statement
+    methods = ''.join(
+        '    def m{0}(self):\n        return {0}\n'.format(i)
+        for i in range(n))
+    return 'class A(object):\n' + methods + '\nA().m0()\n'
+
+
+def print_output(n):
+    """Statements that print much more than their source."""
+    return ''.join(
+        'for i in range(50):\n    print(i, "x" * 20)\n\n'
+        for i in range(n // 10))
+
+
+def deep_tracebacks(n):
+    """Exceptions raised from deep recursion."""
+    return (
+        'def f(n):\n'
+        '    return f(n - 1) if n else 1 / 0\n'
+        '\n' +
+        'f(200)\n' * (n // 20)
+    )
+
+
+CORPORA = [
+    ('short statements', short_statements, 5000),
+    ('long def', long_def, 5000),
+    ('long class', long_class, 2000),
+    ('print output', print_output, 2000),
+    ('deep tracebacks', deep_tracebacks, 2000),
+]
+
+
+def run_replify(source):
+    outfile = StringIO()
+    replify(StringIO(source), outfile, {})
+    return outfile.getvalue()
+
+
+def run_dereplify(transcript):
+    outfile = StringIO()
+    dereplify(StringIO(transcript), outfile)
+    return outfile.getvalue()
+
+
+def peak_memory(func, arg):
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        func(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(func, arg, repeat):
+    lines = arg.count('\n')
+    best = min(timeit.repeat(lambda: func(arg), number=1, repeat=repeat))
+    return {
+        'lines_per_second': lines / best,
+        'peak_memory': peak_memory(func, arg),
+    }
+
+
+def run(scale=1.0, repeat=3):
+    results = {}
+    for name, corpus, size in CORPORA:
+        source = corpus(int(size * scale))
+        transcript = run_replify(source)
+        results[name] = {
+            'replify': measure(run_replify, source, repeat),
+            'dereplify': measure(run_dereplify, transcript, repeat),
+        }
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """Yield ``(name, direction, metric, change)`` for each regression.
+
+    ``change`` is the relative change from the baseline, in the direction
+    that makes it worse.
+    """
+    for name, directions in sorted(results.items()):
+        for direction, metrics in sorted(directions.items()):
+            base = baseline.get(name, {}).get(direction)
+            if not base:
+                continue
+            speed = base['lines_per_second'] / metrics['lines_per_second']
+            if speed - 1 > threshold:
+                yield name, direction, 'lines_per_second', speed - 1
+            if not metrics['peak_memory'] or not base['peak_memory']:
+                continue
+            memory = float(metrics['peak_memory']) / base['peak_memory']
+            if memory - 1 > threshold:
+                yield name, direction, 'peak_memory', memory - 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='Store the results as the new baseline.')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    config = parser.parse_args(argv)
+
+    results = run(config.scale, config.repeat)
+    print('{0:<18} {1:<10} {2:>14} {3:>12}'.format(
+        'corpus', 'direction', 'lines/s', 'peak memory'))
+    for name, _, _ in CORPORA:
+        for direction in ('replify', 'dereplify'):
+            metrics = results[name][direction]
+            memory = metrics['peak_memory']
+            print('{0:<18} {1:<10} {2:>14,.0f} {3:>12}'.format(
+                name, direction, metrics['lines_per_second'],
+                'n/a' if memory is None else
+                '{0:.1f}MB'.format(memory / 1024.0 / 1024.0)))
+
+    status = 0
+    if os.path.exists(config.baseline):
+        with open(config.baseline) as f:
+            baseline = json.load(f)
+        found = list(regressions(results, baseline, config.threshold))
+        for name, direction, metric, change in found:
+            print('REGRESSION: {0} {1} {2} is {3:.0%} worse than the '
+                  'baseline'.format(name, direction, metric, change))
+        if found:
+            status = 1
+        else:
+            print('no regressions beyond {0:.0%}'.format(config.threshold))
+    if config.save:
+        with open(config.baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print('baseline saved to {0}'.format(config.baseline))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the output writers used by replify.
+
+Run with ``python benchmarks/bench_writer.py``. Each scenario writes the
+same fragments through :class:`replify.replify.Indentifier` and
+:class:`replify.replify.BufferedIndentifier` into a ``StringIO``, and
+reports the best of several runs.
+
+Note that ``Indentifier`` only indents the first line of a multi-line
+write, so it does less work than ``BufferedIndentifier`` in the indented
+multi-line scenario.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from replify.replify import Indentifier, BufferedIndentifier  # noqa
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+
+def print_loop(n):
+    """Fragments written by ``for i in range(n): print(i)``."""
+    fragments = []
+    for i in range(n):
+        fragments.append(str(i))
+        fragments.append('\n')
+    return fragments
+
+
+def big_lines(n):
+    """Multi-line fragments, as written by printing a large object."""
+    return ['\n'.join(str(i) for i in range(100)) + '\n'] * (n // 100)
+
+
+SCENARIOS = [
+    ('print loop', print_loop(100000)),
+    ('multi-line writes', big_lines(1000000)),
+]
+
+
+def run(writer_type, fragments, indent):
+    outfile = StringIO()
+    writer = writer_type(outfile, indent)
+    write = writer.write
+    for fragment in fragments:
+        write(fragment)
+    writer.flush()
+    return outfile
+
+
+def main(repeat=5):
+    print('{0:<20} {1:<8} {2:>12} {3:>12} {4:>8}'.format(
+        'scenario', 'indent', 'Indentifier', 'Buffered', 'speedup'))
+    for name, fragments in SCENARIOS:
+        for indent in ('', '    '):
+            times = []
+            for writer_type in (Indentifier, BufferedIndentifier):
+                times.append(min(timeit.repeat(
+                    lambda: run(writer_type, fragments, indent),
+                    number=1, repeat=repeat)))
+            print('{0:<20} {1:<8} {2:>11.4f}s {3:>11.4f}s {4:>7.1f}x'.format(
+                name, repr(indent), times[0], times[1], times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Asynchronous interface to replify, for use with asyncio (python 3.6+)."""
+from __future__ import absolute_import
+
+import ctypes
+import asyncio
+import threading
+
+from replify import capture
+from replify.replify import execute
+
+
+class _Stop(SystemExit):
+    # SystemExit, because InteractiveConsole.runcode lets it through.
+    pass
+
+
+class _Failure(object):
+    def __init__(self, error):
+        self.error = error
+
+
+_done = object()
+
+
+def _interrupt(thread):
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread.ident), ctypes.py_object(_Stop))
+
+
+async def areplify(infile, context, console_type=None, limits=None,
+                   display=None):
+    """Execute a snippet in a thread, yielding each statement as it ends.
+
+    This is an asynchronous generator; each item is the
+    :class:`replify.results.StatementResult` of a statement. ``infile`` is
+    an iterable of source lines, such as a file; it and the other arguments
+    are as for :func:`replify.replify.execute`. Time limits cannot be used,
+    since they only work in the main thread.
+
+    The snippet runs in its own thread so that the event loop is not
+    blocked. If the generator is closed or the task consuming it is
+    cancelled, execution is stopped: an exception is raised in the thread,
+    which interrupts the running statement as soon as it executes more
+    python code, and no further statements are run.
+
+    Output is captured per thread, through the proxies installed by
+    :func:`replify.capture.install`, which is called here; so several
+    snippets may run concurrently, and output written by the event loop's
+    own thread goes to the original streams.
+    """
+    capture.install()
+    try:
+        loop = asyncio.get_running_loop()
+    except AttributeError:
+        loop = asyncio.get_event_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+    finished = threading.Event()
+    # held while interrupting the thread, and while it finishes, so that it
+    # is only interrupted while running the snippet
+    lock = threading.Lock()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # the event loop is closed
+            stopped.set()
+
+    def run():
+        # an interrupt sent just before finishing is delivered here, at the
+        # latest, while the thread still exists
+        try:
+            try:
+                for result in execute(infile, context, console_type,
+                                      limits=limits, display=display):
+                    put(result)
+                    if stopped.is_set():
+                        break
+            except _Stop:
+                pass
+            except BaseException as err:
+                put(_Failure(err))
+            with lock:
+                finished.set()
+            put(_done)
+        except _Stop:
+            pass
+
+    thread = threading.Thread(target=run, name='replify')
+    thread.daemon = True
+    thread.start()
+    done = False
+    try:
+        while True:
+            item = await queue.get()
+            if item is _done:
+                done = True
+                break
+            if isinstance(item, _Failure):
+                done = True
+                raise item.error
+            yield item
+    finally:
+        if done:
+            thread.join()
+        else:
+            stopped.set()
+            with lock:
+                if not finished.is_set():
+                    _interrupt(thread)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import os
+import sys
+import errno
+import glob
+import time
+
+from replify import trace
+from replify.replify import replify, replify_forked, Context
+from replify.limits import LimitExceeded
+from replify.profiling import ProfileCollector
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+
+_magic = '*?['
+
+
+def glob_root(pattern):
+    """Return the leading part of ``pattern`` that contains no wildcards."""
+    parts = []
+    for part in pattern.split(os.sep):
+        if any(c in part for c in _magic):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or os.curdir
+
+
+def expand_inputs(patterns, select=None):
+    """Expand files, directories and glob patterns into input paths.
+
+    Returns a list of ``(path, relpath)`` pairs, where ``relpath`` is the
+    location of the output file relative to the output directory.
+    Directories are walked recursively. With ``select``, a function of a
+    path, only the files found in directories for which it returns true
+    are taken, and directories whose names start with ``_`` or ``.``, such
+    as build output and caches, are not walked. Paths matched more than
+    once are only returned the first time.
+    """
+    seen = set()
+    inputs = []
+
+    def add(path, root):
+        key = os.path.abspath(path)
+        if key in seen:
+            return
+        seen.add(key)
+        inputs.append((path, os.path.relpath(path, root)))
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for dirpath, dirnames, filenames in os.walk(pattern):
+                if select is not None:
+                    dirnames[:] = [d for d in dirnames
+                                   if not d.startswith(('_', '.'))]
+                dirnames.sort()
+                for f in sorted(filenames):
+                    path = os.path.join(dirpath, f)
+                    if select is None or select(path):
+                        add(path, pattern)
+        elif os.path.isfile(pattern):
+            add(pattern, os.path.dirname(pattern) or os.curdir)
+        else:
+            root = glob_root(pattern)
+            if sys.version_info[:2] >= (3, 5):
+                matches = glob.glob(pattern, recursive=True)
+            else:
+                matches = glob.glob(pattern)
+            for path in sorted(matches):
+                if os.path.isfile(path):
+                    add(path, root)
+    return inputs
+
+
+class BatchResult(object):
+    """Outcome of replifying a single input file."""
+
+    def __init__(self, path, outpath, error=None, elapsed=0.0, cached=None,
+                 profile=None, trace=None):
+        self.path = path
+        self.outpath = outpath
+        self.error = error
+        self.elapsed = elapsed
+        # True for a cache hit, False for a miss, None if no cache was used
+        self.cached = cached
+        # entries of a replify.profiling.ProfileCollector, if profiled
+        self.profile = profile
+        # trace events drained from a worker process, if traced
+        self.trace = trace
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def status(self):
+        return 'ok' if self.ok else 'error'
+
+
+def render(text, namespace, console_type=None, fork=False, checkpoints=None,
+           limits=None, profiler=None, renderers=(), display=None):
+    """Replify ``text`` in ``namespace`` and return the transcript.
+
+    With ``fork`` true, the snippet is executed in a forked process (see
+    :func:`replify.replify.replify_forked`); a ``profiler`` cannot be used
+    then.
+    """
+    outfile = StringIO()
+    if fork:
+        if profiler is not None:
+            raise ValueError('forked snippets cannot be profiled')
+        replify_forked(StringIO(text), outfile, namespace, console_type,
+                       checkpoints, limits, renderers=renderers,
+                       display=display)
+    else:
+        replify(StringIO(text), outfile, namespace, console_type,
+                checkpoints, limits=limits, renderers=renderers,
+                profiler=profiler, display=display)
+    return outfile.getvalue()
+
+
+def replify_file(path, outpath, context, console_type=None, fork=False,
+                 cache=None, incremental=False, limits=None, profiler=None,
+                 display=None, dependencies=False):
+    """Replify one input file into ``outpath``, returning a BatchResult.
+
+    Errors raised while processing the file are recorded in the result
+    rather than propagated, so that one bad snippet does not stop a batch.
+    With ``fork`` true, the snippet runs in a forked process that starts
+    from the context module's namespace as-is, instead of a copy. If a
+    :class:`replify.cache.TranscriptCache` is given, a cached transcript is
+    used when there is one, and new transcripts are added to it. With
+    ``incremental`` true, each statement's transcript is cached as well, so
+    that a changed file only shows output afresh from its first changed
+    statement; with ``dependencies`` true as well, only the statements an
+    edit may affect are executed again (see
+    :func:`replify.replify.execute`). ``limits`` (a
+    :class:`replify.limits.Limits`) is enforced on
+    each statement; a file aborted by a limit is recorded as an error. With
+    a :class:`replify.profiling.Profiler`, the measurements of each
+    statement are kept in the result's ``profile``; the cache is not used
+    then, since cached transcripts have no measurements. ``display`` (a
+    :class:`replify.display.Display`) shows the values of expressions.
+    """
+    with trace.span('replify file', 'batch', {'path': path}):
+        return _replify_file(path, outpath, context, console_type, fork,
+                             cache, incremental, limits, profiler, display,
+                             dependencies)
+
+
+def _replify_file(path, outpath, context, console_type, fork, cache,
+                  incremental, limits, profiler, display, dependencies):
+    start = time.time()
+    cached = None
+    collector = None
+    if profiler is not None:
+        cache = None
+        collector = ProfileCollector(path)
+    try:
+        with open(path, 'r') as f:
+            text = f.read()
+        transcript = None
+        if cache is not None:
+            key = cache.key(text, context, console_type, limits, display)
+            transcript = cache.get(key)
+            cached = transcript is not None
+        if transcript is None:
+            checkpoints = None
+            if incremental and cache is not None:
+                checkpoints = cache.checkpoints(
+                    context, console_type, limits, display, dependencies)
+            transcript = render(
+                text, context.namespace(copy=not fork), console_type, fork,
+                checkpoints, limits, profiler,
+                [collector] if collector is not None else (), display)
+            if cache is not None:
+                cache.put(key, transcript)
+        outdir = os.path.dirname(outpath)
+        if outdir:
+            try:
+                os.makedirs(outdir)
+            except OSError as err:
+                if err.errno != errno.EEXIST:
+                    raise
+        with open(outpath, 'w') as f:
+            f.write(transcript)
+    except (Exception, SystemExit, LimitExceeded) as err:
+        error = '{0}: {1}'.format(type(err).__name__, err)
+    else:
+        error = None
+    return BatchResult(path, outpath, error, time.time() - start, cached,
+                       collector.entries if collector is not None else None)
+
+
+_worker_contexts = {}
+
+
+def worker_context(context_file, context_module):
+    """Return the context for a worker process, importing it once.
+
+    Each worker imports a context the first time it is needed and keeps it
+    for the rest of the batch.
+    """
+    key = (context_file, context_module)
+    context = _worker_contexts.get(key)
+    if context is None:
+        context = _worker_contexts[key] = Context(
+            context_file, context_module)
+    return context
+
+
+def _worker_replify_file(path, outpath, context_file, context_module,
+                         console_type, fork, cache, incremental, limits,
+                         profiler, display, dependencies, traced):
+    """Process pool entry point: replify one file in a worker process."""
+    if traced:
+        tracer = trace.install(trace.Tracer('replify worker'))
+    context = worker_context(context_file, context_module)
+    result = replify_file(path, outpath, context, console_type, fork, cache,
+                          incremental, limits, profiler, display,
+                          dependencies)
+    if traced:
+        result.trace = tracer.drain()
+    return result
+
+
+def map_parallel(func, calls, jobs):
+    """Call ``func`` with each tuple of arguments in ``calls``, in parallel.
+
+    The calls are spread across ``jobs`` worker processes, and their
+    results returned in order. ``func`` must handle errors itself: anything
+    raised here means a worker died, in which case the remaining calls are
+    cancelled and the error is raised. Without ``concurrent.futures`` (on
+    python 2, unless the ``futures`` backport is installed), the calls are
+    made one after the other in this process.
+    """
+    try:
+        from concurrent.futures import (
+            ProcessPoolExecutor, FIRST_EXCEPTION, wait)
+    except ImportError:
+        return [func(*args) for args in calls]
+    executor = ProcessPoolExecutor(jobs)
+    futures = []
+    try:
+        for args in calls:
+            futures.append(executor.submit(func, *args))
+        # Stop at the first dead worker rather than waiting for the calls
+        # queued before it.
+        wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+        # Results are collected in input order, so reports do not depend
+        # on scheduling.
+        results = [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+        raise
+    executor.shutdown(wait=True)
+    return results
+
+
+def replify_batch(patterns, outdir, context, console_type=None, jobs=1,
+                  fork=False, cache=None, incremental=False, limits=None,
+                  profiler=None, display=None, dependencies=False):
+    """Replify every file matching ``patterns`` into ``outdir``.
+
+    ``context`` is a :class:`replify.replify.Context`; it is imported once
+    and each file is executed in its own copy of the context namespace.
+    With ``jobs`` greater than one, files are spread across that many
+    worker processes, each with its own copy of the context. If a worker
+    process crashes, the remaining files are cancelled and the error is
+    raised. With ``fork`` true, each file runs in a forked process that
+    starts from the imported context instead of a copy of its namespace.
+    ``cache``, ``incremental``, ``limits``, ``profiler``, ``display`` and
+    ``dependencies`` are passed on to :func:`replify_file`. If a
+    :class:`replify.trace.Tracer` is installed, worker processes trace
+    their work too, and their events are added to it.
+    Returns a list of :class:`BatchResult` in input order.
+    """
+    inputs = expand_inputs(patterns)
+    if jobs > 1 and len(inputs) > 1:
+        tracer = trace.active()
+        results = map_parallel(_worker_replify_file, [
+            (path, os.path.join(outdir, relpath), context.context_file,
+             context.context_module, console_type, fork, cache, incremental,
+             limits, profiler, display, dependencies, tracer is not None)
+            for path, relpath in inputs
+        ], jobs)
+        if tracer is not None:
+            for result in results:
+                tracer.add(result.trace or ())
+        return results
+    return [
+        replify_file(path, os.path.join(outdir, relpath), context,
+                     console_type, fork, cache, incremental, limits,
+                     profiler, display, dependencies)
+        for path, relpath in inputs
+    ]
+
+
+def write_report(results, stream):
+    """Write a per-file status and timing summary of ``results``."""
+    total = 0.0
+    failed = 0
+    hits = misses = 0
+    for result in results:
+        total += result.elapsed
+        if result.cached is not None:
+            if result.cached:
+                hits += 1
+            else:
+                misses += 1
+        line = '{0:<6} {1:8.3f}s  {2}'.format(
+            result.status, result.elapsed, result.path)
+        if result.ok:
+            line += ' -> {0}'.format(result.outpath)
+            if result.cached:
+                line += ' (cached)'
+        else:
+            failed += 1
+            line += ': {0}'.format(result.error)
+        stream.write(line + '\n')
+    stream.write('{0} files, {1} failed, {2:.3f}s\n'.format(
+        len(results), failed, total))
+    if hits or misses:
+        stream.write('cache: {0} hits, {1} misses\n'.format(hits, misses))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import io
+import os
+import sys
+import errno
+import hashlib
+import tempfile
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def _encode(value):
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+    return value
+
+
+def console_type_name(console_type):
+    """Return a stable name for ``console_type`` to use in cache keys."""
+    if console_type is None:
+        return 'code.InteractiveConsole'
+    return '{0}.{1}'.format(console_type.__module__, console_type.__name__)
+
+
+class TranscriptCache(object):
+    """Content-addressed on-disk cache of rendered transcripts.
+
+    Entries are keyed by everything that can change a transcript: the input
+    text, the context's source, the console type, any statement limits or
+    display settings, and the python version.
+    When the total size of the cache grows beyond ``max_size`` bytes, the
+    least recently used entries are removed.
+
+    ``hits`` and ``misses`` count the lookups made through this instance.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_size'] = None
+        return state
+
+    def key(self, text, context, console_type=None, limits=None,
+            display=None):
+        parts = [sys.version, console_type_name(console_type),
+                 context.digest, text]
+        if limits is not None:
+            parts.append(repr(limits))
+        if display is not None:
+            parts.append(repr(display))
+        h = hashlib.sha256()
+        for part in parts:
+            part = _encode(part)
+            h.update(_encode('{0}:'.format(len(part))))
+            h.update(part)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def checkpoints(self, context, console_type=None, limits=None,
+                    display=None, dependencies=False):
+        """Return a :class:`CheckpointStore` kept in this cache."""
+        return CheckpointStore(
+            self, self.key('', context, console_type, limits, display),
+            dependencies)
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with io.open(path, 'r', encoding='utf-8', newline='') as f:
+                transcript = f.read()
+        except (IOError, OSError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return transcript
+
+    def get(self, key):
+        """Return the transcript stored under ``key``, or None."""
+        transcript = self._load(key)
+        if transcript is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return transcript
+
+    def put(self, key, transcript):
+        """Store ``transcript`` under ``key``, evicting old entries."""
+        path = self._path(key)
+        dirname = os.path.dirname(path)
+        try:
+            os.makedirs(dirname)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        data = _encode(transcript)
+        # an entry being replaced no longer counts towards the size
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        fd, tmppath = tempfile.mkstemp(dir=dirname, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmppath, path)
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data) - replaced
+        if self._size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for f in filenames:
+                if f.startswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def evict(self):
+        """Remove least recently used entries until within ``max_size``."""
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+
+class CheckpointStore(object):
+    """Per-statement transcripts, stored in a :class:`TranscriptCache`.
+
+    Used as the ``checkpoints`` argument of :func:`replify.replify.replify`.
+    Entries are keyed by the hash of a statement prefix combined with the
+    context, console type and python version that ``base`` was made from.
+    With ``dependencies`` true, statements are keyed by the statements they
+    depend on instead of all the statements before them (see
+    :func:`replify.replify.execute`).
+    """
+
+    def __init__(self, cache, base, dependencies=False):
+        self.cache = cache
+        self.base = base
+        self.dependencies = dependencies
+
+    def _key(self, prefix):
+        return hashlib.sha256(
+            _encode('{0}:{1}'.format(self.base, prefix))).hexdigest()
+
+    def get(self, prefix):
+        return self.cache._load(self._key(prefix))
+
+    def put(self, prefix, transcript):
+        self.cache.put(self._key(prefix), transcript)
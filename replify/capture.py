@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import sys
+import threading
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+
+_lock = threading.Lock()
+
+if ContextVar is not None:
+    _current = ContextVar('replify_capture', default=None)
+
+    def current():
+        """Return the target of the standard streams in this context."""
+        return _current.get()
+
+    def activate(target):
+        """Route the standard streams in this context to ``target``.
+
+        ``target`` is a tuple of a stdout and a stderr file-like object and
+        a displayhook, or None to use the original ones. Returns the
+        previous target, to be activated again afterwards.
+        """
+        previous = _current.get()
+        _current.set(target)
+        return previous
+
+else:
+    class _Local(threading.local):
+        target = None
+
+    _local = _Local()
+
+    def current():
+        """Return the target of the standard streams in this thread."""
+        return _local.target
+
+    def activate(target):
+        """Route the standard streams in this thread to ``target``.
+
+        ``target`` is a tuple of a stdout and a stderr file-like object and
+        a displayhook, or None to use the original ones. Returns the
+        previous target, to be activated again afterwards.
+        """
+        previous = _local.target
+        _local.target = target
+        return previous
+
+
+class StreamProxy(object):
+    """Stands in for a standard stream, writing to the current target's.
+
+    Where no target is active, such as in threads that are not running a
+    statement, the original stream is used.
+    """
+
+    def __init__(self, index, original):
+        self.index = index
+        self.original = original
+
+    def _stream(self):
+        target = current()
+        if target is None:
+            return self.original
+        return target[self.index]
+
+    def write(self, data):
+        return self._stream().write(data)
+
+    def writelines(self, lines):
+        stream = self._stream()
+        for line in lines:
+            stream.write(line)
+
+    def flush(self):
+        self._stream().flush()
+
+    # python 2's print statement keeps state on the stream, which must not
+    # be shared between threads
+    @property
+    def softspace(self):
+        return getattr(self._stream(), 'softspace', 0)
+
+    @softspace.setter
+    def softspace(self, value):
+        self._stream().softspace = value
+
+    def __getattr__(self, name):
+        return getattr(self._stream(), name)
+
+
+class DisplayhookProxy(object):
+    """Stands in for ``sys.displayhook``, calling the current target's."""
+
+    def __init__(self, original):
+        self.original = original
+
+    def __call__(self, value):
+        target = current()
+        if target is None:
+            return self.original(value)
+        return target[2](value)
+
+
+def installed():
+    """Whether the proxies are installed as the standard streams."""
+    return (isinstance(sys.stdout, StreamProxy) and
+            isinstance(sys.stderr, StreamProxy) and
+            isinstance(sys.displayhook, DisplayhookProxy))
+
+
+def install():
+    """Replace the standard streams with proxies, once for the process.
+
+    From then on, :class:`replify.replify.Session` captures output by
+    activating its own streams for the thread running a statement, instead
+    of replacing ``sys.stdout`` and ``sys.stderr`` for the whole process,
+    so that sessions can run concurrently in several threads. Installing
+    the proxies again does nothing.
+    """
+    with _lock:
+        if installed():
+            return
+        sys.stdout = StreamProxy(0, sys.stdout)
+        sys.stderr = StreamProxy(1, sys.stderr)
+        sys.displayhook = DisplayhookProxy(sys.displayhook)
+
+
+def uninstall():
+    """Put back the standard streams replaced by :func:`install`."""
+    with _lock:
+        if isinstance(sys.stdout, StreamProxy):
+            sys.stdout = sys.stdout.original
+        if isinstance(sys.stderr, StreamProxy):
+            sys.stderr = sys.stderr.original
+        if isinstance(sys.displayhook, DisplayhookProxy):
+            sys.displayhook = sys.displayhook.original
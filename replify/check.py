@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import io
+import os
+import re
+import sys
+import time
+import difflib
+
+from replify import trace
+from replify.batch import expand_inputs, render, worker_context, map_parallel
+from replify.document import replify_document
+from replify.dereplify import dereplify
+from replify.replify import ps1
+from replify.limits import LimitExceeded
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+DOCUMENT_FORMATS = {
+    '.rst': 'rst',
+    '.rest': 'rst',
+    '.md': 'markdown',
+    '.markdown': 'markdown',
+}
+
+# bytes read from a file found in a directory to tell if it is a transcript
+HEAD_SIZE = 1024
+
+_traceback = re.compile(r'(\s*)Traceback \(most recent call last\):\s*$')
+_elided = re.compile(r'\s*\.\.\.\s*$')
+
+
+def elide_tracebacks(lines):
+    """Return ``lines`` with the stack of every traceback elided.
+
+    The lines between a traceback's header and its exception (those that
+    are indented further than the header, or are ``...``) are replaced by
+    one ``...`` line, as written by
+    :class:`replify.replify.DoctestTracebackConsole`. As in doctest, only
+    the header and the exception of a traceback are compared then.
+    """
+    result = []
+    indent = None
+    for line in lines:
+        if indent is not None:
+            if _elided.match(line) or (
+                    line.startswith(indent) and
+                    line[len(indent):len(indent) + 1].isspace()):
+                continue
+            result.append(indent + '  ...\n')
+            indent = None
+        match = _traceback.match(line)
+        if match:
+            indent = match.group(1)
+        result.append(line)
+    if indent is not None:
+        result.append(indent + '  ...\n')
+    return result
+
+
+class CheckResult(object):
+    """Outcome of checking a single file.
+
+    ``diff`` is the list of lines of a unified diff from the recorded text
+    to the fresh one, empty if they match; ``error`` is set instead if the
+    file could not be checked. ``trace`` holds the trace events of a worker
+    process that checked it, if traced.
+    """
+
+    def __init__(self, path, diff=(), error=None, elapsed=0.0, trace=None):
+        self.path = path
+        self.diff = list(diff)
+        self.error = error
+        self.elapsed = elapsed
+        self.trace = trace
+
+    @property
+    def ok(self):
+        return self.error is None and not self.diff
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return 'error'
+        return 'failed' if self.diff else 'ok'
+
+
+def replify_again(text, namespace, format=None, console_type=None,
+                  limits=None, display=None):
+    """Execute the transcripts in ``text`` again, returning the fresh text.
+
+    With a ``format`` ('rst' or 'markdown'), ``text`` is a document whose
+    code blocks are executed with
+    :func:`replify.document.replify_document`; only the blocks that are
+    transcripts are replified, while plain code blocks run for their
+    effects and are left as they are. Otherwise it is a transcript, whose
+    prompts are removed before it is replified.
+    """
+    if format is not None:
+        outfile = StringIO()
+        replify_document(text.splitlines(True), outfile, namespace, format,
+                         console_type, limits, display,
+                         transcripts_only=True)
+        return outfile.getvalue()
+    source = StringIO()
+    dereplify(StringIO(text), source)
+    return render(source.getvalue(), namespace, console_type, limits=limits,
+                  display=display)
+
+
+def checkable(path):
+    """Return whether ``path`` is a document or a transcript.
+
+    Documents are told by their extension, and transcripts by starting
+    with a prompt; :func:`check` only takes such files from directories.
+    """
+    if os.path.splitext(path)[1].lower() in DOCUMENT_FORMATS:
+        return True
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(HEAD_SIZE)
+    except EnvironmentError:
+        return False
+    return head.lstrip().startswith(ps1.rstrip().encode('ascii'))
+
+
+def check_file(path, context, console_type=None, limits=None,
+               display=None):
+    """Check that the transcripts in the file ``path`` are up to date.
+
+    Files ending in ``.rst`` or ``.md`` are documents, and so are other
+    files that do not start with a prompt, which are read as
+    reStructuredText; the rest are transcripts. The fresh text is compared
+    with the file, with the stack of tracebacks elided on both sides (see
+    :func:`elide_tracebacks`). Errors are recorded in the returned
+    :class:`CheckResult` rather than propagated.
+    """
+    with trace.span('check file', 'batch', {'path': path}):
+        return _check_file(path, context, console_type, limits, display)
+
+
+def _check_file(path, context, console_type, limits, display):
+    start = time.time()
+    diff = ()
+    try:
+        format = DOCUMENT_FORMATS.get(os.path.splitext(path)[1].lower())
+        with io.open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if sys.version_info[0] < 3:
+            text = text.encode('utf-8')
+        if format is None and not text.lstrip().startswith(ps1.rstrip()):
+            # like doctest, look for doctest blocks in any other text
+            format = 'rst'
+        fresh = replify_again(text, context.namespace(), format,
+                              console_type, limits, display)
+        recorded = elide_tracebacks(text.splitlines(True))
+        fresh = elide_tracebacks(fresh.splitlines(True))
+        if recorded != fresh:
+            diff = difflib.unified_diff(
+                recorded, fresh, path, '{0} (replified)'.format(path))
+    except (Exception, SystemExit, LimitExceeded) as err:
+        error = '{0}: {1}'.format(type(err).__name__, err)
+    else:
+        error = None
+    return CheckResult(path, diff, error, time.time() - start)
+
+
+def _worker_check_file(path, context_file, context_module, console_type,
+                       limits, display, traced):
+    """Process pool entry point: check one file in a worker process."""
+    if traced:
+        tracer = trace.install(trace.Tracer('replify worker'))
+    context = worker_context(context_file, context_module)
+    result = check_file(path, context, console_type, limits, display)
+    if traced:
+        result.trace = tracer.drain()
+    return result
+
+
+def check(patterns, context, console_type=None, jobs=1, limits=None,
+          display=None):
+    """Check every file matching ``patterns`` with :func:`check_file`.
+
+    ``patterns`` are expanded like those of
+    :func:`replify.batch.replify_batch`, but directories only contribute
+    the files :func:`checkable` accepts, outside directories starting with
+    ``_`` or ``.``. With ``jobs`` greater than one files are spread across
+    that many worker processes in the same way. Returns a list of
+    :class:`CheckResult` in input order.
+    """
+    inputs = expand_inputs(patterns, checkable)
+    if jobs > 1 and len(inputs) > 1:
+        tracer = trace.active()
+        results = map_parallel(_worker_check_file, [
+            (path, context.context_file, context.context_module,
+             console_type, limits, display, tracer is not None)
+            for path, _ in inputs
+        ], jobs)
+        if tracer is not None:
+            for result in results:
+                tracer.add(result.trace or ())
+        return results
+    return [check_file(path, context, console_type, limits, display)
+            for path, _ in inputs]
+
+
+def write_diffs(results, stream):
+    """Write the diff, or the error, of every file that failed its check."""
+    for result in results:
+        if result.error is not None:
+            stream.write('{0}: {1}\n'.format(result.path, result.error))
+        for line in result.diff:
+            stream.write(line)
+            if not line.endswith('\n'):
+                stream.write('\n')
+
+
+def write_report(results, stream):
+    """Write a per-file status and timing summary of ``results``."""
+    total = 0.0
+    failed = 0
+    for result in results:
+        total += result.elapsed
+        if not result.ok:
+            failed += 1
+        stream.write('{0:<6} {1:8.3f}s  {2}\n'.format(
+            result.status, result.elapsed, result.path))
+    stream.write('{0} files, {1} failed, {2:.3f}s\n'.format(
+        len(results), failed, total))
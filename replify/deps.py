@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import ast
+import sys
+
+# names whose use means a statement may read or bind any name
+OPAQUE_CALLS = frozenset([
+    'globals', 'locals', 'vars', 'exec', 'eval', 'execfile', 'reload',
+    '__import__', 'dir'])
+
+# builtins that only read and mutate their arguments; calling any other name
+# that the snippet does not define may read or bind any name
+PURE_CALLS = frozenset([
+    'abs', 'all', 'any', 'ascii', 'bin', 'bool', 'bytearray', 'bytes',
+    'callable', 'chr', 'complex', 'dict', 'divmod', 'enumerate', 'float',
+    'format', 'frozenset', 'hash', 'hex', 'id', 'int', 'isinstance',
+    'issubclass', 'len', 'list', 'long', 'oct', 'ord', 'pow', 'print',
+    'range', 'repr', 'reversed', 'round', 'set', 'slice', 'str', 'sum',
+    'tuple', 'type', 'unichr', 'unicode', 'xrange', 'zip'])
+
+# the name the console binds to the value of an expression statement
+RESULT = '_'
+
+if sys.version_info[0] >= 3:
+    _scopes = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda,
+               ast.ClassDef)
+else:
+    _scopes = (ast.FunctionDef, ast.Lambda, ast.ClassDef)
+
+
+# match patterns bind names given as strings, not as Name nodes; these map
+# the pattern types to the field holding the name, which may be None
+_PATTERN_NAMES = {}
+for _type, _field in (('MatchAs', 'name'), ('MatchStar', 'name'),
+                      ('MatchMapping', 'rest')):
+    if hasattr(ast, _type):
+        _PATTERN_NAMES[getattr(ast, _type)] = _field
+
+
+def _captured(node):
+    """Return the name the match pattern ``node`` binds, if any."""
+    field = _PATTERN_NAMES.get(type(node))
+    if field is None:
+        return None
+    return getattr(node, field)
+
+
+def _base(node):
+    """Return the name at the bottom of ``a.b[c].d``, if any."""
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+class Names(object):
+    """The names a statement, or a function when called, reads and binds.
+
+    Binding includes mutating: assigning to an attribute or item of a
+    name, calling a method of it, or passing it to a function all count
+    as binding it, since the analysis cannot tell which of those change
+    it. ``opaque`` is true if the statement may read or bind any name, as
+    ``from m import *`` or a call to ``globals()`` may. ``calls`` holds the
+    names that are called; whether those calls are opaque depends on what
+    the names are bound to (see :func:`statements`).
+    """
+
+    def __init__(self, reads=(), binds=(), opaque=False, calls=()):
+        self.reads = set(reads)
+        self.binds = set(binds)
+        self.opaque = opaque
+        self.calls = set(calls)
+
+    def update(self, other):
+        self.reads |= other.reads
+        self.binds |= other.binds
+        self.opaque = self.opaque or other.opaque
+        self.calls |= other.calls
+
+    def _without(self, local):
+        return Names(self.reads - local, self.binds - local, self.opaque,
+                     self.calls - local)
+
+    def __repr__(self):
+        return ('Names(reads={0!r}, binds={1!r}, opaque={2!r}, '
+                'calls={3!r})').format(sorted(self.reads), sorted(self.binds),
+                                       self.opaque, sorted(self.calls))
+
+
+class _Visitor(ast.NodeVisitor):
+    """Collects the names a statement reads and binds at the top level.
+
+    The bodies of functions are not run when they are defined; the names
+    they read and bind are collected separately in ``deferred``, by the
+    name the function is bound to, and apply whenever it is called.
+    """
+
+    def __init__(self, top=False):
+        self.names = Names()
+        self.deferred = {}
+        # whether this is the code the console runs, rather than a body
+        self.top = top
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.names.reads.add(node.id)
+        else:
+            self.names.binds.add(node.id)
+
+    def _mutate(self, node):
+        name = _base(node)
+        if name is not None:
+            self.names.reads.add(name)
+            self.names.binds.add(name)
+
+    def visit_Attribute(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self._mutate(node)
+        self.visit(node.value)
+
+    def visit_Subscript(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self._mutate(node)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        self._mutate(node.target)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Name):
+            if func.id in OPAQUE_CALLS:
+                self.names.opaque = True
+            self.names.calls.add(func.id)
+        elif isinstance(func, ast.Attribute):
+            self._mutate(func.value)
+        else:
+            # the result of an expression, which may be any function
+            self.names.opaque = True
+        for arg in list(node.args) + [k.value for k in node.keywords]:
+            if sys.version_info[0] >= 3 and isinstance(arg, ast.Starred):
+                arg = arg.value
+            self._mutate(arg)
+        self.generic_visit(node)
+
+    def _comprehension(self, node):
+        # the targets of a comprehension are local to it on python 3
+        visitor = _Visitor(self.top)
+        visitor.generic_visit(node)
+        local = set()
+        for generator in node.generators:
+            for child in ast.walk(generator.target):
+                if isinstance(child, ast.Name):
+                    local.add(child.id)
+        self.names.update(visitor.names._without(local))
+
+    visit_GeneratorExp = visit_SetComp = visit_DictComp = _comprehension
+    if sys.version_info[0] >= 3:
+        visit_ListComp = _comprehension
+
+    def visit_Expr(self, node):
+        # the console binds the value of an expression statement to _
+        if self.top:
+            self.names.binds.add(RESULT)
+        self.generic_visit(node)
+
+    def _pattern(self, node):
+        name = _captured(node)
+        if name is not None:
+            self.names.binds.add(name)
+        self.generic_visit(node)
+
+    visit_MatchAs = visit_MatchStar = visit_MatchMapping = _pattern
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.names.binds.add(
+                alias.asname or alias.name.partition('.')[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name == '*':
+                self.names.opaque = True
+            else:
+                self.names.binds.add(alias.asname or alias.name)
+
+    def visit_Global(self, node):
+        self.names.binds.update(node.names)
+
+    def visit_Exec(self, node):
+        self.names.opaque = True
+
+    def _function(self, node):
+        body = _function_names(node)
+        for decorator in getattr(node, 'decorator_list', ()):
+            self.visit(decorator)
+        self.visit(node.args)
+        return body
+
+    def visit_FunctionDef(self, node):
+        self.names.binds.add(node.name)
+        self.deferred[node.name] = self._function(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        # a lambda may be called by the statement defining it
+        self.names.update(self._function(node))
+
+    def visit_arguments(self, node):
+        # only defaults are evaluated where a function is defined
+        for default in node.defaults:
+            self.visit(default)
+        for default in getattr(node, 'kw_defaults', ()):
+            if default is not None:
+                self.visit(default)
+
+    def visit_ClassDef(self, node):
+        self.names.binds.add(node.name)
+        for child in node.decorator_list + node.bases:
+            self.visit(child)
+        for keyword in getattr(node, 'keywords', ()):
+            self.visit(keyword.value)
+        # the class body runs now, and its methods whenever an instance is
+        # used; both are credited to the class
+        methods = Names()
+        for child in node.body:
+            visitor = _Visitor()
+            visitor.visit(child)
+            methods.reads |= visitor.names.reads - visitor.names.binds
+            methods.opaque = methods.opaque or visitor.names.opaque
+            methods.calls |= visitor.names.calls - visitor.names.binds
+            for names in visitor.deferred.values():
+                methods.update(names)
+        self.names.reads |= methods.reads
+        self.names.opaque = self.names.opaque or methods.opaque
+        self.names.calls |= methods.calls
+        self.deferred[node.name] = methods
+
+
+def _local_names(nodes):
+    """Return the names bound in ``nodes``, outside nested scopes.
+
+    The second item of the returned pair holds the names of the functions
+    and classes defined there.
+    """
+    local = set()
+    defined = set()
+    declared = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _scopes):
+            if not isinstance(node, ast.Lambda):
+                local.add(node.name)
+                defined.add(node.name)
+            continue
+        if isinstance(node, ast.Name) and \
+                not isinstance(node.ctx, ast.Load):
+            local.add(node.id)
+        elif _captured(node) is not None:
+            local.add(_captured(node))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                local.add(alias.asname or alias.name.partition('.')[0])
+        elif isinstance(node, ast.Global):
+            declared.update(node.names)
+        stack.extend(ast.iter_child_nodes(node))
+    return local - declared, defined - declared
+
+
+def _function_names(node):
+    """Return the global names the body of a function reads and binds."""
+    visitor = _Visitor()
+    body = node.body if isinstance(node.body, list) else [node.body]
+    for child in body:
+        visitor.visit(child)
+    local, defined = _local_names(body)
+    args = node.args
+    for arg in (list(args.args) + list(getattr(args, 'kwonlyargs', ())) +
+                list(getattr(args, 'posonlyargs', ()))):
+        local.add(getattr(arg, 'arg', None) or getattr(arg, 'id', None))
+    for arg in (args.vararg, args.kwarg):
+        if arg is not None:
+            local.add(getattr(arg, 'arg', arg))
+    result = visitor.names._without(local)
+    for names in visitor.deferred.values():
+        result.update(names._without(local))
+    # calling an argument, or any other local value but the functions and
+    # classes defined here, may do anything
+    if (visitor.names.calls & local) - defined:
+        result.opaque = True
+    return result
+
+
+def analyze(source):
+    """Return the :class:`Names` of the top-level statement ``source``.
+
+    Returns None if ``source`` cannot be parsed. The second item of the
+    returned pair maps the names of the functions and classes the
+    statement defines to the :class:`Names` of calling them.
+    """
+    # statements awaiting at the top level (see AsyncConsole) do not parse
+    # and are opaque, which they are: awaiting runs any task on the loop
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, TypeError):
+        return None
+    visitor = _Visitor(top=True)
+    for node in tree.body:
+        visitor.visit(node)
+    return visitor.names, visitor.deferred
+
+
+class Statement(object):
+    """A top-level statement of a snippet and its place among the others.
+
+    ``names`` is the statement's :class:`Names`, including those of the
+    functions it calls, or None if it could not be analysed; such a
+    statement is treated as opaque. ``depends`` is the set of indexes of
+    the earlier statements that bind a name it reads.
+    """
+
+    def __init__(self, index, source, names):
+        self.index = index
+        self.source = source
+        self.names = names
+        self.depends = set()
+
+    @property
+    def opaque(self):
+        return self.names is None or self.names.opaque
+
+
+def statements(sources):
+    """Analyse the top-level statements ``sources``, each a list of lines.
+
+    Returns a list of :class:`Statement`, with the dependencies of each on
+    earlier ones: a statement depends on every statement before it that
+    binds a name it reads, not only the last one, since binding may only
+    mean mutating; on every opaque statement before it; and, if it is
+    opaque, on every statement before it. Names not bound by any earlier
+    statement come from the context. Calling a name that is not a function
+    or class defined by an earlier statement, nor one of
+    :data:`PURE_CALLS`, is opaque: the context's functions may do anything.
+    """
+    result = []
+    writers = {}
+    effects = {}
+    barrier = None
+    for index, lines in enumerate(sources):
+        analysed = analyze(''.join(lines))
+        names = None
+        if analysed is not None:
+            names, deferred = analysed
+            # calling a function, or using an instance of a class, has the
+            # effects of its body, and of whatever that uses in turn,
+            # wherever the value was bound to a name
+            inherited = Names()
+            seen = set()
+            stack = list(names.reads)
+            while stack:
+                name = stack.pop()
+                if name in effects and name not in seen:
+                    seen.add(name)
+                    inherited.update(effects[name])
+                    stack.extend(effects[name].reads)
+            names.update(inherited)
+            if names.calls - set(effects) - set(deferred) - PURE_CALLS:
+                names.opaque = True
+            for name in names.binds:
+                if name in deferred:
+                    effects[name] = deferred[name]
+                elif inherited.reads or inherited.binds or \
+                        inherited.opaque:
+                    effects[name] = inherited
+                else:
+                    effects.pop(name, None)
+        statement = Statement(index, lines, names)
+        if statement.opaque:
+            statement.depends.update(range(index))
+        else:
+            for name in names.reads:
+                statement.depends.update(writers.get(name, ()))
+            if barrier is not None:
+                statement.depends.add(barrier)
+        if statement.opaque:
+            barrier = index
+        else:
+            for name in names.binds:
+                writers.setdefault(name, []).append(index)
+        result.append(statement)
+    return result
+
+
+def required(statements, misses):
+    """Return the indexes that must run so that ``misses`` can run.
+
+    That is ``misses`` and every statement they depend on, directly or
+    not.
+    """
+    result = set()
+    stack = list(misses)
+    while stack:
+        index = stack.pop()
+        if index in result:
+            continue
+        result.add(index)
+        stack.extend(statements[index].depends)
+    return result
+
+
+def sections(statements):
+    """Split ``statements`` into sections that do not depend on each other.
+
+    Returns a list of lists of indexes, each in order, ordered by their
+    first statement. Each section can run in its own copy of the context;
+    this gives the same results as running all the statements in order
+    only as far as the analysis sees: a method that changes more than its
+    object and arguments, for instance, goes unnoticed.
+    """
+    parent = list(range(len(statements)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for statement in statements:
+        for index in statement.depends:
+            parent[find(statement.index)] = find(index)
+    groups = {}
+    for statement in statements:
+        groups.setdefault(find(statement.index), []).append(statement.index)
+    return sorted(groups.values())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import re
+
+CHUNK_SIZE = 1024 * 1024
+
+_text = type(u'')
+
+
+def _compile(pattern, binary):
+    if binary:
+        pattern = pattern.encode('latin-1')
+    return re.compile(pattern, re.MULTILINE)
+
+
+class Dereplifier(object):
+    """Removes prompts from transcript text, a chunk of lines at a time.
+
+    Each chunk is rewritten with a few substitutions over the whole chunk,
+    instead of line by line. Lines that start with ``indent`` and a prompt
+    keep the indent but lose the prompt, empty lines get the indent, and
+    all other lines (output) are dropped. ``binary`` selects whether chunks
+    are bytes or text.
+
+    Every pattern starts with a literal newline, which ``re`` can search
+    for much faster than a multi-line ``^``; :meth:`sub` puts a newline in
+    front of the chunk so that its first line is matched too.
+    """
+
+    def __init__(self, indent, ps1='>>> ', ps2='... ', binary=False):
+        i = re.escape(indent)
+        p = '{0}|{1}'.format(re.escape(ps1), re.escape(ps2))
+        self.invalid = None
+        if indent:
+            self.invalid = _compile(r'\n(?!{0}|\r?\n|\Z)'.format(i), binary)
+        self.output = _compile(
+            r'\n{0}(?!{1}|\r?\n)[^\n]*(?=\n)'.format(i, p), binary)
+        self.empty = _compile(r'\n(?=\r?\n)', binary)
+        if binary:
+            indent = indent.encode('latin-1')
+            ps1 = ps1.encode('latin-1')
+            ps2 = ps2.encode('latin-1')
+            self.nothing = b''
+            self.newlines = b'\r\n'
+        else:
+            self.nothing = u''
+            self.newlines = u'\r\n'
+        newline = self.newlines[1:]
+        self.indent = indent
+        self.ps1 = ps1
+        self.ps2 = ps2
+        self.newline = newline
+        self.prompts = [(newline + indent + ps, newline + indent)
+                        for ps in (ps1, ps2)]
+        self.empty_line = newline + indent
+
+    def sub(self, chunk):
+        """Return ``chunk``, which must be whole lines, without prompts."""
+        chunk = self.newline + chunk
+        if self.invalid is not None:
+            m = self.invalid.search(chunk)
+            if m is not None:
+                raise ValueError('inconsistent indentation: {0!r}'.format(
+                    chunk[m.start() + 1:].splitlines()[0]))
+        chunk = self.output.sub(self.nothing, chunk)
+        for prompt, replacement in self.prompts:
+            chunk = chunk.replace(prompt, replacement)
+        if self.indent:
+            chunk = self.empty.sub(self.empty_line, chunk)
+        return chunk[1:]
+
+    def sub_line(self, line):
+        """Return a single ``line`` without its prompt.
+
+        This is used for a final line with no line ending, where the
+        substitutions in :meth:`sub` do not apply.
+        """
+        if not line.rstrip(self.newlines):
+            pass
+        elif line.startswith(self.indent):
+            line = line[len(self.indent):]
+        else:
+            raise ValueError('inconsistent indentation: {0!r}'.format(
+                line.rstrip(self.newlines)))
+        if line.startswith(self.ps1):
+            line = line[len(self.ps1):]
+        elif line.startswith(self.ps2):
+            line = line[len(self.ps2):]
+        elif line.rstrip(self.newlines):
+            line = self.nothing
+        if line:
+            line = self.indent + line
+        return line
+
+
+def _chunks(infile, head, chunk_size):
+    """Yield ``head`` and the contents of ``infile`` in whole lines.
+
+    Only the last chunk may lack a trailing newline.
+    """
+    if hasattr(infile, 'read'):
+        def read():
+            return infile.read(chunk_size)
+    else:
+        lines = iter(infile)
+
+        def read():
+            data = []
+            size = 0
+            for line in lines:
+                data.append(line)
+                size += len(line)
+                if size >= chunk_size:
+                    break
+            return head[:0].join(data)
+    rest = head
+    newline = None
+    while True:
+        data = read()
+        if not data:
+            break
+        if newline is None:
+            newline = u'\n' if isinstance(data, _text) else b'\n'
+        if rest:
+            data = rest + data
+        end = data.rfind(newline) + 1
+        rest = data[end:]
+        if end:
+            yield data[:end]
+    if rest:
+        yield rest
+
+
+def dereplify(infile, outfile, head='', chunk_size=CHUNK_SIZE, ps1='>>> ',
+              ps2='... '):
+    """Remove prompts from the transcript read from ``infile``.
+
+    The common indent is taken from the first line, which may already have
+    been read and passed as ``head``. Lines beginning with a prompt have
+    the prompt removed, empty lines are kept, and output lines are dropped.
+
+    ``infile`` may be a file-like object with a ``read`` method, such as an
+    open file or an ``mmap``, or any iterable of lines. It is processed in
+    chunks of about ``chunk_size`` characters, so memory use does not
+    depend on the size of the input. If ``infile`` returns bytes, so must
+    ``head``, and bytes are written to ``outfile``.
+    """
+    dereplifier = None
+    for chunk in _chunks(infile, head, chunk_size):
+        if dereplifier is None:
+            binary = not isinstance(chunk, _text)
+            first = chunk.splitlines()[0]
+            if binary:
+                indent = re.match(br'\s*', first).group(0).decode('latin-1')
+            else:
+                indent = re.match(r'\s*', first).group(0)
+            dereplifier = Dereplifier(indent, ps1, ps2, binary)
+        if chunk.endswith(dereplifier.newline):
+            outfile.write(dereplifier.sub(chunk))
+        else:
+            end = chunk.rfind(dereplifier.newline) + 1
+            outfile.write(dereplifier.sub(chunk[:end]))
+            outfile.write(dereplifier.sub_line(chunk[end:]))
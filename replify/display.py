@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import sys
+import threading
+from timeit import default_timer as timer
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+FILL = '...'
+
+_formatters = {}
+
+
+def register(cls, formatter):
+    """Format instances of ``cls`` with ``formatter`` in every Display.
+
+    ``cls`` is a type, which also covers its subclasses, or the dotted name
+    of one (such as ``'numpy.ndarray'``), so that formatters for types
+    from modules that may not be imported can be registered without
+    importing them. ``formatter`` is called with the value, the
+    :class:`Display` and the remaining depth, and returns a string; it can
+    format the items of a container with :meth:`Display.format_item`,
+    passing one less than the depth it was given.
+    """
+    _formatters[cls] = formatter
+
+
+def _type_name(cls):
+    return '{0}.{1}'.format(
+        cls.__module__, getattr(cls, '__qualname__', cls.__name__))
+
+
+def _sequence(left, right, trail=''):
+    def format(value, display, level):
+        return display.format_items(value, level, left, right, trail)
+    return format
+
+
+def _format_dict(value, display, level):
+    if not value:
+        return '{}'
+
+    def format(item):
+        return '{0}: {1}'.format(display.format_item(item[0], level - 1),
+                                 display.format_item(item[1], level - 1))
+    return display.join(value, level, '{', '}', value.items(), format)
+
+
+def _format_string(value, display, level):
+    if len(value) <= display.maxstring:
+        return repr(value)
+    # keep the start and the end, like reprlib
+    i = max(0, (display.maxstring - len(FILL)) // 2)
+    j = max(0, display.maxstring - len(FILL) - i)
+    s = repr(value[:i] + value[len(value) - j:])
+    return s[:i] + FILL + s[len(s) - j:]
+
+
+def _format_int(value, display, level):
+    # converting a huge int to decimal takes quadratic time
+    if value.bit_length() > display.maxother * 4:
+        return '<int of {0} bits>'.format(value.bit_length())
+    return display.truncate(repr(value))
+
+
+def _format_ndarray(value, display, level):
+    import numpy
+    options = numpy.get_printoptions()
+    numpy.set_printoptions(
+        threshold=min(options['threshold'], display.maxitems))
+    try:
+        return display.truncate(repr(value))
+    finally:
+        numpy.set_printoptions(**options)
+
+
+_builtin_formatters = {
+    list: _sequence('[', ']'),
+    tuple: _sequence('(', ')', ','),
+    set: _sequence('{', '}'),
+    frozenset: _sequence('frozenset({', '})'),
+    dict: _format_dict,
+    str: _format_string,
+    bytes: _format_string,
+    type(u''): _format_string,
+    int: _format_int,
+}
+if sys.version_info[0] < 3:
+    _builtin_formatters[long] = _format_int     # noqa
+    _builtin_formatters[set] = _sequence('set([', '])')
+    _builtin_formatters[frozenset] = _sequence('frozenset([', '])')
+
+register('numpy.ndarray', _format_ndarray)
+
+
+class _State(threading.local):
+    """What a Display is formatting, per thread."""
+
+    deadline = None
+
+    def __init__(self):
+        self.active = set()
+
+
+class Display(object):
+    """Formats displayed values with a bounded length and depth.
+
+    Like :mod:`reprlib`, but a value within the bounds is shown exactly as
+    its ``repr``. Lists, tuples, sets and dicts show at most ``maxitems``
+    items, nested at most ``maxlevel`` deep, and ``...`` in place of the
+    rest. Strings are cut to ``maxstring`` characters, and the ``repr`` of
+    other values to ``maxother``. Only exact builtin types are formatted
+    this way; instances of their subclasses use their own ``repr``.
+
+    Formatters registered with :func:`register`, or with :meth:`register`
+    for this Display only, take precedence over the builtin ones and over
+    ``repr``. ``budget`` is a time limit in seconds for formatting one
+    value: once it has passed, the remaining items of containers are left
+    out. It is checked between items, so a single slow ``repr`` is not
+    interrupted. A Display can be shared by sessions running in several
+    threads.
+    """
+
+    def __init__(self, maxlevel=6, maxitems=100, maxstring=1000,
+                 maxother=1000, budget=None):
+        self.maxlevel = maxlevel
+        self.maxitems = maxitems
+        self.maxstring = maxstring
+        self.maxother = maxother
+        self.budget = budget
+        self.formatters = {}
+        self._cache = {}
+        self._state = _State()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_cache'], state['_state']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = {}
+        self._state = _State()
+
+    def __repr__(self):
+        names = sorted(
+            cls if isinstance(cls, str) else _type_name(cls)
+            for cls in list(_formatters) + list(self.formatters))
+        return 'Display(maxlevel={0!r}, maxitems={1!r}, maxstring={2!r}, ' \
+            'maxother={3!r}, budget={4!r}, formatters={5!r})'.format(
+                self.maxlevel, self.maxitems, self.maxstring,
+                self.maxother, self.budget, names)
+
+    def register(self, cls, formatter):
+        """Like :func:`register`, but for this Display only."""
+        self.formatters[cls] = formatter
+        self._cache.clear()
+
+    def _formatter(self, cls):
+        registries = (self.formatters, _formatters)
+        for base in getattr(cls, '__mro__', (cls,)):
+            name = _type_name(base)
+            for formatters in registries:
+                formatter = formatters.get(base) or formatters.get(name)
+                if formatter is not None:
+                    return formatter
+            if base is cls and cls in _builtin_formatters:
+                return _builtin_formatters[cls]
+        return None
+
+    def format(self, value):
+        """Return the bounded representation of ``value``."""
+        state = self._state
+        if self.budget is not None:
+            state.deadline = timer() + self.budget
+        try:
+            return self.format_item(value, self.maxlevel)
+        finally:
+            state.deadline = None
+            state.active.clear()
+
+    def format_item(self, value, level):
+        """Format ``value``, nested ``level`` levels above the depth limit."""
+        cls = type(value)
+        try:
+            formatter = self._cache[cls]
+        except KeyError:
+            formatter = self._cache[cls] = self._formatter(cls)
+        if formatter is None:
+            return self.truncate(repr(value))
+        return formatter(value, self, level)
+
+    def format_items(self, value, level, left, right, trail=''):
+        """Format the container ``value``, between ``left`` and ``right``.
+
+        ``trail`` follows a single item, as the comma of a 1-tuple does.
+        """
+        if not value:
+            return repr(value)
+        if len(value) == 1:
+            right = trail + right
+
+        def format(item):
+            return self.format_item(item, level - 1)
+        return self.join(value, level, left, right, value, format)
+
+    def join(self, value, level, left, right, items, format):
+        """Format the container ``value`` from its ``items``.
+
+        Each item is formatted with ``format``, and the results are joined
+        with commas between ``left`` and ``right``. Items beyond
+        ``maxitems``, or left when the time budget has run out, are not
+        formatted but shown as ``...``; a container below the depth limit,
+        or already being formatted further up, is shown as ``...`` as a
+        whole.
+        """
+        active = self._state.active
+        if level <= 0 or id(value) in active:
+            return left + FILL + right
+        active.add(id(value))
+        try:
+            shown = []
+            for item in items:
+                if len(shown) >= self.maxitems or self.expired():
+                    shown.append(FILL)
+                    break
+                shown.append(format(item))
+        finally:
+            active.discard(id(value))
+        return left + ', '.join(shown) + right
+
+    def expired(self):
+        """Whether the time budget for the current value has run out."""
+        deadline = self._state.deadline
+        return deadline is not None and timer() > deadline
+
+    def truncate(self, text):
+        """Cut ``text`` to ``maxother`` characters, keeping both ends."""
+        if len(text) <= self.maxother:
+            return text
+        i = max(0, (self.maxother - len(FILL)) // 2)
+        j = max(0, self.maxother - len(FILL) - i)
+        return text[:i] + FILL + text[len(text) - j:]
+
+    def displayhook(self, value):
+        """Display ``value`` like ``sys.displayhook``, but bounded.
+
+        Returns the text written, without the newline.
+        """
+        if value is None:
+            return None
+        builtins._ = None
+        text = self.format(value)
+        sys.stdout.write(text + '\n')
+        builtins._ = value
+        return text
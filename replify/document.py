@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import io
+import os
+import re
+import stat
+import tempfile
+
+from replify import trace
+from replify.replify import Session, execute, ps1, ps2
+from replify.results import text
+
+PYTHON_LANGUAGES = frozenset(
+    ['python', 'python3', 'py', 'py3', 'pycon', 'pycon3'])
+
+BLANKLINE = '<BLANKLINE>'
+
+_rst_directive = re.compile(
+    r'\s*\.\.\s+(?:(?:code-block|code|sourcecode)::\s*(\S*)|(doctest)::)')
+_md_fence = re.compile(r'\s*(`{3,}|~{3,})\s*([^\s`{]*)')
+
+
+class _Lines(object):
+    """An iterator over lines that can look one line ahead."""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._next = None
+
+    def peek(self):
+        """Return the next line without consuming it, or None at the end."""
+        if self._next is None:
+            self._next = next(self._lines, None)
+        return self._next
+
+    def pop(self):
+        line = self.peek()
+        self._next = None
+        return line
+
+
+def _blank(line):
+    return not line.strip()
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip())
+
+
+def rst_blocks(lines):
+    """Split reStructuredText ``lines`` into text and python code.
+
+    Yields ``(lines, is_code)`` pairs in document order. Code is the
+    content of ``code-block``, ``code`` and ``sourcecode`` directives for
+    python (or ``pycon``), of ``doctest`` directives, and doctest blocks
+    (paragraphs starting with a prompt). The content of directives for
+    other languages is text, even if it looks like a doctest block.
+    """
+    lines = _Lines(lines)
+    text = []
+    after_blank = True
+    while lines.peek() is not None:
+        line = lines.pop()
+        match = _rst_directive.match(line)
+        if match:
+            text.append(line)
+            depth = _indent(line)
+            block = []
+            while lines.peek() is not None and (
+                    _blank(lines.peek()) or _indent(lines.peek()) > depth):
+                block.append(lines.pop())
+            language = (match.group(1) or match.group(2)).lower()
+            if language in PYTHON_LANGUAGES or language == 'doctest':
+                # options are the lines up to the first blank line
+                options = 0
+                while options < len(block) and not _blank(block[options]):
+                    options += 1
+                text.extend(block[:options])
+                block = block[options:]
+                if not all(map(_blank, block)):
+                    yield text, False
+                    text = []
+                    yield block, True
+                    after_blank = True
+                    continue
+            text.extend(block)
+            after_blank = not block or _blank(block[-1])
+        elif after_blank and line.lstrip().startswith(ps1.rstrip()):
+            block = [line]
+            while lines.peek() is not None and not _blank(lines.peek()):
+                block.append(lines.pop())
+            yield text, False
+            text = []
+            yield block, True
+            after_blank = False
+        else:
+            text.append(line)
+            after_blank = _blank(line)
+    yield text, False
+
+
+def markdown_blocks(lines):
+    """Split Markdown ``lines`` into text and python code.
+
+    Yields ``(lines, is_code)`` pairs in document order. Code is the
+    content of fenced code blocks whose info string starts with
+    ``python``, ``py`` or ``pycon``.
+    """
+    lines = _Lines(lines)
+    text = []
+    while lines.peek() is not None:
+        line = lines.pop()
+        text.append(line)
+        match = _md_fence.match(line)
+        if not match:
+            continue
+        fence = match.group(1)
+        closing = re.compile(r'\s*{0}{{{1},}}\s*$'.format(
+            re.escape(fence[0]), len(fence)))
+        block = []
+        while lines.peek() is not None and not closing.match(lines.peek()):
+            block.append(lines.pop())
+        if (match.group(2).lower() in PYTHON_LANGUAGES and
+                not all(map(_blank, block))):
+            yield text, False
+            text = []
+            yield block, True
+        else:
+            text.extend(block)
+        if lines.peek() is not None:
+            text.append(lines.pop())
+    yield text, False
+
+
+FORMATS = {
+    'rst': rst_blocks,
+    'markdown': markdown_blocks,
+}
+
+
+def document_format(path):
+    """Return the format of the document at ``path``, by its extension."""
+    if os.path.splitext(path)[1].lower() in ('.md', '.markdown'):
+        return 'markdown'
+    return 'rst'
+
+
+def _source(lines, indent):
+    """Return the source lines of the transcript in ``lines``.
+
+    Output lines are dropped; empty lines are kept, as empty statements.
+    As in doctest, a ``...`` line only continues a statement if it follows
+    its other lines directly, so ``...`` in a traceback is output.
+    """
+    prompts = (ps1,)
+    for line in lines:
+        if line.startswith(indent):
+            line = line[len(indent):]
+        elif not _blank(line):
+            raise ValueError('inconsistent indentation: {0!r}'.format(
+                line.rstrip('\r\n')))
+        for prompt in prompts:
+            if line.startswith(prompt) or line.rstrip() == prompt.rstrip():
+                yield line[len(prompt):] or '\n'
+                prompts = (ps1, ps2)
+                break
+        else:
+            prompts = (ps1,)
+            if _blank(line):
+                yield '\n'
+
+
+def _write_result(result, outfile, indent):
+    if all(map(_blank, result.source)):
+        outfile.write('\n' * len(result.source))
+        return
+    prompt = ps1
+    for line in result.source:
+        if _blank(line):
+            outfile.write(indent + prompt.rstrip() + '\n')
+        else:
+            outfile.write(indent + prompt + line)
+        prompt = ps2
+    for line in text(result.output).splitlines():
+        outfile.write(indent + (line or BLANKLINE) + '\n')
+
+
+def replify_block(lines, outfile, session, lineno, transcripts_only=False):
+    """Execute a code block in ``session``, writing it as a transcript.
+
+    Empty lines around the block are kept as they are. A block that is
+    already a transcript is executed again from its source lines. Empty
+    statements are written as empty lines, and empty output lines as
+    ``<BLANKLINE>``, so that the transcript is a valid doctest block. With
+    ``transcripts_only``, a block that is not a transcript is executed for
+    its effects only, and written as it is.
+    """
+    start = 0
+    while _blank(lines[start]):
+        outfile.write(lines[start])
+        start += 1
+    end = len(lines)
+    while _blank(lines[end - 1]):
+        end -= 1
+    block = [line if line.endswith('\n') else line + '\n'
+             for line in lines[start:end]]
+    indent = block[0][:_indent(block[0])]
+    transcript = block[0][len(indent):].startswith(ps1.rstrip())
+    try:
+        if transcript:
+            source = list(_source(block, indent))
+        else:
+            source = block
+        # the block ends as if followed by an empty line, which completes
+        # a compound statement at its end and is otherwise not shown
+        extra = len(source) + 1
+        for result in execute(source + ['\n'], None, session=session):
+            if transcripts_only and not transcript:
+                continue
+            if result.lineno == extra and all(map(_blank, result.source)):
+                continue
+            _write_result(result, outfile, indent)
+    except ValueError as err:
+        raise ValueError('line {0}: {1}'.format(lineno + start, err))
+    if transcripts_only and not transcript:
+        for line in lines[start:end]:
+            outfile.write(line)
+    for line in lines[end:]:
+        outfile.write(line)
+
+
+def replify_document(infile, outfile, context, format='rst',
+                     console_type=None, limits=None, display=None,
+                     transcripts_only=False):
+    """Execute the python code blocks of a document, writing the document.
+
+    The document is read from ``infile``, an iterable of lines, in the
+    given ``format`` ('rst' or 'markdown'; see :func:`rst_blocks` and
+    :func:`markdown_blocks` for what counts as code). Everything but the
+    code blocks is written to ``outfile`` unchanged, and each code block
+    is replaced by its transcript. All blocks run in order in one console,
+    with ``context`` as its namespace, so that later blocks see the names
+    defined by earlier ones; the session is closed at the end (see
+    :meth:`replify.replify.Session.close`). ``console_type``, ``limits``
+    and ``display`` are as for :func:`replify.replify.execute`. With
+    ``transcripts_only``, code blocks that are not transcripts still run,
+    but are left as they are (see :func:`replify_block`).
+    """
+    session = Session(context, console_type, limits, display=display)
+    try:
+        lineno = 1
+        for lines, is_code in FORMATS[format](infile):
+            if is_code:
+                replify_block(lines, outfile, session, lineno,
+                              transcripts_only)
+            else:
+                for line in lines:
+                    outfile.write(line)
+            lineno += len(lines)
+    finally:
+        session.close()
+
+
+class _Chunks(list):
+    write = list.append
+
+
+def rewrite_document(path, context, format=None, console_type=None,
+                     limits=None, display=None):
+    """Replace the code blocks of the document at ``path`` in place.
+
+    The file is read once, processed with :func:`replify_document` and,
+    if anything changed, written once, to a temporary file that then
+    replaces it, so that an error leaves the document as it was.
+    ``format`` defaults to the one given by :func:`document_format`.
+    Returns whether the document changed.
+    """
+    if format is None:
+        format = document_format(path)
+    with trace.span('rewrite document', 'batch', {'path': path}):
+        with io.open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        chunks = _Chunks()
+        replify_document(text.splitlines(True), chunks, context, format,
+                         console_type, limits, display)
+    data = u''.join(chunks)
+    if data == text:
+        return False
+    fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                   prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data.encode('utf-8'))
+        os.chmod(tmppath, stat.S_IMODE(os.stat(path).st_mode))
+        os.rename(tmppath, path)
+    except BaseException:
+        os.unlink(tmppath)
+        raise
+    return True
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import sys
+import signal
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+
+TRUNCATED = '[output truncated: {0} characters omitted]\n'
+
+
+class LimitExceeded(BaseException):
+    """A statement ran past a time limit or ran out of memory.
+
+    Like KeyboardInterrupt, this is not an Exception, so that a snippet
+    catching Exception does not keep a runaway statement going.
+    """
+
+
+class Limits(object):
+    """Per-statement limits on wall-clock time, CPU time, memory and output.
+
+    ``timeout`` and ``cpu_time`` are in seconds, ``memory`` in bytes; None
+    means no limit. A statement that exceeds a limit is interrupted, and
+    its traceback in the transcript is replaced by one for
+    :class:`LimitExceeded`. With ``abort`` true, :func:`replify` then stops
+    and raises LimitExceeded instead of going on with the next statement.
+
+    Time limits use interval timers and signals, so they only work in the
+    main thread. The memory limit caps the address space of the whole
+    process (``RLIMIT_AS``) while a statement runs; run snippets with
+    ``--fork`` to keep this from affecting the process holding the context.
+
+    ``output`` and ``total_output`` are the number of characters of output
+    kept for each statement, and for all the statements of a snippet.
+    Output beyond them is dropped, without interrupting the statement, and
+    a :data:`TRUNCATED` line says how much was left out. A statement's
+    output beyond ``spill`` characters is kept in a temporary file instead
+    of memory until it has been rendered.
+    """
+
+    def __init__(self, timeout=None, cpu_time=None, memory=None, abort=False,
+                 output=None, total_output=None, spill=None):
+        self.timeout = timeout
+        self.cpu_time = cpu_time
+        self.memory = memory
+        self.abort = abort
+        self.output = output
+        self.total_output = total_output
+        self.spill = spill
+
+    def __repr__(self):
+        return 'Limits(timeout={0!r}, cpu_time={1!r}, memory={2!r}, ' \
+            'abort={3!r}, output={4!r}, total_output={5!r}, ' \
+            'spill={6!r})'.format(
+                self.timeout, self.cpu_time, self.memory, self.abort,
+                self.output, self.total_output, self.spill)
+
+    def guard(self, console):
+        """Return a context manager enforcing the limits on ``console``."""
+        return StatementGuard(self, console)
+
+
+class StatementGuard(object):
+    """Enforces :class:`Limits` on the statement run inside a with block.
+
+    After the block, ``exceeded`` is the LimitExceeded raised in the
+    statement, if any.
+    """
+
+    def __init__(self, limits, console):
+        self.limits = limits
+        self.console = console
+        self.exceeded = None
+        self._active = False
+        self._handlers = []
+        self._rlimit = None
+
+    def _timer(self, signum, which, seconds, what):
+        def expired(signum, frame):
+            if self._active:
+                raise LimitExceeded(
+                    'statement exceeded the {0} limit of {1:g}s'.format(
+                        what, seconds))
+        self._handlers.append(
+            (signum, which, signal.signal(signum, expired)))
+        signal.setitimer(which, seconds)
+
+    def _showtraceback(self):
+        type, value = sys.exc_info()[:2]
+        if type is MemoryError and self.limits.memory is not None:
+            value = LimitExceeded(
+                'statement exceeded the memory limit of {0:g}MB'.format(
+                    float(self.limits.memory) / MB))
+        elif not isinstance(value, LimitExceeded):
+            return self._original_showtraceback()
+        self.exceeded = value
+        self.console.write('Traceback (most recent call last):\n  ...\n')
+        self.console.write('LimitExceeded: {0}\n'.format(value))
+
+    def __enter__(self):
+        limits = self.limits
+        self.exceeded = None
+        self._patched = 'showtraceback' in vars(self.console)
+        self._original_showtraceback = self.console.showtraceback
+        self.console.showtraceback = self._showtraceback
+        if limits.memory is not None and resource is not None:
+            self._rlimit = resource.getrlimit(resource.RLIMIT_AS)
+            hard = self._rlimit[1]
+            soft = limits.memory
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+        self._active = True
+        if limits.timeout is not None:
+            self._timer(signal.SIGALRM, signal.ITIMER_REAL, limits.timeout,
+                        'time')
+        if limits.cpu_time is not None:
+            self._timer(signal.SIGPROF, signal.ITIMER_PROF, limits.cpu_time,
+                        'CPU time')
+        return self
+
+    def __exit__(self, type, value, tb):
+        self._active = False
+        while self._handlers:
+            signum, which, handler = self._handlers.pop()
+            signal.setitimer(which, 0)
+            signal.signal(signum, handler)
+        if self._rlimit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, self._rlimit)
+            self._rlimit = None
+        if self._patched:
+            self.console.showtraceback = self._original_showtraceback
+        else:
+            del self.console.showtraceback
+        # A timer that expires just as the statement finishes may interrupt
+        # the console after it has handled the statement's exceptions; the
+        # statement did complete, so ignore it.
+        return type is LimitExceeded
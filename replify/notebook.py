@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import re
+import json
+import codecs
+import platform
+
+from replify import results
+
+CHUNK_SIZE = 64 * 1024
+
+_whitespace = re.compile(r'\s*')
+
+
+def _lines(text):
+    """Split ``text`` into lines the way nbformat stores multi-line text."""
+    return text.splitlines(True)
+
+
+def _blank(result):
+    return not ''.join(result.source).strip()
+
+
+class NotebookRenderer(object):
+    """Writes results to ``outfile`` as a Jupyter notebook (nbformat 4).
+
+    Statements are grouped into one code cell per run of statements
+    between empty lines. Each cell gets the statements' output as stream
+    outputs, an execution count and, in its ``replify`` metadata, the time
+    taken to execute it. Cells are written as they are completed, so the
+    notebook is never held in memory; it is only valid JSON once
+    :meth:`finish` has been called. Nothing is written before the first
+    result, so the renderer may be created before forking. The ``indent``
+    argument is accepted for compatibility with
+    :class:`replify.results.TextRenderer` and ignored.
+    """
+
+    def __init__(self, outfile, indent=''):
+        self.outfile = outfile
+        self.count = 0
+        self._cell = None
+        self._started = False
+
+    def _start(self):
+        if not self._started:
+            self._started = True
+            self.outfile.write('{\n "cells": [')
+
+    def write(self, result):
+        self._start()
+        if _blank(result):
+            self._end_cell()
+            return
+        if self._cell is None:
+            self._cell = {'source': [], 'outputs': [], 'elapsed': 0.0}
+        cell = self._cell
+        cell['source'].extend(result.source)
+        cell['elapsed'] += result.elapsed
+        # consecutive writes to the same stream are merged, like Jupyter
+        # does; otherwise stdout and stderr are kept apart
+        for name in ('stdout', 'stderr'):
+            text = results.text(getattr(result, name))
+            if not text:
+                continue
+            outputs = cell['outputs']
+            if outputs and outputs[-1]['name'] == name:
+                outputs[-1]['text'] += text
+            else:
+                outputs.append({'name': name, 'text': text})
+
+    def _end_cell(self):
+        cell = self._cell
+        if cell is None:
+            return
+        self._cell = None
+        source = ''.join(cell['source']).rstrip('\n')
+        self.count += 1
+        data = {
+            'cell_type': 'code',
+            'execution_count': self.count,
+            'metadata': {'replify': {'elapsed': cell['elapsed']}},
+            'outputs': [
+                {'name': output['name'], 'output_type': 'stream',
+                 'text': _lines(output['text'])}
+                for output in cell['outputs']
+            ],
+            'source': _lines(source),
+        }
+        text = json.dumps(data, indent=1, sort_keys=True)
+        self.outfile.write('{0}\n  {1}'.format(
+            ',' if self.count > 1 else '', text.replace('\n', '\n  ')))
+
+    def finish(self):
+        """End the last cell and write the rest of the notebook."""
+        self._start()
+        self._end_cell()
+        major = platform.python_version_tuple()[0]
+        metadata = {
+            'kernelspec': {
+                'display_name': 'Python {0}'.format(major),
+                'language': 'python',
+                'name': 'python{0}'.format(major),
+            },
+            'language_info': {
+                'name': 'python',
+                'version': platform.python_version(),
+            },
+        }
+        self.outfile.write('\n ],\n "metadata": {0},\n'.format(
+            json.dumps(metadata, indent=1, sort_keys=True).replace(
+                '\n', '\n ')))
+        self.outfile.write(' "nbformat": 4,\n "nbformat_minor": 4\n}\n')
+        self.outfile.flush()
+
+
+class _Reader(object):
+    """Decodes JSON values one at a time from a file read in chunks."""
+
+    def __init__(self, infile, chunk_size):
+        self.infile = infile
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = u''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        # read at least as much as is buffered, so that a large value is
+        # not decoded over and over again
+        data = self.infile.read(
+            max(self.chunk_size, len(self.buf) - self.pos))
+        if not isinstance(data, type(u'')):
+            data = self.text_decoder.decode(data, not data)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character, or '' at the end."""
+        while True:
+            self.pos = _whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError('invalid notebook: expected {0!r}, got {1!r}'
+                             .format(char, found))
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self._fill():
+                    continue
+                raise
+            # a number may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def read_cells(infile, chunk_size=CHUNK_SIZE):
+    """Yield the cells of the notebook read from ``infile``, one at a time.
+
+    The notebook is decoded as it is read, so only one cell is held in
+    memory at a time.
+    """
+    reader = _Reader(infile, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'cells':
+            reader.expect('[')
+            while reader.peek() != ']':
+                yield reader.value()
+                if reader.peek() != ']':
+                    reader.expect(',')
+            reader.expect(']')
+        else:
+            reader.value()
+        if reader.peek() == '}':
+            return
+        reader.expect(',')
+
+
+def notebook_lines(infile, chunk_size=CHUNK_SIZE):
+    """Yield the source lines of the code cells of a notebook.
+
+    Cells are separated by an empty line, so that a statement never runs
+    on from one cell into the next. Other cells are skipped.
+    """
+    for cell in read_cells(infile, chunk_size):
+        if cell.get('cell_type') != 'code':
+            continue
+        source = cell.get('source', '')
+        if not isinstance(source, type(u'')):
+            source = ''.join(source)
+        source = source.rstrip('\n')
+        if not source.strip():
+            continue
+        for line in _lines(source + '\n'):
+            yield line
+        yield '\n'
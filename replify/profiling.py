@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import json
+import pstats
+import cProfile
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+TOP = 20
+CALLS_PER_STATEMENT = 10
+
+
+class Profiler(object):
+    """Measures each statement with cProfile and tracemalloc, if enabled.
+
+    Every statement's wall time is always recorded, in the result's
+    ``elapsed``. With ``calls`` true, each statement runs under cProfile
+    and the functions it spent the most time in are recorded; with
+    ``memory`` true, the peak amount of memory allocated while it ran is
+    recorded using tracemalloc (python 3.4+). The measurements are stored
+    in the result's ``profile`` dict.
+    """
+
+    def __init__(self, calls=False, memory=False):
+        if memory and tracemalloc is None:
+            raise ValueError('memory profiling requires tracemalloc')
+        self.calls = calls
+        self.memory = memory
+
+    def start(self):
+        """Start measuring a statement; returns a token for :meth:`stop`."""
+        profile = None
+        memory = None
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            memory = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        if self.calls:
+            profile = cProfile.Profile()
+            profile.enable()
+        return profile, memory
+
+    def stop(self, token, data):
+        """Stop measuring, adding the measurements to the dict ``data``.
+
+        A statement executed in several steps accumulates measurements
+        from each of them.
+        """
+        profile, memory = token
+        if profile is not None:
+            profile.disable()
+            calls = dict(data.get('calls', ()))
+            for label, tottime in _function_times(profile):
+                calls[label] = calls.get(label, 0.0) + tottime
+            data['calls'] = sorted(
+                calls.items(), key=lambda item: -item[1]
+            )[:CALLS_PER_STATEMENT]
+        if memory is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            if not hasattr(tracemalloc, 'reset_peak'):
+                # before python 3.9, only the net allocation is known
+                peak = current
+            data['memory'] = max(data.get('memory', 0), peak - memory)
+
+    def finish(self):
+        """Stop tracing memory allocations, if they were traced."""
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _function_times(profile):
+    stats = pstats.Stats(profile).stats
+    for (filename, lineno, name), (cc, nc, tt, ct, callers) in stats.items():
+        if filename == '~':
+            label = name
+        else:
+            label = '{0}:{1}({2})'.format(filename, lineno, name)
+        yield label, tt
+
+
+class ProfileCollector(object):
+    """A renderer that keeps the measurements of each statement.
+
+    ``entries`` is a list of dicts with the ``path`` (``path`` given
+    here), ``lineno``, ``source``, ``elapsed`` and any profile measurements
+    of each statement, for :func:`write_report`. Blank statements are
+    skipped.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = []
+
+    def write(self, result):
+        source = ''.join(result.source)
+        if not source.strip():
+            return
+        entry = {
+            'path': self.path,
+            'lineno': result.lineno,
+            'source': source,
+            'elapsed': result.elapsed,
+        }
+        if result.profile:
+            entry.update(result.profile)
+        self.entries.append(entry)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        pass
+
+
+def report(entries, top=TOP):
+    """Rank the statements in ``entries`` (from :class:`ProfileCollector`).
+
+    Returns a dict with the ``top`` slowest ``statements``, the ``top``
+    statements that allocated the most memory (``allocators``), and the
+    ``top`` ``functions`` that the statements spent the most time in, over
+    all entries.
+    """
+    def ranked(key, entries):
+        return sorted(entries, key=lambda e: -e[key])[:top]
+
+    functions = {}
+    for entry in entries:
+        for label, tottime in entry.get('calls', ()):
+            functions[label] = functions.get(label, 0.0) + tottime
+    return {
+        'total': sum(entry['elapsed'] for entry in entries),
+        'statements': ranked('elapsed', entries),
+        'allocators': ranked(
+            'memory', [e for e in entries if e.get('memory')]),
+        'functions': [
+            {'function': label, 'time': time}
+            for label, time in sorted(
+                functions.items(), key=lambda item: -item[1])[:top]
+        ],
+    }
+
+
+def _location(entry):
+    if entry['path'] is None:
+        return 'line {0}'.format(entry['lineno'])
+    return '{0}:{1}'.format(entry['path'], entry['lineno'])
+
+
+def _first_line(entry):
+    return entry['source'].strip().splitlines()[0]
+
+
+def write_report(entries, stream, top=TOP, format='text'):
+    """Write a ranked report of ``entries`` to ``stream``.
+
+    ``format`` is 'text', or 'json' for the dict returned by
+    :func:`report`.
+    """
+    data = report(entries, top)
+    if format == 'json':
+        json.dump(data, stream, indent=1, sort_keys=True)
+        stream.write('\n')
+        return
+    stream.write('{0} statements, {1:.3f}s\n'.format(
+        len(entries), data['total']))
+    stream.write('\nSlowest statements:\n')
+    for entry in data['statements']:
+        stream.write('{0:10.6f}s  {1}  {2}\n'.format(
+            entry['elapsed'], _location(entry), _first_line(entry)))
+    if data['allocators']:
+        stream.write('\nBiggest allocators:\n')
+        for entry in data['allocators']:
+            stream.write('{0:10.1f}KB  {1}  {2}\n'.format(
+                entry['memory'] / 1024.0, _location(entry),
+                _first_line(entry)))
+    if data['functions']:
+        stream.write('\nFunctions with the most time:\n')
+        for function in data['functions']:
+            stream.write('{0:10.6f}s  {1}\n'.format(
+                function['time'], function['function']))
@@ -1,23 +1,55 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
 import os
 import re
 import sys
+import ast
 import code
+import atexit
+import json
+import pickle
+import signal
+import hashlib
 import traceback
 import argparse
+import itertools
+from timeit import default_timer as timer
+
+from replify import capture, deps, trace
+from replify.dereplify import dereplify
+from replify.segment import Segmenter, uses_default_push
+from replify.limits import Limits, LimitExceeded, MB, TRUNCATED
+from replify.results import (
+    StatementResult, OutputBuffer, TextRenderer, JSONLinesRenderer,
+    BUFFER_SIZE)
+from replify.results import BufferedIndentifier     # noqa
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
 
 ps1 = '>>> '
 ps2 = '... '
 
+# compiler flag allowing await outside functions (python 3.8+), or None
+TOP_LEVEL_AWAIT = getattr(ast, 'PyCF_ALLOW_TOP_LEVEL_AWAIT', None)
+CO_COROUTINE = 0x0080
+
 if sys.version_info[0] >= 3:
     def import_module(name):
         from importlib import import_module
         return import_module(name)
 
+    def reload_module(module):
+        from importlib import reload
+        return reload(module)
+
     def import_file(path):
         from importlib.machinery import SourceFileLoader
-        name, _ = os.path.splitext(os.path.basename(config.context_file))
+        name, _ = os.path.splitext(os.path.basename(path))
         return SourceFileLoader(name, path).load_module()
 
 else:
@@ -26,12 +58,107 @@ else:
         fp, pathname, desc = find_module(name)
         return load_module(name, fp, pathname, desc)
 
+    def reload_module(module):
+        return reload(module)     # noqa
+
     def import_file(path):
         from imp import load_source
-        name, _ = os.path.splitext(os.path.basename(config.context_file))
+        name, _ = os.path.splitext(os.path.basename(path))
         return load_source(name, path)
 
 
+class Context(object):
+    """A context module, imported once and shared between snippets.
+
+    Each call to :meth:`namespace` returns a fresh shallow copy of the
+    module's ``__dict__``, so that names bound by one snippet do not leak
+    into the next. :meth:`refresh` re-imports the context if its source
+    file has been modified since it was loaded. ``digest`` identifies the
+    context's source, for use in cache keys.
+    """
+
+    def __init__(self, context_file=None, context_module=None):
+        if context_file and context_module:
+            raise ValueError(
+                'only one of context_file or context_module may be specified')
+        self.context_file = context_file
+        self.context_module = context_module
+        self.module = None
+        self.mtime = None
+        self.digest = ''
+        self.load()
+
+    @property
+    def path(self):
+        """Path of the context's source file, or None."""
+        if self.context_file:
+            return self.context_file
+        path = getattr(self.module, '__file__', None)
+        if path and path.endswith(('.pyc', '.pyo')):
+            path = path[:-1]
+        return path
+
+    def _source_mtime(self):
+        path = self.path
+        if path is None:
+            return None
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def load(self):
+        with trace.span('import context', 'context', {
+                'file': self.context_file, 'module': self.context_module}):
+            if self.context_file:
+                self.module = import_file(self.context_file)
+            elif self.context_module:
+                if self.module is None:
+                    self.module = import_module(self.context_module)
+                else:
+                    self.module = reload_module(self.module)
+            else:
+                self.module = None
+        self.mtime = self._source_mtime()
+        self.digest = self._source_digest()
+
+    def _source_digest(self):
+        if self.module is None:
+            return ''
+        h = hashlib.sha1(
+            (self.context_module or self.context_file).encode('utf-8'))
+        path = self.path
+        if path is not None:
+            try:
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+            except (IOError, OSError):
+                pass
+        return h.hexdigest()
+
+    def refresh(self):
+        """Reload the context if its source has changed.
+
+        Returns True if the context was reloaded.
+        """
+        if self._source_mtime() == self.mtime:
+            return False
+        self.load()
+        return True
+
+    def namespace(self, copy=True):
+        """Return the namespace to execute a snippet in.
+
+        With ``copy`` false, the module's own ``__dict__`` is returned; this
+        is only safe when the snippet runs in a forked process.
+        """
+        if self.module is None:
+            return {'__name__': '__console__', '__doc__': None}
+        if not copy:
+            return self.module.__dict__
+        return dict(self.module.__dict__)
+
+
 class Indentifier(object):
     def __init__(self, outfile, initial_indent):
         self.outfile = outfile
@@ -65,47 +192,988 @@ class DoctestTracebackConsole(code.InteractiveConsole):
             self.write(line)
 
 
-def replify(infile, outfile, context, console_type=None):
-    if console_type is None:
-        console_type = code.InteractiveConsole
-    console = console_type(context, '<stdin>')
-    dereplify = False
-    initial_indent = None
-    needmore = False
-    _stdout = sys.stdout
-    _stderr = sys.stderr
-    sys.stdout = sys.stderr = outfile
+class AsyncConsole(code.InteractiveConsole):
+    """An InteractiveConsole that accepts ``await`` outside functions.
+
+    Statements using ``await``, ``async for`` or ``async with`` at the top
+    level run as coroutines on ``loop``, one event loop kept for the life of
+    the console, so that tasks, connections and other objects bound to it
+    carry over from one statement to the next. Other statements run as
+    usual, and may still call ``asyncio.run``; while any statement runs,
+    ``loop`` is the thread's current event loop, so that tasks they create
+    with ``asyncio.ensure_future`` run on it once a later statement awaits.
+    The thread is left without a current event loop afterwards.
+    :meth:`close` cancels the tasks left on the loop and closes it. Raises
+    ValueError before python 3.8.
+    """
+
+    def __init__(self, locals=None, filename='<console>'):
+        if TOP_LEVEL_AWAIT is None or asyncio is None:
+            raise ValueError('top-level await requires python 3.8+')
+        code.InteractiveConsole.__init__(self, locals, filename)
+        self.compile.compiler.flags |= TOP_LEVEL_AWAIT
+        self.loop = None
+
+    def runcode(self, compiled):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            if not compiled.co_flags & CO_COROUTINE:
+                return code.InteractiveConsole.runcode(self, compiled)
+            self._runcoroutine(compiled)
+        finally:
+            asyncio.set_event_loop(None)
+
+    def _runcoroutine(self, compiled):
+        try:
+            task = self.loop.create_task(eval(compiled, self.locals))
+            try:
+                self.loop.run_until_complete(task)
+            except BaseException as err:
+                if not task.done():
+                    # interrupted while waiting, as by a time limit
+                    task.cancel()
+                    self._finish(task)
+                tb = _statement_frames(err.__traceback__, compiled)
+                raise err.with_traceback(tb)
+        except SystemExit:
+            raise
+        except BaseException:
+            self.showtraceback()
+
+    def _finish(self, task):
+        try:
+            self.loop.run_until_complete(task)
+        except BaseException:
+            pass
+
+    def close(self):
+        """Cancel the tasks left on the loop, and close it."""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+            self._finish(task)
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+class DoctestTracebackAsyncConsole(AsyncConsole, DoctestTracebackConsole):
+    """An :class:`AsyncConsole` with doctest-style tracebacks."""
+
+
+def console_class(doctest_tb=False, top_level_await=False):
+    """Return the console type with the given features."""
+    if top_level_await:
+        if doctest_tb:
+            return DoctestTracebackAsyncConsole
+        return AsyncConsole
+    if doctest_tb:
+        return DoctestTracebackConsole
+    return code.InteractiveConsole
+
+
+def _statement_frames(tb, compiled):
+    # leave out the frames of the event loop, above the statement's own
+    first = tb
+    while tb is not None and tb.tb_frame.f_code is not compiled:
+        tb = tb.tb_next
+    return first if tb is None else tb
+
+
+class NullWriter(object):
+    """File-like object that discards everything written to it."""
+
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+def chain_statement(prefix, lines):
+    """Return the hash of the statement prefix ``prefix`` plus ``lines``."""
+    h = hashlib.sha1(prefix.encode('ascii'))
+    for line in lines:
+        h.update(b'\n')
+        h.update(line.rstrip('\r\n').encode('utf-8'))
+    return h.hexdigest()
+
+
+class _Stream(object):
+    """Captures one of the standard streams while a statement runs."""
+
+    def __init__(self, session, index):
+        self.session = session
+        self.index = index
+        self.bind()
+
+    def bind(self):
+        """Append to the current chunk lists of the session's buffers."""
+        buffers = self.session._buffers
+        self._output = buffers[0]._chunks
+        self._chunks = buffers[self.index]._chunks
+
+    def write(self, data):
+        if data:
+            if self.session._bounded:
+                self.session._write(self.index, data)
+            else:
+                self._output.append(data)
+                self._chunks.append(data)
+
+    def flush(self):
+        pass
+
+
+class Session(object):
+    """Executes statements in a console, capturing the result of each.
+
+    :meth:`push` and :meth:`run` return a
+    :class:`replify.results.StatementResult` when a statement is complete.
+    While a statement runs, ``sys.stdout``, ``sys.stderr`` and
+    ``sys.displayhook`` are replaced to capture its output and value. Once
+    :func:`replify.capture.install` has been called, they are left alone,
+    and the session's streams are activated for the thread running the
+    statement instead, so sessions can run concurrently in several threads;
+    ``_`` is then bound in the console's namespace rather than in builtins.
+    Time and memory limits and profiling remain process-wide, and threads
+    started by a statement write to the original streams.
+
+    ``limits`` is an optional :class:`replify.limits.Limits`, which is
+    enforced on each statement. ``exceeded`` is set to the LimitExceeded of
+    the last statement if it exceeded a limit and the limits say to abort.
+    The output limits of ``limits`` apply to everything the session runs.
+    ``display`` is an optional :class:`replify.display.Display` that shows
+    the values of expression statements instead of ``sys.displayhook``.
+
+    ``echo`` is an optional renderer, such as a
+    :class:`replify.results.TextRenderer`, that results are written to as
+    they are made, so that output is not kept in memory. Statements given
+    to :meth:`run` are written as they run: their lines are passed to its
+    ``begin`` method, their output to ``write_output`` as it is written and
+    their results have no output; other results are passed to ``write``.
+    """
+
+    def __init__(self, context, console_type=None, limits=None,
+                 profiler=None, display=None, echo=None):
+        if console_type is None:
+            console_type = code.InteractiveConsole
+        self.console = console_type(context, '<stdin>')
+        self.limits = limits
+        self.guard = None
+        if limits is not None:
+            self.guard = limits.guard(self.console)
+        self.profiler = profiler
+        self.display = display
+        self.echo = echo
+        self.exceeded = None
+        self.lines = []
+        self._spill = None
+        if limits is not None:
+            self._spill = limits.spill
+        # the output as a whole, stdout and stderr
+        self._buffers = [OutputBuffer(self._spill) for _ in range(3)]
+        self._streams = (_Stream(self, 1), _Stream(self, 2))
+        self._total = 0
+        self._reset()
+        self._showtraceback = self.console.showtraceback
+        self._showsyntaxerror = self.console.showsyntaxerror
+        self.console.showtraceback = self.showtraceback
+        self.console.showsyntaxerror = self.showsyntaxerror
+
+    def _reset(self):
+        limits = self.limits
+        # characters of output the next statement may write, or None
+        self._room = None
+        if limits is not None:
+            if limits.output is not None:
+                self._room = limits.output
+            if limits.total_output is not None:
+                room = max(limits.total_output - self._total, 0)
+                if self._room is None or room < self._room:
+                    self._room = room
+        # whether the running statement is being written to the echo
+        self._echoing = False
+        # unbounded output is appended straight to the buffers' chunks
+        self._bounded = self._room is not None or self._spill is not None \
+            or self.echo is not None
+        self._omitted = 0
+        self._last = ''
+        self._value = None
+        self._value_repr = None
+        self._exception = None
+        self._elapsed = 0.0
+        self._profile = None
+
+    def _write(self, index, data):
+        if self._room is not None:
+            if len(data) > self._room:
+                self._omitted += len(data) - self._room
+                data = data[:self._room]
+                if not data:
+                    return
+            self._room -= len(data)
+            self._total += len(data)
+            self._last = data[-1]
+        if self._echoing:
+            self.echo.write_output(data)
+            return
+        self._buffers[0].write(data)
+        self._buffers[index].write(data)
+
+    def _result(self, lines):
+        if self._omitted:
+            marker = TRUNCATED.format(self._omitted)
+            if self._last not in ('', '\n'):
+                marker = '\n' + marker
+            if self._echoing:
+                self.echo.write_output(marker)
+            else:
+                self._buffers[0].write(marker)
+        # spilled buffers are handed over to the result, which reads them
+        # when it is rendered; the others are emptied and kept
+        values = []
+        for i, buffer in enumerate(self._buffers):
+            if buffer.spilled:
+                values.append(buffer)
+                self._buffers[i] = OutputBuffer(self._spill)
+                for stream in self._streams:
+                    stream.bind()
+            else:
+                values.append(buffer.getvalue())
+                buffer.close()
+        output, stdout, stderr = values
+        result = StatementResult(
+            lines, output, stdout, stderr, self._value, self._exception,
+            self._elapsed, profile=self._profile, value_repr=self._value_repr)
+        if self._echoing:
+            self.echo.end()
+        elif self.echo is not None:
+            self.echo.write(result)
+        self._reset()
+        return result
+
+    def _capture_exception(self):
+        type, value = sys.exc_info()[:2]
+        if type is not None:
+            self._exception = (type.__name__, str(value))
+
+    def showtraceback(self):
+        self._capture_exception()
+        with trace.span('showtraceback', 'console'):
+            self._showtraceback()
+
+    def showsyntaxerror(self, *args, **kwargs):
+        self._capture_exception()
+        self._showsyntaxerror(*args, **kwargs)
+
+    def displayhook(self, value):
+        if value is not None:
+            self._value = value
+        text = self._displayhook(value)
+        # a display's text is kept, since it may differ from the repr
+        if value is not None and self.display is not None:
+            self._value_repr = text
+
+    def _show(self, value):
+        # sys.displayhook, but binding _ in the console's namespace, since
+        # builtins are shared with sessions running in other threads
+        if value is None:
+            return
+        if self.display is None:
+            text = repr(value)
+        else:
+            text = self.display.format(value)
+        sys.stdout.write(text + '\n')
+        self.console.locals['_'] = value
+        return text
+
+    def _execute(self, func, *args):
+        concurrent = capture.installed()
+        if concurrent:
+            self._displayhook = self._show
+            saved = capture.activate(self._streams + (self.displayhook,))
+        else:
+            saved = sys.stdout, sys.stderr, sys.displayhook
+            if self.display is None:
+                self._displayhook = sys.displayhook
+            else:
+                self._displayhook = self.display.displayhook
+            sys.stdout, sys.stderr = self._streams
+            sys.displayhook = self.displayhook
+        token = None
+        if self.profiler is not None:
+            token = self.profiler.start()
+        start = timer()
+        try:
+            if self.guard is None:
+                return func(*args)
+            ret = None
+            with self.guard:
+                ret = func(*args)
+            exceeded = self.guard.exceeded
+            if exceeded is not None:
+                self._exception = (type(exceeded).__name__, str(exceeded))
+                if self.guard.limits.abort:
+                    self.exceeded = exceeded
+            return ret
+        finally:
+            self._elapsed += timer() - start
+            if token is not None:
+                if self._profile is None:
+                    self._profile = {}
+                self.profiler.stop(token, self._profile)
+            if concurrent:
+                capture.activate(saved)
+            else:
+                sys.stdout, sys.stderr, sys.displayhook = saved
+
+    def push(self, line):
+        """Push one line to the console.
+
+        Returns the result once ``line`` completes a statement, or None.
+        """
+        self.lines.append(line)
+        line = line.rstrip('\r\n')
+        # spans are only made when traced, as this runs for every line
+        if trace.active() is None:
+            more = self._execute(self.console.push, line)
+        else:
+            with trace.span('push', 'console', {'line': line}):
+                more = self._execute(self.console.push, line)
+        if more:
+            return None
+        lines = self.lines
+        self.lines = []
+        return self._result(lines)
+
+    def run(self, lines, compiled):
+        """Run ``compiled``, the compiled statement ``lines``."""
+        if self.echo is not None:
+            self.echo.begin(lines)
+            self._echoing = True
+        if trace.active() is None:
+            self._execute(self.console.runcode, compiled)
+        else:
+            with trace.span('run', 'console',
+                            {'line': lines[0].rstrip('\r\n')}):
+                self._execute(self.console.runcode, compiled)
+        return self._result(lines)
+
+    def run_silently(self, compiled):
+        """Run ``compiled`` for its effect on the namespace only.
+
+        The statement still runs under the session's limits.
+        """
+        if capture.installed():
+            null = NullWriter()
+            saved = capture.activate((null, null, self._show))
+            try:
+                self._runcode_guarded(compiled)
+            finally:
+                capture.activate(saved)
+            return
+        saved = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = NullWriter()
+        try:
+            self._runcode_guarded(compiled)
+        finally:
+            sys.stdout, sys.stderr = saved
+
+    def _runcode_guarded(self, compiled):
+        # an exception in the replayed statement belongs to its stored
+        # result, not to the statement run next
+        saved = self._value, self._value_repr, self._exception
+        try:
+            if self.guard is None:
+                self.console.runcode(compiled)
+                return
+            with self.guard:
+                self.console.runcode(compiled)
+        finally:
+            self._value, self._value_repr, self._exception = saved
+
+    def close(self):
+        """Close the console, if it has a ``close`` method."""
+        close = getattr(self.console, 'close', None)
+        if close is not None:
+            close()
+
+    def flush(self):
+        """Return the result of an unfinished statement, if any."""
+        if not self.lines:
+            return None
+        lines = self.lines
+        self.lines = []
+        self.console.resetbuffer()
+        return self._result(lines)
+
+
+def _load_checkpoint(data):
     try:
-        for line in infile:
-            if initial_indent is None:
-                initial_indent = re.match(
-                    r'\s*', line.rstrip('\r\n')).group(0)
-                sys.stdout = sys.stderr = Indentifier(outfile, initial_indent)
-                if line.lstrip().startswith(ps1):
-                    dereplify = True
-            if not line.rstrip('\r\n'):
+        result = StatementResult.from_dict(json.loads(data))
+    except (ValueError, KeyError, TypeError):
+        return None
+    # a statement cut short by a limit left its work unfinished, and
+    # replaying it could run past the limit, so it is run again
+    if result.exception is not None and \
+            result.exception[0] == LimitExceeded.__name__:
+        return None
+    return result
+
+
+def execute(lines, context, console_type=None, checkpoints=None,
+            limits=None, profiler=None, display=None, session=None, jobs=1,
+            echo=None):
+    """Execute the snippet in ``lines``, yielding the result of each statement.
+
+    ``lines`` is an iterable of source lines; the indent of the first line
+    is removed from all of them, and ValueError is raised if a line does
+    not have it. Each statement yields a
+    :class:`replify.results.StatementResult`; so does an unfinished
+    statement at the end of the input, with no output.
+
+    Statements are found with a :class:`replify.segment.Segmenter` and
+    compiled once each, unless ``console_type`` overrides ``push`` or
+    ``runsource``, in which case every line is pushed to the console.
+
+    ``checkpoints`` is an optional store with ``get(prefix)`` and
+    ``put(prefix, data)`` methods, such as
+    :class:`replify.cache.CheckpointStore`. Each statement's result is
+    stored under a hash of the statement prefix ending with it. Statements
+    whose prefix is already stored are replayed silently to restore the
+    console's state, and their stored result is yielded; execution with
+    output resumes from the first changed statement. Stored results keep
+    only the ``repr`` of their value. If the store's ``dependencies``
+    attribute is true, each statement is instead stored under a hash of
+    itself and the statements it depends on, as found by
+    :func:`replify.deps.statements`; only the statements whose hash is not
+    stored are executed, after silently running those they depend on, so
+    an edit only executes the statements it may affect, as far as the
+    analysis can tell.
+
+    ``limits`` is an optional :class:`replify.limits.Limits`, which is
+    enforced on each statement. A statement that exceeds a limit shows a
+    LimitExceeded traceback; if the limits say to abort, LimitExceeded is
+    raised after that statement's result has been yielded.
+
+    ``profiler`` is an optional :class:`replify.profiling.Profiler` that
+    measures each statement, and ``display`` an optional
+    :class:`replify.display.Display` that shows the values of expressions.
+
+    ``session`` is an optional :class:`Session` to execute the snippet in,
+    in place of a new one made from ``context``, ``console_type``,
+    ``limits``, ``profiler`` and ``display``; several snippets executed in
+    the same session share one console, and it is left open; a session
+    made here is closed (see :meth:`Session.close`) at the end.
+
+    With ``jobs`` greater than one, the snippet is split into sections
+    that do not depend on each other (see :func:`replify.deps.sections`),
+    which run at the same time in up to ``jobs`` forked processes; results
+    are still yielded in order, and keep only the ``repr`` of their value.
+    This needs ``os.fork`` and is not done with ``checkpoints`` or a
+    ``profiler``.
+
+    ``echo`` is passed on to the :class:`Session` made here, which then
+    writes the output of the statements it runs to ``echo`` instead of
+    keeping it; it cannot be used with ``checkpoints`` or ``jobs``, since
+    their results do not all come from the session.
+    """
+    if echo is not None and (checkpoints is not None or jobs > 1):
+        raise ValueError('echo cannot be used with checkpoints or jobs')
+    owned = session is None
+    if owned:
+        session = Session(context, console_type, limits, profiler, display,
+                          echo)
+    lineno = 1
+    try:
+        for result in _statements(lines, session, checkpoints, jobs):
+            result.lineno = lineno
+            lineno += len(result.source)
+            yield result
+    finally:
+        if owned:
+            session.close()
+
+
+def _dedent(lines):
+    lines = iter(lines)
+    first = next(lines, '')
+    if not first:
+        return
+    initial_indent = re.match(r'\s*', first.rstrip('\r\n')).group(0)
+    for line in itertools.chain([first], lines):
+        if not line.rstrip('\r\n'):
+            pass
+        elif line.startswith(initial_indent):
+            line = line[len(initial_indent):]
+        else:
+            raise ValueError('inconsistent indentation: {0!r}'.format(
+                line.rstrip('\r\n')))
+        yield line
+
+
+def _blank(lines):
+    return all(not line.strip() or line.lstrip().startswith('#')
+               for line in lines)
+
+
+def _segment_all(lines, console):
+    """Split all of ``lines`` into statements, compiling each one.
+
+    Returns a list of ``(lines, code)`` pairs, like those of a
+    :class:`replify.segment.Segmenter`, and the lines of an unfinished
+    statement at the end of the input. Where the segmenter cannot tell how
+    the console would split the lines, they are compiled as
+    ``InteractiveConsole.push`` would compile them. ``code`` is None only
+    for empty lines, comments and statements with a syntax error, which
+    are pushed to the console instead.
+    """
+    segmenter = Segmenter(console)
+    segments = []
+    buffer = []
+
+    def push(line):
+        buffer.append(line)
+        source = '\n'.join(l.rstrip('\r\n') for l in buffer)
+        try:
+            code = console.compile(source, console.filename, 'single')
+        except (OverflowError, SyntaxError, ValueError):
+            code = None
+        else:
+            if code is None:
+                return
+        segments.append((list(buffer), code))
+        del buffer[:]
+
+    for line in lines:
+        if buffer:
+            push(line)
+            continue
+        segment = segmenter.feed(line)
+        if segment is None:
+            continue
+        source, code = segment
+        if code is None and not _blank(source):
+            for line in source:
+                push(line)
+        else:
+            segments.append(segment)
+    for line in segmenter.flush():
+        push(line)
+    return segments, buffer
+
+
+def _run_segment(session, lines, code):
+    if code is not None:
+        return session.run(lines, code)
+    for line in lines:
+        result = session.push(line)
+    return result
+
+
+def _flush(session, lines):
+    for line in lines:
+        session.push(line)
+    result = session.flush()
+    if result is not None:
+        yield result
+
+
+def _dependent_statements(lines, session, checkpoints):
+    segments, tail = _segment_all(lines, session.console)
+    statements = deps.statements([source for source, _ in segments])
+    keys = []
+    stored = {}
+    # identical statements with the same dependencies are told apart by
+    # how many came before them
+    seen = {}
+    for statement in statements:
+        prefix = ''.join(keys[i] for i in sorted(statement.depends))
+        key = chain_statement(prefix, statement.source)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > 1:
+            key = chain_statement(
+                '{0}#{1}'.format(prefix, seen[key]), statement.source)
+        keys.append(key)
+        data = checkpoints.get(key)
+        if data is not None:
+            result = _load_checkpoint(data)
+            if result is not None:
+                stored[statement.index] = result
+    needed = deps.required(statements, [
+        statement.index for statement in statements
+        if statement.index not in stored])
+    for index, (source, code) in enumerate(segments):
+        result = stored.get(index)
+        if result is not None:
+            # empty lines and syntax errors leave no state behind
+            if index in needed and code is not None:
+                session.run_silently(code)
+            yield result
+            continue
+        result = _run_segment(session, source, code)
+        checkpoints.put(keys[index], json.dumps(result.to_dict()))
+        yield result
+        if session.exceeded is not None:
+            raise session.exceeded
+    for result in _flush(session, tail):
+        yield result
+
+
+class _Sections(object):
+    """Runs sections of a snippet in forked processes.
+
+    At most ``jobs`` processes run at a time, started in the order of the
+    first statement of their section. Each writes the results of its
+    statements to a pipe as JSON lines; :meth:`result` reads them as
+    needed.
+    """
+
+    def __init__(self, session, segments, sections, jobs):
+        self.session = session
+        self.segments = segments
+        self.pending = list(sections)
+        self.jobs = jobs
+        self.running = []
+        self.results = {}
+        self._start()
+
+    def _start(self):
+        while self.pending and len(self.running) < self.jobs:
+            self.running.append(self._fork(self.pending.pop(0)))
+
+    def _fork(self, section):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                os.close(read_fd)
+                session = self.session
+                with os.fdopen(write_fd, 'w') as outfile:
+                    for index in section:
+                        result = session.run(*self.segments[index])
+                        exceeded = session.exceeded
+                        if exceeded is not None:
+                            exceeded = str(exceeded)
+                        outfile.write(json.dumps(
+                            [index, result.to_dict(), exceeded]) + '\n')
+                        if exceeded is not None:
+                            break
+            except BaseException:
+                status = 2
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        return pid, os.fdopen(read_fd, 'r'), set(section)
+
+    def _read(self, process):
+        pid, infile, section = process
+        line = infile.readline()
+        if line:
+            index, data, exceeded = json.loads(line)
+            self.results[index] = StatementResult.from_dict(data), exceeded
+            return
+        infile.close()
+        self.running.remove(process)
+        _, status = os.waitpid(pid, 0)
+        if status:
+            raise RuntimeError(
+                'section process exited abnormally (status {0})'.format(
+                    status))
+        self._start()
+
+    def result(self, index):
+        """Return the result of statement ``index``, and its LimitExceeded."""
+        while index not in self.results:
+            for process in self.running:
+                if index in process[2]:
+                    break
+            else:
+                if not self.running:
+                    raise RuntimeError(
+                        'no result for statement {0}'.format(index))
+                # read another section to the end, to start this one
+                process = self.running[0]
+            self._read(process)
+        return self.results.pop(index)
+
+    def close(self):
+        for pid, infile, _ in self.running:
+            infile.close()
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
                 pass
-            elif line.startswith(initial_indent):
-                line = line[len(initial_indent):]
+            os.waitpid(pid, 0)
+        self.running = []
+
+
+def _parallel_statements(lines, session, jobs):
+    segments, tail = _segment_all(lines, session.console)
+    # empty lines and syntax errors leave no state behind, and are pushed
+    # here; the other statements are split into sections
+    code = [index for index, (_, compiled) in enumerate(segments)
+            if compiled is not None]
+    statements = deps.statements([segments[index][0] for index in code])
+    sections = [[code[i] for i in section]
+                for section in deps.sections(statements)]
+    runner = None
+    if len(sections) > 1:
+        runner = _Sections(session, segments, sections, jobs)
+    try:
+        for index, (source, compiled) in enumerate(segments):
+            exceeded = None
+            if runner is None or compiled is None:
+                result = _run_segment(session, source, compiled)
+                exceeded = session.exceeded
             else:
-                raise ValueError()
-            if dereplify:
-                if line.startswith(ps1):
-                    line = line[len(ps1):]
-                elif line.startswith(ps2):
-                    line = line[len(ps2):]
-                elif not line.rstrip('\r\n'):
-                    pass
-                else:
-                    line = ''
-                sys.stdout.write(line)
+                result, exceeded = runner.result(index)
+                if exceeded is not None:
+                    exceeded = LimitExceeded(exceeded)
+            yield result
+            if exceeded is not None:
+                raise exceeded
+    finally:
+        if runner is not None:
+            runner.close()
+    for result in _flush(session, tail):
+        yield result
+
+
+def _statements(lines, session, checkpoints, jobs=1):
+    lines = _dedent(lines)
+    segmenter = None
+    if uses_default_push(session.console):
+        if getattr(checkpoints, 'dependencies', False):
+            for result in _dependent_statements(lines, session, checkpoints):
+                yield result
+            return
+        if jobs > 1 and checkpoints is None and session.profiler is None \
+                and hasattr(os, 'fork'):
+            for result in _parallel_statements(lines, session, jobs):
+                yield result
+            return
+        segmenter = Segmenter(session.console)
+    replaying = checkpoints is not None and segmenter is not None
+    prefix = ''
+
+    def pushed(lines):
+        for line in lines:
+            result = session.push(line)
+            if result is not None:
+                yield result
+
+    for line in lines:
+        if session.lines or segmenter is None:
+            results = pushed([line])
+        else:
+            segment = segmenter.feed(line)
+            if segment is None:
+                continue
+            source, compiled = segment
+            if compiled is None:
+                # empty lines and comments leave no state behind, so
+                # replaying goes on after them
+                if not _blank(source):
+                    replaying = False
+                results = pushed(source)
+            elif replaying:
+                # Reuse the checkpoint of the prefix ending with this
+                # statement, if there is one.
+                key = chain_statement(prefix, source)
+                data = checkpoints.get(key)
+                result = None
+                if data is not None:
+                    result = _load_checkpoint(data)
+                if result is not None:
+                    session.run_silently(compiled)
+                    prefix = key
+                    yield result
+                    continue
+                replaying = False
+                results = [session.run(source, compiled)]
             else:
-                sys.stdout.write(
-                    '{0}{1}'.format(ps2 if needmore else ps1, line))
-                needmore = console.push(line.rstrip('\r\n'))
+                results = [session.run(source, compiled)]
+        for result in results:
+            if checkpoints is not None:
+                prefix = chain_statement(prefix, result.source)
+                checkpoints.put(prefix, json.dumps(result.to_dict()))
+            yield result
+            if session.exceeded is not None:
+                raise session.exceeded
+    if segmenter is not None:
+        for result in pushed(segmenter.flush()):
+            yield result
+            if session.exceeded is not None:
+                raise session.exceeded
+    result = session.flush()
+    if result is not None:
+        yield result
+
+
+def replify(infile, outfile, context, console_type=None, checkpoints=None,
+            buffer_size=BUFFER_SIZE, limits=None, renderer_type=None,
+            renderers=(), profiler=None, display=None, jobs=1):
+    """Execute the snippet read from ``infile``, writing a transcript.
+
+    If the input is already a transcript (its first line starts with a
+    prompt), the prompts are removed instead, using
+    :func:`replify.dereplify.dereplify`; nothing is executed. As there are
+    no results to render then, ValueError is raised if ``renderer_type`` or
+    ``renderers`` are given.
+
+    Otherwise the snippet is executed with :func:`execute`, which
+    ``console_type``, ``checkpoints``, ``limits``, ``profiler``,
+    ``display`` and ``jobs`` are passed on to, and each result is written
+    with a
+    :class:`replify.results.TextRenderer` indented like the input. Output
+    is written to ``outfile`` after each statement, or whenever
+    ``buffer_size`` characters have accumulated.
+    ``renderer_type`` may name another renderer class, such as
+    :class:`replify.results.JSONLinesRenderer`; it is called with
+    ``outfile`` and the indent. ``renderers`` are more renderers, such as a
+    :class:`replify.notebook.NotebookRenderer`, that are given every result
+    as well, so that one execution produces several formats. The
+    ``finish`` method of every renderer is called at the end, even if an
+    error stops execution. When the text renderer is the only one, and
+    neither ``checkpoints`` nor ``jobs`` are used, output is written to it
+    as the statements run rather than kept until each one ends.
+    """
+    if hasattr(infile, 'readline'):
+        first = infile.readline()
+        lines = infile
+    else:
+        lines = iter(infile)
+        first = next(lines, '')
+    if not first:
+        return
+    if first.lstrip().startswith(ps1):
+        if renderer_type is not None or renderers:
+            raise ValueError('the input is a transcript, which has no '
+                             'results to render')
+        dereplify(lines, outfile, first, ps1=ps1, ps2=ps2)
+        return
+
+    initial_indent = re.match(r'\s*', first.rstrip('\r\n')).group(0)
+    if renderer_type is None:
+        renderer = TextRenderer(outfile, initial_indent, buffer_size)
+    else:
+        renderer = renderer_type(outfile, initial_indent)
+    echo = None
+    if renderer_type is None and not renderers and checkpoints is None \
+            and jobs <= 1:
+        echo = renderer
+    renderers = [renderer] + list(renderers)
+    try:
+        for result in execute(itertools.chain([first], lines), context,
+                              console_type, checkpoints, limits, profiler,
+                              display, jobs=jobs, echo=echo):
+            if echo is None:
+                for renderer in renderers:
+                    renderer.write(result)
     finally:
-        sys.stdout = _stdout
-        sys.stderr = _stderr
+        for renderer in renderers:
+            renderer.finish()
+
+
+def replify_forked(infile, outfile, context, console_type=None,
+                   checkpoints=None, limits=None, renderer_type=None,
+                   renderers=(), display=None):
+    """Like :func:`replify`, but execute the snippet in a forked process.
+
+    The child starts from a copy-on-write snapshot of this process, so
+    ``context`` (typically a context module's ``__dict__``) is used
+    without copying and is left untouched by the snippet. The transcript is
+    streamed back through a pipe and written to ``outfile``. Exceptions
+    raised by :func:`replify` in the child are re-raised here; RuntimeError
+    is raised if the child exits abnormally. The other arguments are as for
+    :func:`replify`; a memory limit only applies to the child, and
+    ``renderers`` write from the child, so their files must not hold
+    unflushed data when this is called.
+    """
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            os.close(out_r)
+            os.close(err_r)
+            with os.fdopen(out_w, 'w') as child_outfile:
+                try:
+                    replify(infile, child_outfile, context, console_type,
+                            checkpoints, limits=limits,
+                            renderer_type=renderer_type,
+                            renderers=renderers, display=display)
+                except (Exception, SystemExit, LimitExceeded) as err:
+                    error = err
+                else:
+                    error = None
+            if error is not None:
+                status = 1
+                try:
+                    data = pickle.dumps(error)
+                except Exception:
+                    data = pickle.dumps(RuntimeError(
+                        '{0}: {1}'.format(type(error).__name__, error)))
+                with os.fdopen(err_w, 'wb') as errfile:
+                    errfile.write(data)
+        except BaseException:
+            status = 2
+        finally:
+            os._exit(status)
+
+    os.close(out_w)
+    os.close(err_w)
+    try:
+        with os.fdopen(out_r, 'r') as child_outfile:
+            while True:
+                data = child_outfile.read(8192)
+                if not data:
+                    break
+                outfile.write(data)
+        with os.fdopen(err_r, 'rb') as errfile:
+            error = errfile.read()
+    finally:
+        _, status = os.waitpid(pid, 0)
+    if error:
+        raise pickle.loads(error)
+    if status:
+        raise RuntimeError(
+            'snippet process exited abnormally (status {0})'.format(status))
+
+
+def _write_profile(entries, config):
+    from replify.profiling import write_report
+    config.outfile.flush()
+    write_report(entries, config.profile_output, config.profile_top,
+                 config.profile_format)
+    config.profile_output.flush()
+
+
+def _start_trace(outfile):
+    tracer = trace.install()
+
+    def write():
+        tracer.write(outfile)
+        outfile.flush()
+
+    atexit.register(write)
+
+
+def _watch(patterns, render, context, config):
+    from replify.watch import watch
+    try:
+        watch(patterns, render, context, config.debounce,
+              stream=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
 
 
 def main():
@@ -126,18 +1194,388 @@ def main():
         '-d', '--doctest-tb', dest='console_type', action='store_const',
         const=DoctestTracebackConsole, default=code.InteractiveConsole,
         help='Output doctest-style tracebacks.')
+    parser.add_argument(
+        '--async', dest='top_level_await', action='store_true',
+        help='Allow await, async for and async with outside functions; '
+        'such statements run on one event loop kept for the whole snippet '
+        '(python 3.8+).')
+    parser.add_argument(
+        '-b', '--batch', metavar='PATH', action='append',
+        help='Replify every file matching PATH (a file, directory or glob '
+        'pattern) into --outdir. May be given more than once.')
+    parser.add_argument(
+        '-O', '--outdir', metavar='DIR',
+        help='Output directory for --batch.')
+    parser.add_argument(
+        '-j', '--jobs', metavar='N', type=int, default=1,
+        help='Number of worker processes to use for --batch; for a single '
+        'snippet, the number of processes running its independent '
+        'statements at the same time.')
+    parser.add_argument(
+        '--fork', action='store_true',
+        help='Run each snippet in a forked copy of the process, starting '
+        'from the already imported context.')
+    parser.add_argument(
+        '--cache-dir', metavar='DIR',
+        default=os.environ.get('REPLIFY_CACHE_DIR'),
+        help='Reuse transcripts cached in DIR for unchanged inputs '
+        '(default: $REPLIFY_CACHE_DIR).')
+    parser.add_argument(
+        '--cache-size', metavar='MB', type=int, default=256,
+        help='Maximum size of the cache directory in megabytes.')
+    parser.add_argument(
+        '--no-cache', dest='cache_dir', action='store_const', const=None,
+        help='Do not use the transcript cache.')
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='Also cache the transcript of each statement, so that only '
+        'statements from the first changed one onward are shown afresh. '
+        'Requires --cache-dir.')
+    parser.add_argument(
+        '--dependencies', action='store_true',
+        help='With --incremental, key the transcript of each statement by '
+        'the statements it depends on, so that only the statements an edit '
+        'may affect are executed again.')
+    parser.add_argument(
+        '--timeout', metavar='SECONDS', type=float,
+        help='Interrupt any statement that runs for longer than SECONDS.')
+    parser.add_argument(
+        '--cpu-time', metavar='SECONDS', type=float,
+        help='Interrupt any statement that uses more than SECONDS of CPU '
+        'time.')
+    parser.add_argument(
+        '--memory', metavar='MB', type=int,
+        help='Limit the address space of the process to MB megabytes while '
+        'a statement runs.')
+    parser.add_argument(
+        '--abort-on-limit', action='store_true',
+        help='Stop processing a snippet, and fail, when a statement exceeds '
+        'a limit, instead of going on with the next statement.')
+    parser.add_argument(
+        '--max-output', metavar='CHARS', type=int,
+        help='Truncate the output of each statement to CHARS characters.')
+    parser.add_argument(
+        '--max-total-output', metavar='CHARS', type=int,
+        help='Truncate the output of each snippet to CHARS characters.')
+    parser.add_argument(
+        '--spill-output', metavar='CHARS', type=int,
+        help='Keep the output of a statement in a temporary file instead of '
+        'memory once it exceeds CHARS characters.')
+    parser.add_argument(
+        '--json', dest='renderer_type', action='store_const',
+        const=JSONLinesRenderer,
+        help='Write a JSON object with the source, output, value and '
+        'exception of each statement on its own line, instead of a '
+        'transcript. The transcript cache is not used.')
+    parser.add_argument(
+        '--notebook', metavar='FILE', type=argparse.FileType('w'),
+        help='Also write the results to FILE as a Jupyter notebook. The '
+        'transcript cache is not used.')
+    parser.add_argument(
+        '--document', metavar='FILE', action='append',
+        help='Execute the python code blocks of the reStructuredText or '
+        'Markdown (.md) document FILE in one console, and rewrite them in '
+        'place as transcripts. May be given more than once.')
+    parser.add_argument(
+        '--check', metavar='PATH', action='append',
+        help='Execute the transcripts in every file matching PATH (like '
+        '--batch; .rst and .md files are documents) again, print a '
+        'unified diff for each file whose output changed, and fail if '
+        'any did. Uses --jobs. May be given more than once.')
+    parser.add_argument(
+        '--watch', action='store_true',
+        help='With --batch or --document, keep the context imported and '
+        'render the inputs again whenever they change, or all of them when '
+        'the context file changes, until interrupted.')
+    parser.add_argument(
+        '--trace', metavar='FILE', type=argparse.FileType('w'),
+        help='Write a timeline of importing the context, executing each '
+        'file and statement, formatting tracebacks and writing output to '
+        'FILE, as Chrome trace events that Perfetto can open.')
+    parser.add_argument(
+        '--debounce', metavar='SECONDS', type=float, default=0.2,
+        help='With --watch, wait until the inputs have been left alone for '
+        'SECONDS before rendering them again (default: 0.2).')
+    parser.add_argument(
+        '--bounded-repr', action='store_true',
+        help='Show the values of expressions with a repr of bounded length '
+        'and depth. Formatters for more types can be registered with '
+        'replify.display.register, for example in the context module.')
+    parser.add_argument(
+        '--repr-items', metavar='N', type=int,
+        help='Show at most N items of each container (default: 100). '
+        'Implies --bounded-repr.')
+    parser.add_argument(
+        '--repr-depth', metavar='N', type=int,
+        help='Show containers nested at most N deep (default: 6). Implies '
+        '--bounded-repr.')
+    parser.add_argument(
+        '--repr-length', metavar='CHARS', type=int,
+        help='Cut strings and the repr of other values to CHARS characters '
+        '(default: 1000). Implies --bounded-repr.')
+    parser.add_argument(
+        '--repr-budget', metavar='SECONDS', type=float,
+        help='Stop formatting the items of a value after SECONDS. Implies '
+        '--bounded-repr.')
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Time every statement and report the slowest ones.')
+    parser.add_argument(
+        '--profile-calls', action='store_true',
+        help='Also run each statement under cProfile and report the '
+        'functions that take the most time. Implies --profile.')
+    parser.add_argument(
+        '--profile-memory', action='store_true',
+        help='Also trace memory allocations and report the statements that '
+        'allocate the most. Implies --profile.')
+    parser.add_argument(
+        '--profile-format', choices=['text', 'json'], default='text',
+        help='Format of the profile report (default: text).')
+    parser.add_argument(
+        '--profile-output', metavar='FILE', type=argparse.FileType('w'),
+        default=sys.stderr,
+        help='Write the profile report to FILE (default: standard error).')
+    parser.add_argument(
+        '--profile-top', metavar='N', type=int, default=20,
+        help='Number of entries in each part of the profile report.')
+    parser.add_argument(
+        '--serve', metavar='SOCKET',
+        help='Run a server on the unix socket SOCKET that keeps contexts '
+        'imported between requests.')
+    parser.add_argument(
+        '--connect', metavar='SOCKET',
+        help='Send the input to the server at SOCKET instead of executing '
+        'it in this process.')
 
     config = parser.parse_args()
 
     if config.context_module and config.context_file:
         parser.error('only one of -m or FILE may be specified')
+    if config.batch and not config.outdir:
+        parser.error('--batch requires --outdir')
+    if config.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if config.incremental and not config.cache_dir:
+        parser.error('--incremental requires --cache-dir')
+    if config.dependencies and not config.incremental:
+        parser.error('--dependencies requires --incremental')
+    if config.serve and config.connect:
+        parser.error('only one of --serve or --connect may be specified')
+    display_options = dict(
+        (name, value) for name, value in (
+            ('maxitems', config.repr_items),
+            ('maxlevel', config.repr_depth),
+            ('maxstring', config.repr_length),
+            ('maxother', config.repr_length),
+            ('budget', config.repr_budget))
+        if value is not None)
+    if display_options:
+        config.bounded_repr = True
+    if config.profile_calls or config.profile_memory:
+        config.profile = True
+    if config.profile and (config.fork or config.serve or config.connect):
+        parser.error('--profile cannot be used with --fork, --serve or '
+                     '--connect')
+    for option, name in ((config.document, '--document'),
+                         (config.check, '--check')):
+        if option and (config.renderer_type or config.notebook or
+                       config.profile or config.fork):
+            parser.error('{0} cannot be used with --json, --notebook, '
+                         '--profile or --fork'.format(name))
+    if config.document and config.check:
+        parser.error('only one of --document or --check may be specified')
+    if config.watch:
+        if not (config.batch or config.document):
+            parser.error('--watch requires --batch or --document')
+        if config.jobs > 1 or config.profile:
+            parser.error('--watch cannot be used with --jobs or --profile')
+    for option, name in ((config.renderer_type, '--json'),
+                         (config.notebook, '--notebook'),
+                         (config.document, '--document'),
+                         (config.check, '--check')):
+        if option and (config.batch or config.serve or config.connect):
+            parser.error('{0} cannot be used with --batch, --serve or '
+                         '--connect'.format(name))
+    if config.top_level_await:
+        if TOP_LEVEL_AWAIT is None or asyncio is None:
+            parser.error('--async requires python 3.8+')
+        if config.serve:
+            parser.error('--async cannot be used with --serve')
+        config.console_type = console_class(
+            config.console_type is DoctestTracebackConsole, True)
+    if config.trace and (config.serve or config.connect):
+        parser.error('--trace cannot be used with --serve or --connect')
 
-    if config.context_file:
-        mod = import_file(config.context_file)
-    elif config.context_module:
-        mod = import_module(config.context_module)
+    if config.serve:
+        from replify.server import serve
+        serve(config.serve, config.fork)
+        sys.exit(0)
+
+    if config.connect:
+        from replify.server import request
+        try:
+            request(config.connect, config.infile.read(), config.outfile,
+                    config.context_file, config.context_module,
+                    issubclass(config.console_type, DoctestTracebackConsole),
+                    config.top_level_await)
+        except RuntimeError as err:
+            sys.stderr.write('{0}\n'.format(err))
+            sys.exit(1)
+        sys.exit(0)
+
+    if config.trace:
+        _start_trace(config.trace)
+
+    context = Context(config.context_file, config.context_module)
+
+    limits = None
+    if any(option is not None for option in (
+            config.timeout, config.cpu_time, config.memory,
+            config.max_output, config.max_total_output,
+            config.spill_output)):
+        memory = None
+        if config.memory is not None:
+            memory = config.memory * MB
+        limits = Limits(config.timeout, config.cpu_time, memory,
+                        config.abort_on_limit, config.max_output,
+                        config.max_total_output, config.spill_output)
+
+    display = None
+    if config.bounded_repr:
+        from replify.display import Display
+        display = Display(**display_options)
+
+    if config.document:
+        from replify.document import rewrite_document
+        status = []
+
+        def rewrite(inputs):
+            for path, _ in inputs:
+                try:
+                    changed = rewrite_document(
+                        path, context.namespace(), None,
+                        config.console_type, limits, display)
+                except (EnvironmentError, ValueError, LimitExceeded) as err:
+                    sys.stderr.write('{0}: {1}\n'.format(path, err))
+                    status.append(path)
+                else:
+                    if config.watch:
+                        sys.stderr.write('{0}: {1}\n'.format(
+                            path, 'rewritten' if changed else 'unchanged'))
+            sys.stderr.flush()
 
-    replify(config.infile, config.outfile, mod.__dict__, config.console_type)
+        if config.watch:
+            _watch(config.document, rewrite, context, config)
+        rewrite([(path, None) for path in config.document])
+        sys.exit(1 if status else 0)
+
+    if config.check:
+        from replify.check import check, write_diffs, write_report
+        results = check(config.check, context, config.console_type,
+                        config.jobs, limits, display)
+        write_diffs(results, config.outfile)
+        config.outfile.flush()
+        write_report(results, sys.stderr)
+        sys.exit(0 if all(r.ok for r in results) else 1)
+
+    infile = config.infile
+    if getattr(infile, 'name', '').endswith('.ipynb'):
+        from replify.notebook import notebook_lines
+        infile = notebook_lines(infile)
+    renderers = []
+    if config.notebook:
+        from replify.notebook import NotebookRenderer
+        renderers.append(NotebookRenderer(config.notebook))
+
+    profiler = None
+    if config.profile:
+        from replify.profiling import Profiler, ProfileCollector
+        try:
+            profiler = Profiler(config.profile_calls, config.profile_memory)
+        except ValueError as err:
+            parser.error(str(err))
+
+    cache = None
+    if config.cache_dir and not (
+            config.renderer_type or renderers or profiler):
+        from replify.cache import TranscriptCache
+        cache = TranscriptCache(
+            config.cache_dir, config.cache_size * 1024 * 1024)
+
+    if config.batch and config.watch:
+        from replify.batch import replify_file, write_report
+
+        def render_batch(inputs):
+            write_report([
+                replify_file(path, os.path.join(config.outdir, relpath),
+                             context, config.console_type, config.fork,
+                             cache, config.incremental, limits,
+                             display=display,
+                             dependencies=config.dependencies)
+                for path, relpath in inputs
+            ], sys.stderr)
+            sys.stderr.flush()
+
+        _watch(config.batch, render_batch, context, config)
+
+    if config.batch:
+        from replify.batch import replify_batch, write_report
+        results = replify_batch(
+            config.batch, config.outdir, context, config.console_type,
+            config.jobs, config.fork, cache, config.incremental, limits,
+            profiler, display, config.dependencies)
+        write_report(results, sys.stderr)
+        if profiler is not None:
+            _write_profile(
+                [entry for r in results for entry in r.profile or ()],
+                config)
+        sys.exit(0 if all(r.ok for r in results) else 1)
+
+    if profiler is not None:
+        collector = ProfileCollector(getattr(config.infile, 'name', None))
+        renderers.append(collector)
+
+    try:
+        if cache is not None:
+            from replify.batch import render
+            text = ''.join(infile)
+            key = cache.key(
+                text, context, config.console_type, limits, display)
+            transcript = cache.get(key)
+            if transcript is None:
+                checkpoints = None
+                if config.incremental:
+                    checkpoints = cache.checkpoints(
+                        context, config.console_type, limits, display,
+                        config.dependencies)
+                transcript = render(
+                    text, context.namespace(copy=not config.fork),
+                    config.console_type, config.fork, checkpoints, limits,
+                    display=display)
+                cache.put(key, transcript)
+            config.outfile.write(transcript)
+            config.outfile.flush()
+            sys.stderr.write('cache: {0} hits, {1} misses\n'.format(
+                cache.hits, cache.misses))
+        elif config.fork:
+            replify_forked(
+                infile, config.outfile, context.namespace(copy=False),
+                config.console_type, limits=limits,
+                renderer_type=config.renderer_type, renderers=renderers,
+                display=display)
+        else:
+            replify(infile, config.outfile, context.namespace(),
+                    config.console_type, limits=limits,
+                    renderer_type=config.renderer_type, renderers=renderers,
+                    profiler=profiler, display=display, jobs=config.jobs)
+    except LimitExceeded as err:
+        sys.stderr.write('LimitExceeded: {0}\n'.format(err))
+        sys.exit(1)
+    except ValueError as err:
+        parser.error(str(err))
+    finally:
+        if profiler is not None:
+            _write_profile(collector.entries, config)
 
     sys.exit(0)
 
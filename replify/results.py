@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import sys
+import json
+import tempfile
+
+from replify import trace
+
+BUFFER_SIZE = 64 * 1024
+
+
+def _temporary_file():
+    if sys.version_info[0] >= 3:
+        return tempfile.TemporaryFile('w+', encoding='utf-8', newline='')
+    return tempfile.TemporaryFile('w+')
+
+
+class OutputBuffer(object):
+    """Collects the text written to one stream by a statement.
+
+    Text is kept in memory until there are more than ``spill`` characters
+    of it, and from then on in a temporary file, so that a statement that
+    writes a lot of output does not keep it all in memory. With ``spill``
+    None, everything is kept in memory.
+    """
+
+    def __init__(self, spill=None):
+        self.spill = spill
+        self._chunks = []
+        self._size = 0
+        self._file = None
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def write(self, data):
+        if self._file is not None:
+            self._file.write(data)
+            return
+        self._chunks.append(data)
+        if self.spill is not None:
+            self._size += len(data)
+            if self._size > self.spill:
+                self._file = _temporary_file()
+                self._file.writelines(self._chunks)
+                del self._chunks[:]
+
+    def chunks(self, size=BUFFER_SIZE):
+        """Yield the text in chunks of about ``size`` characters."""
+        if self._file is None:
+            if self._chunks:
+                yield ''.join(self._chunks)
+            return
+        self._file.seek(0)
+        while True:
+            data = self._file.read(size)
+            if not data:
+                break
+            yield data
+        self._file.seek(0, 2)
+
+    def getvalue(self):
+        if self._file is None:
+            return ''.join(self._chunks)
+        return ''.join(self.chunks())
+
+    def close(self):
+        """Discard the text, removing the temporary file if there is one."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        del self._chunks[:]
+        self._size = 0
+
+
+def text(value):
+    """Return ``value``, a string or :class:`OutputBuffer`, as a string."""
+    if isinstance(value, OutputBuffer):
+        return value.getvalue()
+    return value
+
+
+def chunks(value):
+    """Yield ``value``, a string or :class:`OutputBuffer`, in chunks."""
+    if isinstance(value, OutputBuffer):
+        return value.chunks()
+    return [value]
+
+
+class StatementResult(object):
+    """The outcome of executing one statement.
+
+    ``source`` is the list of the statement's lines, without the common
+    indent. ``output`` is everything it wrote, as it appears in the
+    transcript, and ``stdout`` and ``stderr`` are the parts written to each
+    stream. Tracebacks are written to ``stderr`` and displayed values to
+    ``stdout``. ``value`` is the last value passed to ``sys.displayhook``
+    (the value of an expression statement), or None. ``exception`` is a
+    ``(type name, message)`` tuple for an exception raised by the
+    statement, or None. ``value_repr`` is the text the value was displayed
+    as, or None if it was displayed by its ``repr``. ``elapsed`` is the
+    time taken to execute it, in seconds. ``lineno`` is the number of the
+    statement's first line in the input, and ``profile`` a dict of
+    measurements taken by a :class:`replify.profiling.Profiler`, if one
+    was used.
+
+    If the statement's output spilled to disk (see
+    :class:`replify.limits.Limits`), ``output``, ``stdout`` and ``stderr``
+    may be :class:`OutputBuffer` objects instead of strings; :func:`text`
+    and :func:`chunks` accept either.
+    """
+
+    __slots__ = ('source', 'output', 'stdout', 'stderr', 'value',
+                 'exception', 'elapsed', 'lineno', 'profile', 'value_repr')
+
+    def __init__(self, source, output='', stdout='', stderr='', value=None,
+                 exception=None, elapsed=0.0, lineno=None, profile=None,
+                 value_repr=None):
+        self.source = source
+        self.output = output
+        self.stdout = stdout
+        self.stderr = stderr
+        self.value = value
+        self.exception = exception
+        self.elapsed = elapsed
+        self.lineno = lineno
+        self.profile = profile
+        self.value_repr = value_repr
+
+    def __repr__(self):
+        return '<StatementResult {0!r}>'.format(''.join(self.source))
+
+    def to_dict(self):
+        """Return the result as a dict that can be serialized to JSON.
+
+        The value is given as the text it was displayed as, or its
+        ``repr``.
+        """
+        value = self.value_repr
+        if value is None and self.value is not None:
+            value = repr(self.value)
+        return {
+            'source': self.source,
+            'output': text(self.output),
+            'stdout': text(self.stdout),
+            'stderr': text(self.stderr),
+            'value': value,
+            'exception': self.exception,
+            'elapsed': self.elapsed,
+            'lineno': self.lineno,
+            'profile': self.profile,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Return a result from the output of :meth:`to_dict`.
+
+        Only the text of the value is kept, so ``value`` and
+        ``value_repr`` are that string.
+        """
+        exception = data['exception']
+        if exception is not None:
+            exception = tuple(exception)
+        return cls(data['source'], data['output'], data['stdout'],
+                   data['stderr'], data['value'], exception, data['elapsed'],
+                   data.get('lineno'), data.get('profile'), data['value'])
+
+
+class BufferedIndentifier(object):
+    """Indents every line written to it, buffering writes to ``outfile``.
+
+    Writes are collected in a list of chunks, which is joined, indented
+    and passed on to ``outfile`` in one write when it holds
+    ``buffer_size`` characters, or when :meth:`drain` or :meth:`flush` is
+    called. The indent is inserted at every line start in bulk with
+    ``str.replace``.
+    """
+
+    def __init__(self, outfile, initial_indent, buffer_size=BUFFER_SIZE):
+        self.outfile = outfile
+        self.initial_indent = initial_indent
+        self.buffer_size = buffer_size
+        self._newline = '\n' + initial_indent
+        self._chunks = []
+        self._size = 0
+        self._line_start = True
+
+    def write(self, data):
+        if data:
+            self._chunks.append(data)
+            self._size += len(data)
+            if self._size >= self.buffer_size:
+                self.drain()
+
+    def drain(self):
+        """Write buffered data to ``outfile`` without flushing it."""
+        if not self._chunks:
+            return
+        data = ''.join(self._chunks)
+        self._chunks = []
+        self._size = 0
+        if self.initial_indent:
+            line_start = data[-1] == '\n'
+            data = data.replace('\n', self._newline)
+            if line_start:
+                data = data[:-len(self.initial_indent)]
+            if self._line_start:
+                data = self.initial_indent + data
+            self._line_start = line_start
+        if trace.active() is None:
+            self.outfile.write(data)
+            return
+        with trace.span('write output', 'output', {'characters': len(data)}):
+            self.outfile.write(data)
+
+    def flush(self):
+        self.drain()
+        with trace.span('flush output', 'output'):
+            self.outfile.flush()
+
+    def close(self):
+        self.drain()
+        self.outfile.close()
+
+
+class TextRenderer(object):
+    """Writes results to ``outfile`` as a REPL transcript.
+
+    Each statement's lines are echoed with the ``ps1`` and ``ps2`` prompts
+    and followed by its output. Every line is indented with ``indent``.
+
+    Besides :meth:`write`, a statement can be written as it runs, as a
+    :class:`replify.replify.Session` with an ``echo`` does: :meth:`begin`
+    with its lines, :meth:`write_output` with its output as it is written,
+    and :meth:`end`.
+    """
+
+    def __init__(self, outfile, indent='', buffer_size=BUFFER_SIZE,
+                 ps1='>>> ', ps2='... '):
+        self.writer = BufferedIndentifier(outfile, indent, buffer_size)
+        self.ps1 = ps1
+        self.ps2 = ps2
+
+    def write(self, result):
+        self.begin(result.source)
+        for chunk in chunks(result.output):
+            self.writer.write(chunk)
+        self.end()
+
+    def begin(self, source):
+        """Write the lines of a statement, before its output."""
+        prompt = self.ps1
+        for line in source:
+            self.writer.write(prompt)
+            self.writer.write(line)
+            prompt = self.ps2
+
+    def write_output(self, data):
+        self.writer.write(data)
+
+    def end(self):
+        """Write what is buffered of the statement's output."""
+        self.writer.drain()
+
+    def flush(self):
+        self.writer.flush()
+
+    def finish(self):
+        """Write anything still buffered; called after the last result."""
+        self.writer.drain()
+
+
+class JSONLinesRenderer(object):
+    """Writes results to ``outfile`` as JSON, one object per line.
+
+    Each object is the result's :meth:`StatementResult.to_dict`. The
+    ``indent`` argument is accepted for compatibility with
+    :class:`TextRenderer` and ignored.
+    """
+
+    def __init__(self, outfile, indent=''):
+        self.outfile = outfile
+
+    def write(self, result):
+        self.outfile.write(json.dumps(result.to_dict(), sort_keys=True))
+        self.outfile.write('\n')
+
+    def flush(self):
+        self.outfile.flush()
+
+    def finish(self):
+        pass
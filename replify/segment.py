@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import re
+import code
+
+_token = re.compile(r'''
+    (?P<comment>\#)
+  | (?P<prefix>[rRbBuUfFtT]{0,2})(?P<quote>\'\'\'|"""|\'|")
+  | (?P<open>[(\[{])
+  | (?P<close>[)\]}])
+  | \w+
+''', re.VERBOSE)
+
+_string_end = {
+    "'": re.compile(r"(?:[^\\']|\\.)*'"),
+    '"': re.compile(r'(?:[^\\"]|\\.)*"'),
+    "'''": re.compile(r"(?:[^\\]|\\.)*?'''"),
+    '"""': re.compile(r'(?:[^\\]|\\.)*?"""'),
+}
+
+_compound = re.compile(
+    r'(?:@|(?:if|while|for|try|with|def|class|async)\b)')
+
+
+def _func(method):
+    return getattr(method, '__func__', method)
+
+
+def uses_default_push(console):
+    """Whether ``console`` compiles and runs input like InteractiveConsole.
+
+    Only then may statements be compiled without going through ``push``.
+    """
+    cls = console.__class__
+    return (
+        _func(cls.push) is _func(code.InteractiveConsole.push) and
+        _func(cls.runsource) is _func(code.InteractiveInterpreter.runsource)
+    )
+
+
+class LineScanner(object):
+    """Tracks brackets, strings and continuations across source lines.
+
+    This is not a tokenizer; it only finds out cheaply whether the lines
+    seen so far obviously leave a statement open. Anything it cannot judge
+    reliably sets ``uncertain``.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.quote = None
+        self.continued = False
+        self.uncertain = False
+
+    @property
+    def open(self):
+        return bool(self.depth or self.quote or self.continued)
+
+    def feed(self, text):
+        pos = 0
+        end = len(text)
+        self.continued = False
+        while pos < end:
+            if self.quote:
+                m = _string_end[self.quote].match(text, pos)
+                if m is None:
+                    if len(self.quote) == 1 and not _escapes_newline(text):
+                        self.uncertain = True
+                    return
+                self.quote = None
+                pos = m.end()
+                continue
+            m = _token.search(text, pos)
+            if m is None:
+                break
+            pos = m.end()
+            if m.group('comment'):
+                return
+            elif m.group('quote'):
+                if any(c in m.group('prefix') for c in 'fFtT'):
+                    # f-strings may nest quotes and brackets
+                    self.uncertain = True
+                self.quote = m.group('quote')
+            elif m.group('open'):
+                self.depth += 1
+            elif m.group('close'):
+                self.depth -= 1
+                if self.depth < 0:
+                    self.uncertain = True
+        self.continued = _escapes_newline(text)
+
+
+def _escapes_newline(text):
+    return (len(text) - len(text.rstrip('\\'))) % 2 == 1
+
+
+class Segmenter(object):
+    """Splits console input into statements, compiling each one once.
+
+    :meth:`feed` takes one line at a time. It returns None while the
+    current statement is incomplete, and ``(lines, code)`` when it is
+    done, where ``code`` is the compiled statement. ``code`` is None when
+    the lines must instead be pushed to the console one at a time, because
+    they are not a single valid statement (for instance, they contain a
+    syntax error) or the scanner cannot tell where the statement ends.
+    Pushing them reproduces exactly what the console would have done.
+
+    Unlike ``InteractiveConsole.push``, which recompiles the whole buffer
+    for every line, this compiles each statement once, so the cost is
+    linear in the length of the input.
+    """
+
+    def __init__(self, console):
+        self.console = console
+        # CommandCompiler compiles a statement up to three times to tell
+        # incomplete input apart, which the scanner has done already; the
+        # Compile object it wraps compiles once, keeping __future__ flags
+        self.compile = getattr(console.compile, 'compiler', console.compile)
+        self.lines = []
+        self.compound = False
+        self.scanner = LineScanner()
+
+    def _done(self, code=None):
+        lines = self.lines
+        self.lines = []
+        self.scanner = LineScanner()
+        return lines, code
+
+    def feed(self, line):
+        text = line.rstrip('\r\n')
+        if not self.lines:
+            stripped = text.strip()
+            if not stripped or stripped.startswith('#'):
+                self.lines.append(line)
+                return self._done()
+            self.compound = _compound.match(stripped) is not None
+        self.lines.append(line)
+        self.scanner.feed(text)
+        if self.scanner.uncertain:
+            return self._done()
+        if self.scanner.open or (self.compound and text):
+            return None
+        if len(self.lines) == 1:
+            source = text
+        else:
+            source = '\n'.join(l.rstrip('\r\n') for l in self.lines)
+        try:
+            code = self.compile(source, self.console.filename, 'single')
+        except (OverflowError, SyntaxError, ValueError):
+            code = None
+        return self._done(code)
+
+    def flush(self):
+        """Return the lines of an unfinished statement, if any."""
+        return self._done()[0]
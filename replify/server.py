@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import os
+import sys
+import json
+import stat
+import errno
+import socket
+import struct
+
+from replify.replify import replify, replify_forked, Context, console_class
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+    import socketserver
+else:
+    from cStringIO import StringIO
+    import SocketServer as socketserver
+
+
+# Each reply frame is a one byte type, a four byte big-endian length and
+# the utf-8 encoded payload. A reply is any number of output frames
+# followed by either an end or an error frame.
+OUTPUT = b'o'
+ERROR = b'e'
+END = b'.'
+
+_header = struct.Struct('>cI')
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError('connection closed by server')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def send_frame(sock, type, data=u''):
+    data = data.encode('utf-8')
+    sock.sendall(_header.pack(type, len(data)) + data)
+
+
+def recv_frame(sock):
+    type, size = _header.unpack(_recv_exactly(sock, _header.size))
+    return type, _recv_exactly(sock, size).decode('utf-8')
+
+
+class FrameWriter(object):
+    """File-like object that sends everything written as output frames."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def write(self, data):
+        if data:
+            send_frame(self.sock, OUTPUT, data)
+
+    def flush(self):
+        pass
+
+
+class ReplifyHandler(socketserver.StreamRequestHandler):
+    """Handles one client request.
+
+    The request is a JSON header line naming the context and console type,
+    followed by the snippet until the client shuts down its side of the
+    connection.
+    """
+
+    def handle(self):
+        try:
+            options = json.loads(self.rfile.readline().decode('utf-8'))
+            snippet = self.rfile.read().decode('utf-8')
+            context = self.server.get_context(
+                options.get('context_file'), options.get('context_module'))
+            console_type = console_class(options.get('doctest_tb'),
+                                         options.get('top_level_await'))
+            if self.server.fork:
+                replify_forked(StringIO(snippet), FrameWriter(self.request),
+                               context.namespace(copy=False), console_type)
+            else:
+                replify(StringIO(snippet), FrameWriter(self.request),
+                        context.namespace(), console_type)
+        except (Exception, SystemExit) as err:
+            send_frame(self.request, ERROR,
+                       u'{0}: {1}'.format(type(err).__name__, err))
+        else:
+            send_frame(self.request, END)
+
+
+class ReplifyServer(socketserver.UnixStreamServer):
+    """Long-lived server that keeps contexts imported between requests.
+
+    Requests are handled one at a time, since :func:`replify` redirects the
+    process-wide ``sys.stdout``. A cached context is reloaded when its
+    source file's modification time changes. With ``fork`` true, each
+    request runs in a forked copy of the server, so snippets start from the
+    imported context without copying it. A socket already at ``path`` is
+    replaced, but any other file there raises EnvironmentError.
+    """
+
+    def __init__(self, path, fork=False, handler_class=ReplifyHandler):
+        try:
+            mode = os.lstat(path).st_mode
+        except OSError:
+            mode = None
+        if mode is not None:
+            if not stat.S_ISSOCK(mode):
+                raise EnvironmentError(
+                    errno.EEXIST, 'File exists and is not a socket', path)
+            # left behind by a server that did not exit cleanly
+            os.unlink(path)
+        socketserver.UnixStreamServer.__init__(self, path, handler_class)
+        self.fork = fork
+        self.contexts = {}
+
+    def get_context(self, context_file=None, context_module=None):
+        key = (context_file, context_module)
+        context = self.contexts.get(key)
+        if context is None:
+            context = self.contexts[key] = Context(
+                context_file, context_module)
+        else:
+            context.refresh()
+        return context
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def serve(path, fork=False):
+    """Serve replify requests on the unix socket at ``path`` forever."""
+    server = ReplifyServer(path, fork)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def request(path, snippet, outfile, context_file=None, context_module=None,
+            doctest_tb=False, top_level_await=False):
+    """Send ``snippet`` to the server at ``path``.
+
+    ``doctest_tb`` and ``top_level_await`` select the console type, as for
+    :func:`replify.replify.console_class`. The transcript is written to
+    ``outfile`` as it arrives. Raises RuntimeError with the server's
+    message if replifying failed.
+    """
+    if context_file:
+        context_file = os.path.abspath(context_file)
+    options = {
+        'context_file': context_file,
+        'context_module': context_module,
+        'doctest_tb': doctest_tb,
+        'top_level_await': top_level_await,
+    }
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        sock.sendall(json.dumps(options).encode('utf-8') + b'\n')
+        sock.sendall(snippet.encode('utf-8'))
+        sock.shutdown(socket.SHUT_WR)
+        while True:
+            type, data = recv_frame(sock)
+            if type == OUTPUT:
+                outfile.write(data)
+            elif type == ERROR:
+                raise RuntimeError(data)
+            else:
+                break
+    finally:
+        sock.close()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Sphinx extension adding a ``replify`` directive.
+
+Add ``'replify.sphinxext'`` to ``extensions`` in ``conf.py``; the content
+of each ``.. replify::`` directive is executed at build time and shown as a
+transcript. See the usage documentation for the configuration values.
+"""
+from __future__ import absolute_import
+
+import os
+import sys
+import hashlib
+
+from docutils import nodes
+from docutils.parsers.rst import Directive
+
+from replify import __version__
+from replify.batch import worker_context
+from replify.document import replify_block
+from replify.limits import LimitExceeded
+from replify.replify import (
+    Session, console_class, execute, chain_statement)
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+# the context of the build and a digest of its settings, set when the
+# builder is initialised, before read workers are forked
+_build = {}
+# the session of the document being read in this process, by docname
+_documents = {}
+
+
+def _context(app):
+    config = app.config
+    context_file = config.replify_context_file
+    if context_file:
+        context_file = os.path.join(app.confdir, context_file)
+    return worker_context(context_file, config.replify_context_module)
+
+
+def _console_type(config):
+    return console_class(config.replify_doctest_tracebacks,
+                         config.replify_async)
+
+
+def _settings(context, config):
+    """Return a digest of everything transcripts depend on but their text."""
+    h = hashlib.sha1(__version__.encode('ascii'))
+    for value in (context.digest, config.replify_doctest_tracebacks,
+                  config.replify_async, config.replify_limits,
+                  config.replify_display):
+        h.update(b'\0')
+        h.update(repr(value).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _init_env(env):
+    if not hasattr(env, 'replify_transcripts'):
+        # transcripts by docname, then by the chained hash of their source
+        env.replify_transcripts = {}
+        env.replify_previous = {}
+        env.replify_settings = None
+
+
+class _Document(object):
+    """The console of a document, and the blocks it has not run yet.
+
+    Blocks whose transcript is cached are only run, silently, once a later
+    block of the document has to be executed.
+    """
+
+    def __init__(self, config):
+        self.session = Session(
+            _build['context'].namespace(), _console_type(config),
+            config.replify_limits, display=config.replify_display)
+        self.prefix = _build['settings']
+        self.pending = []
+
+    def replay(self):
+        for lines in self.pending:
+            for _ in execute(lines + ['\n'], None, session=self.session):
+                pass
+        del self.pending[:]
+
+
+class ReplifyDirective(Directive):
+    """Executes its content and shows it as a transcript.
+
+    All the ``replify`` directives of a document run in order in one
+    console, so later ones see the names defined by earlier ones. The
+    content may also be a transcript, which is executed again from its
+    source. Transcripts are kept in the build environment and only
+    executed again if the content of their block, or of an earlier one in
+    the document, has changed.
+    """
+
+    has_content = True
+
+    def run(self):
+        env = self.state.document.settings.env
+        if not self.content:
+            return []
+        _init_env(env)
+        document = _documents.get(env.docname)
+        if document is None:
+            document = _documents[env.docname] = _Document(env.config)
+        lines = [line + '\n' for line in self.content]
+        document.prefix = key = chain_statement(document.prefix, lines)
+        transcripts = env.replify_transcripts.setdefault(env.docname, {})
+        transcript = env.replify_previous.get(env.docname, {}).get(key)
+        if transcript is None:
+            outfile = StringIO()
+            try:
+                document.replay()
+                replify_block(lines, outfile, document.session,
+                              self.content_offset + 1)
+            except (ValueError, LimitExceeded) as err:
+                raise self.error('replify: {0}'.format(err))
+            transcript = outfile.getvalue()
+        else:
+            document.pending.append(lines)
+        transcripts[key] = transcript
+        text = transcript.rstrip('\n')
+        node = nodes.literal_block(text, text)
+        node['language'] = 'pycon'
+        self.add_name(node)
+        return [node]
+
+
+def _builder_inited(app):
+    # import the context before read workers are forked, so they share it;
+    # a process running several builds imports it again if it has changed
+    context = _build['context'] = _context(app)
+    context.refresh()
+    _build['settings'] = _settings(context, app.config)
+
+
+def _env_get_outdated(app, env, added, changed, removed):
+    _init_env(env)
+    settings = _build['settings']
+    if settings == env.replify_settings:
+        return []
+    env.replify_settings = settings
+    return [docname for docname in env.replify_transcripts
+            if docname not in removed]
+
+
+def _env_purge_doc(app, env, docname):
+    _init_env(env)
+    # keep the transcripts of a document that is read again, for reuse
+    transcripts = env.replify_transcripts.pop(docname, None)
+    if transcripts:
+        env.replify_previous[docname] = transcripts
+
+
+def _env_merge_info(app, env, docnames, other):
+    _init_env(env)
+    for docname in docnames:
+        env.replify_previous.pop(docname, None)
+        if docname in other.replify_transcripts:
+            env.replify_transcripts[docname] = \
+                other.replify_transcripts[docname]
+
+
+def _doctree_read(app, doctree):
+    env = app.env
+    document = _documents.pop(env.docname, None)
+    if document is not None:
+        document.session.close()
+    if hasattr(env, 'replify_previous'):
+        env.replify_previous.pop(env.docname, None)
+
+
+def _env_updated(app, env):
+    _init_env(env)
+    env.replify_previous.clear()
+
+
+def setup(app):
+    app.add_config_value('replify_context_module', None, 'env')
+    app.add_config_value('replify_context_file', None, 'env')
+    app.add_config_value('replify_doctest_tracebacks', False, 'env')
+    app.add_config_value('replify_async', False, 'env')
+    # these are compared by repr, in env-get-outdated
+    app.add_config_value('replify_limits', None, '')
+    app.add_config_value('replify_display', None, '')
+    app.add_directive('replify', ReplifyDirective)
+    app.connect('builder-inited', _builder_inited)
+    app.connect('env-get-outdated', _env_get_outdated)
+    app.connect('env-purge-doc', _env_purge_doc)
+    app.connect('env-merge-info', _env_merge_info)
+    app.connect('doctree-read', _doctree_read)
+    app.connect('env-updated', _env_updated)
+    return {
+        'version': __version__,
+        'env_version': 1,
+        'parallel_read_safe': True,
+        'parallel_write_safe': True,
+    }
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 from pkgutil import walk_packages
 from doctest import DocTestSuite, DocFileSuite
 from setuptools.command.test import ScanningLoader
@@ -11,6 +12,12 @@ import replify
 DOC_PATH = os.path.abspath(os.path.join(
     os.path.dirname(replify.__file__), '..', 'docs'))
 
+# modules using syntax that older pythons cannot compile
+PY36_MODULES = ['replify.aio']
+
+# modules importing packages that may not be installed, by package
+OPTIONAL_MODULES = {'replify.sphinxext': 'docutils'}
+
 
 def reverse_iter(it):
     i = len(it)
@@ -28,6 +35,13 @@ class Loader(object):
         ):
             if ispkg:
                 continue
+            if name in PY36_MODULES and sys.version_info < (3, 6):
+                continue
+            if name in OPTIONAL_MODULES:
+                try:
+                    __import__(OPTIONAL_MODULES[name])
+                except ImportError:
+                    continue
             try:
                 docsuite = DocTestSuite(name)
             except ValueError as err:
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_aio
+----------------------------------
+
+Tests for `replify.aio` module.
+"""
+
+import sys
+import time
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+if sys.version_info >= (3, 6):
+    import asyncio
+    from replify import aio
+else:
+    aio = None
+
+
+@unittest.skipIf(aio is None, 'requires python 3.6+')
+class TestAreplify(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _collect(self, agen, count=None):
+        items = []
+        while count is None or len(items) < count:
+            try:
+                items.append(self.loop.run_until_complete(agen.__anext__()))
+            except StopAsyncIteration:
+                break
+        return items
+
+    def test_statements(self):
+        agen = aio.areplify(
+            StringIO('a = 1\nfor i in range(2):\n    print(i)\n\na\n'), {})
+        self.assertEqual(
+            [(r.source, r.output) for r in self._collect(agen)], [
+                (['a = 1\n'], ''),
+                (['for i in range(2):\n', '    print(i)\n', '\n'],
+                 '0\n1\n'),
+                (['a\n'], '1\n'),
+            ])
+
+    def test_exception_is_output(self):
+        agen = aio.areplify(StringIO('b\n'), {})
+        (result,) = self._collect(agen)
+        self.assertIn('NameError', result.output)
+        self.assertEqual(result.exception[0], 'NameError')
+
+    def test_error_is_raised(self):
+        agen = aio.areplify(StringIO('  a\nb\n'), {})
+        self.assertRaises(ValueError, self._collect, agen)
+
+    def test_close_stops_execution(self):
+        context = {}
+        agen = aio.areplify(StringIO(
+            'a = 1\n'
+            'import time\n'
+            'while True: time.sleep(0.01)\n'
+            'b = 2\n'
+        ), context)
+        self.assertEqual(len(self._collect(agen, 1)), 1)
+        self.loop.run_until_complete(agen.aclose())
+        for i in range(200):
+            if not any(t.name == 'replify' for t in threading.enumerate()):
+                break
+            time.sleep(0.01)
+        else:
+            self.fail('execution was not stopped')
+        self.assertEqual(context['a'], 1)
+        self.assertNotIn('b', context)
+
+    def test_concurrent(self):
+        snippet = ''.join(
+            'time.sleep(0.001); print(name, {0})\n'.format(i)
+            for i in range(50))
+
+        agens = [aio.areplify(StringIO(snippet),
+                              {'name': 's{0}'.format(n), 'time': time})
+                 for n in range(4)]
+        results = [[] for _ in agens]
+        # the snippets run in their threads while the loop waits for a
+        # statement of each
+        asyncio.set_event_loop(self.loop)
+        try:
+            while True:
+                items = self.loop.run_until_complete(asyncio.gather(
+                    *[agen.__anext__() for agen in agens],
+                    return_exceptions=True))
+                if all(isinstance(item, StopAsyncIteration)
+                       for item in items):
+                    break
+                for outputs, item in zip(results, items):
+                    outputs.append(item.output)
+        finally:
+            asyncio.set_event_loop(None)
+        for n, outputs in enumerate(results):
+            self.assertEqual(outputs, [
+                's{0} {1}\n'.format(n, i) for i in range(50)])
+
+    def test_finished_thread_is_not_interrupted(self):
+        agen = aio.areplify(StringIO('a = 1\n'), {})
+        self._collect(agen)
+        self.loop.run_until_complete(agen.aclose())
+        self.assertFalse(
+            any(t.name == 'replify' for t in threading.enumerate()))
+
+
+if __name__ == '__main__':
+    unittest.main()
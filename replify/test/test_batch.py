@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_batch
+----------------------------------
+
+Tests for `replify.batch` module.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify import batch
+from replify.replify import Context
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.indir = os.path.join(self.tmpdir, 'in')
+        self.outdir = os.path.join(self.tmpdir, 'out')
+        os.mkdir(self.indir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, text):
+        path = os.path.join(self.indir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def _read(self, name):
+        with open(os.path.join(self.outdir, name)) as f:
+            return f.read()
+
+
+class TestBatch(BatchTestCase):
+    def test_expand_directory(self):
+        self._write('a.py', '1\n')
+        self._write(os.path.join('sub', 'b.py'), '2\n')
+        self.assertEqual(
+            [relpath for path, relpath in batch.expand_inputs([self.indir])],
+            ['a.py', os.path.join('sub', 'b.py')])
+
+    def test_expand_glob(self):
+        self._write('a.py', '1\n')
+        self._write('b.txt', '2\n')
+        pattern = os.path.join(self.indir, '*.py')
+        self.assertEqual(
+            [relpath for path, relpath in batch.expand_inputs([pattern])],
+            ['a.py'])
+
+    def test_expand_skips_duplicates(self):
+        path = self._write('a.py', '1\n')
+        self.assertEqual(len(batch.expand_inputs([path, self.indir])), 1)
+
+    def test_batch(self):
+        self._write('a.py', 'a = 1\na\n')
+        self._write('b.py', 'a\n')
+        results = batch.replify_batch(
+            [self.indir], self.outdir, Context())
+        self.assertEqual([r.status for r in results], ['ok', 'ok'])
+        self.assertEqual(self._read('a.py'), '>>> a = 1\n>>> a\n1\n')
+        # each file gets its own namespace
+        self.assertIn('NameError', self._read('b.py'))
+
+    def test_batch_records_errors(self):
+        self._write('a.py', '    1\n2\n')
+        self._write('b.py', '1\n')
+        results = batch.replify_batch(
+            [self.indir], self.outdir, Context())
+        self.assertEqual([r.status for r in results], ['error', 'ok'])
+        self.assertIn('ValueError', results[0].error)
+
+    def test_batch_fork(self):
+        self._write('a.py', 'a = 2\na\n')
+        self._write('b.py', 'a\n')
+        context = Context()
+        context.module = type(sys)('ctx')
+        context.module.a = 1
+        results = batch.replify_batch(
+            [self.indir], self.outdir, context, fork=True)
+        self.assertEqual([r.status for r in results], ['ok', 'ok'])
+        self.assertEqual(self._read('a.py'), '>>> a = 2\n>>> a\n2\n')
+        self.assertEqual(self._read('b.py'), '>>> a\n1\n')
+        self.assertEqual(context.module.a, 1)
+
+    def test_parallel(self):
+        names = ['{0}.py'.format(i) for i in range(8)]
+        for i, name in enumerate(names):
+            self._write(name, 'a = {0}\na\n'.format(i))
+        results = batch.replify_batch(
+            [self.indir], self.outdir, Context(), jobs=3)
+        self.assertEqual([os.path.basename(r.path) for r in results], names)
+        self.assertTrue(all(r.ok for r in results), [r.error for r in results])
+        for i, name in enumerate(names):
+            self.assertEqual(
+                self._read(name), '>>> a = {0}\n>>> a\n{0}\n'.format(i))
+
+    def test_parallel_fails_fast_on_worker_crash(self):
+        try:
+            from concurrent.futures.process import BrokenProcessPool
+        except ImportError:
+            self.skipTest('requires concurrent.futures')
+        self._write('a.py', 'import os\nos._exit(1)\n')
+        self._write('b.py', '1\n')
+        self.assertRaises(
+            BrokenProcessPool, batch.replify_batch,
+            [self.indir], self.outdir, Context(), jobs=2)
+
+    def test_write_report(self):
+        results = [
+            batch.BatchResult('a.py', 'out/a.py', elapsed=0.5),
+            batch.BatchResult('b.py', 'out/b.py', 'ValueError: ', 0.25),
+        ]
+        stream = StringIO()
+        batch.write_report(results, stream)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], 'ok        0.500s  a.py -> out/a.py')
+        self.assertEqual(lines[1], 'error     0.250s  b.py: ValueError: ')
+        self.assertEqual(lines[2], '2 files, 1 failed, 0.750s')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_cache
+----------------------------------
+
+Tests for `replify.cache` module.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from replify.cache import TranscriptCache
+from replify.replify import Context, DoctestTracebackConsole
+from replify.test.test_batch import BatchTestCase
+from replify import batch
+
+
+class TestTranscriptCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = TranscriptCache(self.tmpdir)
+        self.context = Context()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_put(self):
+        key = self.cache.key('1\n', self.context)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, '>>> 1\n1\n')
+        self.assertEqual(self.cache.get(key), '>>> 1\n1\n')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_put_replacing_an_entry(self):
+        key = self.cache.key('1\n', self.context)
+        self.cache.max_size = 25
+        for _ in range(3):
+            self.cache.put(key, 'x' * 10)
+        self.assertEqual(self.cache._size, 10)
+        self.assertIsNotNone(self.cache.get(key))
+
+    def test_key(self):
+        key = self.cache.key('1\n', self.context)
+        self.assertEqual(key, self.cache.key('1\n', self.context))
+        self.assertNotEqual(key, self.cache.key('2\n', self.context))
+        self.assertNotEqual(key, self.cache.key(
+            '1\n', self.context, DoctestTracebackConsole))
+        self.context.digest = 'x'
+        self.assertNotEqual(key, self.cache.key('1\n', self.context))
+
+    def test_evicts_least_recently_used(self):
+        keys = [self.cache.key(str(i), self.context) for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, 'x' * 10)
+            mtime = time.time() - 100 + i
+            os.utime(self.cache._path(key), (mtime, mtime))
+        self.cache.get(keys[0])
+        self.cache.max_size = 25
+        self.cache.evict()
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+
+class TestBatchCache(BatchTestCase):
+    def test_batch_uses_cache(self):
+        self._write('a.py', '1\n')
+        self._write('b.py', '2\n')
+        cache = TranscriptCache(os.path.join(self.tmpdir, 'cache'))
+        results = batch.replify_batch(
+            [self.indir], self.outdir, Context(), cache=cache)
+        self.assertEqual([r.cached for r in results], [False, False])
+        os.remove(os.path.join(self.outdir, 'a.py'))
+        results = batch.replify_batch(
+            [self.indir], self.outdir, Context(), cache=cache)
+        self.assertEqual([r.cached for r in results], [True, True])
+        self.assertEqual(self._read('a.py'), '>>> 1\n1\n')
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
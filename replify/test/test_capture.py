@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_capture
+----------------------------------
+
+Tests for `replify.capture` module.
+"""
+
+import sys
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify import capture
+from replify.replify import replify
+from replify.display import Display
+
+SNIPPET = '''\
+import time
+for i in range(50):
+    print('{0} %d' % i)
+    time.sleep(0)
+
+sys.stderr.write('{0} err\\n')
+'{0}'
+_ * 2
+'''
+
+
+def _transcript(name):
+    lines = [
+        '>>> import time\n',
+        '>>> for i in range(50):\n',
+        "...     print('{0} %d' % i)\n".format(name),
+        '...     time.sleep(0)\n',
+        '... \n',
+    ]
+    lines.extend('{0} {1}\n'.format(name, i) for i in range(50))
+    lines.extend([
+        ">>> sys.stderr.write('{0} err\\n')\n".format(name),
+        '{0} err\n'.format(name),
+        ">>> '{0}'\n".format(name),
+        "'{0}'\n".format(name),
+        '>>> _ * 2\n',
+        "'{0}{0}'\n".format(name),
+    ])
+    return ''.join(lines)
+
+
+def _replify(name, display=None):
+    outfile = StringIO()
+    replify(StringIO(SNIPPET.format(name)), outfile,
+            {'sys': sys}, display=display)
+    return outfile.getvalue()
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        capture.install()
+
+    def tearDown(self):
+        capture.uninstall()
+
+    def test_install(self):
+        self.assertTrue(capture.installed())
+        stdout = sys.stdout
+        capture.install()
+        self.assertIs(sys.stdout, stdout)
+        capture.uninstall()
+        self.assertFalse(capture.installed())
+        self.assertIs(sys.stdout, stdout.original)
+
+    def test_routing(self):
+        original = sys.stdout.original
+        sys.stdout.original = stream = StringIO()
+        try:
+            target = StringIO()
+            previous = capture.activate((target, target, None))
+            try:
+                sys.stdout.write('in')
+            finally:
+                capture.activate(previous)
+            sys.stdout.write('out')
+        finally:
+            sys.stdout.original = original
+        self.assertEqual(target.getvalue(), 'in')
+        self.assertEqual(stream.getvalue(), 'out')
+
+    def test_concurrent(self):
+        names = ['session{0}'.format(i) for i in range(16)]
+        transcripts = {}
+        errors = []
+        display = Display()
+
+        def run(name):
+            try:
+                for _ in range(5):
+                    transcripts.setdefault(name, set()).add(
+                        _replify(name, display if len(name) % 2 else None))
+            except Exception as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=run, args=(name,))
+                   for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        for name in names:
+            self.assertEqual(transcripts[name], set([_transcript(name)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_check
+----------------------------------
+
+Tests for `replify.check` module.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify.replify import Context
+from replify.check import check, elide_tracebacks, write_diffs, write_report
+
+TRANSCRIPT = (
+    '>>> x = 2\n'
+    '>>> x * 21\n'
+    '42\n'
+    '>>> 1 / 0\n'
+    'Traceback (most recent call last):\n'
+    '  ...\n'
+    'ZeroDivisionError: {0}\n'
+)
+
+DOCUMENT = (
+    'Some text.\n'
+    '\n'
+    '.. code-block:: python\n'
+    '\n'
+    '   >>> print("a\\n\\nb")\n'
+    '   a\n'
+    '   <BLANKLINE>\n'
+    '   b\n'
+    '\n'
+    '>>> int("x")\n'
+    'Traceback (most recent call last):\n'
+    '  File "<stdin>", line 1, in <module>\n'
+    '...\n'
+    "ValueError: invalid literal for int() with base 10: 'x'\n"
+)
+
+try:
+    1 / 0
+except ZeroDivisionError as err:
+    MESSAGE = str(err)
+
+
+class TestElideTracebacks(unittest.TestCase):
+    def test_elide(self):
+        lines = [
+            '    Traceback (most recent call last):\n',
+            '      File "<stdin>", line 1, in <module>\n',
+            '        f()\n',
+            '    ...\n',
+            '    NameError: f\n',
+            '    Traceback (most recent call last):\n',
+        ]
+        self.assertEqual(elide_tracebacks(lines), [
+            '    Traceback (most recent call last):\n',
+            '      ...\n',
+            '    NameError: f\n',
+            '    Traceback (most recent call last):\n',
+            '      ...\n',
+        ])
+
+
+class TestCheck(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_up_to_date(self):
+        self._write('snippet.txt', TRANSCRIPT.format(MESSAGE))
+        self._write('doc.rst', DOCUMENT)
+        results = check([self.tmpdir], Context())
+        self.assertEqual([r.status for r in results], ['ok'] * 2)
+
+    def test_directories_only_give_documents_and_transcripts(self):
+        self._write('snippet.txt', TRANSCRIPT.format(MESSAGE))
+        self._write('Makefile', 'all:\n\techo\n')
+        self._write('conf.py', 'project = "x"\n')
+        with open(os.path.join(self.tmpdir, 'data.bin'), 'wb') as f:
+            f.write(b'\x00\xff' * 10)
+        for name in ('_build', '.cache'):
+            os.mkdir(os.path.join(self.tmpdir, name))
+            self._write(os.path.join(name, 'doc.rst'), '>>> 1\n2\n')
+        results = check([self.tmpdir], Context())
+        self.assertEqual([os.path.basename(r.path) for r in results],
+                         ['snippet.txt'])
+        self.assertEqual(results[0].status, 'ok')
+        path = self._write('Makefile', 'all:\n\techo\n')
+        (result,) = check([path], Context())
+        self.assertEqual(result.status, 'ok')
+
+    def test_mismatch(self):
+        path = self._write('snippet.txt', TRANSCRIPT.format('stale'))
+        (result,) = check([path], Context())
+        self.assertEqual(result.status, 'failed')
+        self.assertEqual(
+            [line for line in result.diff if line[0] in '+-'][2:], [
+                '-ZeroDivisionError: stale\n',
+                '+ZeroDivisionError: {0}\n'.format(MESSAGE),
+            ])
+        stream = StringIO()
+        write_diffs([result], stream)
+        self.assertTrue(stream.getvalue().startswith('--- ' + path))
+        stream = StringIO()
+        write_report([result], stream)
+        self.assertIn('1 files, 1 failed', stream.getvalue())
+
+    def test_parallel(self):
+        for i in range(4):
+            self._write('{0}.md'.format(i), '```python\n>>> {0}\n{1}\n```\n'
+                        .format(i, i % 2))
+        results = check([self.tmpdir], Context(), jobs=2)
+        self.assertEqual([r.status for r in results],
+                         ['ok', 'ok', 'failed', 'failed'])
+
+    def test_plain_code_blocks_run_but_are_not_compared(self):
+        self._write('doc.rst', '.. code-block:: python\n\n'
+                    '   y = 6\n   print(y)\n\n'
+                    '>>> y * 7\n42\n')
+        (result,) = check([self.tmpdir], Context())
+        self.assertEqual(result.status, 'ok')
+
+    def test_error(self):
+        self._write('bad.rst', '.. code-block:: python\n\n   1\n  2\n')
+        (result,) = check([self.tmpdir], Context())
+        self.assertEqual(result.status, 'error')
+        self.assertIn('inconsistent indentation', result.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
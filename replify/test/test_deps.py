@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_deps
+----------------------------------
+
+Tests for `replify.deps` module.
+"""
+
+import os
+import sys
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify import deps
+from replify.replify import replify, execute
+
+
+def _bump_context():
+    # a function of the context, with effects the analysis cannot see
+    context = {'counter': [0]}
+    exec('def bump():\n'
+         '    counter[0] += 1\n'
+         '    return counter[0]\n', context)
+    return context
+
+
+def _statements(*sources):
+    return deps.statements([[line + '\n' for line in source.split('\n')]
+                            for source in sources])
+
+
+class _Store(dict):
+    dependencies = True
+
+    def put(self, key, data):
+        self[key] = data
+
+
+class TestAnalyze(unittest.TestCase):
+    def test_assignment(self):
+        names, deferred = deps.analyze('a = b + c\n')
+        self.assertEqual(names.reads, set(['b', 'c']))
+        self.assertEqual(names.binds, set(['a']))
+        self.assertFalse(names.opaque)
+
+    def test_expression_binds_result(self):
+        names, _ = deps.analyze('a\n')
+        self.assertEqual(names.binds, set([deps.RESULT]))
+
+    def test_method_call_mutates(self):
+        names, _ = deps.analyze('a.append(b)\n')
+        self.assertEqual(names.binds, set(['a', 'b', deps.RESULT]))
+
+    def test_item_assignment_mutates(self):
+        names, _ = deps.analyze('a[0] = 1\n')
+        self.assertIn('a', names.reads)
+        self.assertIn('a', names.binds)
+
+    def test_comprehension_targets_are_local(self):
+        if sys.version_info[0] < 3:
+            self.skipTest('list comprehensions leak their targets')
+        names, _ = deps.analyze('a = [x for x in b]\n')
+        self.assertEqual(names.reads, set(['b']))
+        self.assertEqual(names.binds, set(['a']))
+
+    def test_function_body_is_deferred(self):
+        names, deferred = deps.analyze(
+            'def f(x):\n    y = x + a\n    b.append(y)\n    return y\n')
+        self.assertEqual(names.binds, set(['f']))
+        self.assertEqual(names.reads, set())
+        self.assertEqual(deferred['f'].reads, set(['a', 'b']))
+        self.assertEqual(deferred['f'].binds, set(['b']))
+
+    def test_opaque(self):
+        for source in ('from os import *\n', 'x = globals()\n',
+                       'exec("a = 1")\n'):
+            self.assertTrue(deps.analyze(source)[0].opaque, source)
+
+    def test_calls(self):
+        names, _ = deps.analyze('a = f(len(b))\n')
+        self.assertEqual(names.calls, set(['f', 'len']))
+        self.assertFalse(names.opaque)
+
+    def test_calling_an_argument_is_opaque(self):
+        _, deferred = deps.analyze('def f(g):\n    return g()\n')
+        self.assertTrue(deferred['f'].opaque)
+        _, deferred = deps.analyze(
+            'def f():\n    def g():\n        pass\n    return g()\n')
+        self.assertFalse(deferred['f'].opaque)
+
+    def test_syntax_error(self):
+        self.assertIsNone(deps.analyze('a = \n'))
+
+    @unittest.skipIf(sys.version_info < (3, 10), 'needs match statements')
+    def test_match_patterns_bind(self):
+        names, _ = deps.analyze(
+            'match v:\n'
+            '    case [x, *rest]: pass\n'
+            '    case {"k": 1, **others}: pass\n'
+            '    case P(y) as z: pass\n')
+        self.assertEqual(names.binds, set(['x', 'rest', 'others', 'y', 'z']))
+        self.assertEqual(names.reads, set(['v', 'P']))
+        _, deferred = deps.analyze(
+            'def f():\n    match v:\n        case [x]: return x\n')
+        self.assertEqual(deferred['f'].reads, set(['v']))
+        self.assertEqual(deferred['f'].binds, set())
+
+
+class TestStatements(unittest.TestCase):
+    def test_depends_on_every_writer(self):
+        statements = _statements('a = []', 'b = 1', 'a.append(b)', 'a')
+        self.assertEqual(statements[2].depends, set([0, 1]))
+        self.assertEqual(statements[3].depends, set([0, 2]))
+
+    def test_calls_have_the_effects_of_the_body(self):
+        statements = _statements(
+            'a = 1', 'def f():\n    return a', 'a = 2', 'f()')
+        self.assertEqual(statements[3].depends, set([0, 1, 2]))
+
+    def test_calls_have_the_effects_of_the_functions_they_call(self):
+        statements = _statements(
+            'a = []', 'def f():\n    a.append(1)', 'def g():\n    f()',
+            'g()')
+        self.assertEqual(statements[3].depends, set([0, 1, 2]))
+        self.assertFalse(statements[3].opaque)
+
+    def test_unknown_calls_are_opaque(self):
+        statements = _statements('a = 1', 'bump()', 'b = len([a])', 'a')
+        self.assertTrue(statements[1].opaque)
+        self.assertEqual(statements[1].depends, set([0]))
+        self.assertFalse(statements[2].opaque)
+        self.assertEqual(statements[3].depends, set([0, 1]))
+
+    def test_opaque_is_a_barrier(self):
+        statements = _statements('a = 1', 'from os import *', 'b = 2')
+        self.assertEqual(statements[1].depends, set([0]))
+        self.assertEqual(statements[2].depends, set([1]))
+
+    def test_sections(self):
+        statements = _statements('a = 1', 'b = 2', 'a + 1', 'c = b', 'd = 4')
+        self.assertEqual(deps.sections(statements), [[0, 2], [1, 3], [4]])
+
+    def test_required(self):
+        statements = _statements('a = 1', 'b = 2', 'c = a', 'c')
+        self.assertEqual(deps.required(statements, [3]), set([0, 2, 3]))
+
+
+class TestDependencyCheckpoints(unittest.TestCase):
+    snippet = ('import sys\n'
+               'a = [1]\n'
+               '\n'
+               'b = 10\n'
+               'sys.stdout.write("ran\\n")\n'
+               'a.append(b)\n'
+               'a\n')
+
+    def _replify(self, text, checkpoints, context=None):
+        outfile = StringIO()
+        replify(StringIO(text), outfile, context or {},
+                checkpoints=checkpoints)
+        return outfile.getvalue()
+
+    def test_only_affected_statements_run(self):
+        store = _Store()
+        first = self._replify(self.snippet, store)
+        self.assertIn('[1, 10]', first)
+        entries = len(store)
+        changed = self.snippet.replace('b = 10', 'b = 11')
+        second = self._replify(changed, store)
+        self.assertIn('[1, 11]', second)
+        self.assertEqual(second, self._replify(changed, None))
+        # b = 11, a.append(b) and a are stored again
+        self.assertEqual(len(store), entries + 3)
+
+    def test_stored_results_are_not_run(self):
+        calls = []
+        context = {'calls': calls}
+        text = 'calls.append(1)\na = 1\na\n'
+        store = _Store()
+        for _ in range(2):
+            replify(StringIO(text), StringIO(), dict(context),
+                    checkpoints=store)
+        self.assertEqual(len(calls), 1)
+        replify(StringIO(text.replace('a = 1', 'a = 2')), StringIO(),
+                dict(context), checkpoints=store)
+        self.assertEqual(len(calls), 1)
+
+
+    def test_context_functions_run_in_order(self):
+        text = 'bump()\nbump()\ncounter\n'
+        expected = StringIO()
+        replify(StringIO(text), expected, _bump_context())
+        self.assertIn('[2]', expected.getvalue())
+        store = _Store()
+        self.assertEqual(
+            self._replify(text, store, _bump_context()), expected.getvalue())
+        self.assertEqual(len(store), 3)
+        changed = text.replace('counter\n', 'counter[0]\n')
+        outfile = StringIO()
+        replify(StringIO(changed), outfile, _bump_context())
+        self.assertEqual(self._replify(changed, store, _bump_context()),
+                         outfile.getvalue())
+
+    def test_identical_statements_have_their_own_entries(self):
+        store = _Store()
+        self._replify('print(1)\nprint(1)\n', store)
+        self.assertEqual(len(store), 2)
+
+
+class TestPrefixCheckpoints(unittest.TestCase):
+    def test_replayed_exceptions_are_not_reported_again(self):
+        store = {}
+
+        class Store(object):
+            def get(self, key):
+                return store.get(key)
+
+            def put(self, key, data):
+                store[key] = data
+
+        text = 'x = 1\n1/0\ny = 2\n'
+        list(execute(StringIO(text), {}, checkpoints=Store()))
+        results = list(execute(StringIO(text.replace('y = 2', 'y = 3')), {},
+                               checkpoints=Store()))
+        self.assertEqual(results[1].exception[0], 'ZeroDivisionError')
+        self.assertIsNone(results[2].exception)
+
+    def test_replay_goes_on_after_blank_lines(self):
+        store = {}
+
+        class Store(object):
+            def get(self, key):
+                return store.get(key)
+
+            def put(self, key, data):
+                store[key] = data
+
+        text = 'a = 1\n\n# a comment\nb = a\n\nc = b\n'
+        replify(StringIO(text), StringIO(), {}, checkpoints=Store())
+        entries = len(store)
+        outfile = StringIO()
+        replify(StringIO(text.replace('c = b', 'c = b + 1')), outfile, {},
+                checkpoints=Store())
+        self.assertEqual(len(store), entries + 1)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+class TestParallel(unittest.TestCase):
+    snippet = ('a = 1\n'
+               'b = [2]\n'
+               '\n'
+               'def f(x):\n'
+               '    return x + a\n'
+               '\n'
+               'b.append(3)\n'
+               'print(f(1))\n'
+               'b\n'
+               '1/0\n'
+               'c = \n'
+               'a + 1\n')
+
+    def test_same_output_as_sequential(self):
+        expected = StringIO()
+        replify(StringIO(self.snippet), expected, {})
+        outfile = StringIO()
+        replify(StringIO(self.snippet), outfile, {}, jobs=3)
+        self.assertEqual(outfile.getvalue(), expected.getvalue())
+
+    def test_context_functions_run_in_order(self):
+        text = 'bump()\nbump()\ncounter\n'
+        expected = StringIO()
+        replify(StringIO(text), expected, _bump_context())
+        outfile = StringIO()
+        replify(StringIO(text), outfile, _bump_context(), jobs=2)
+        self.assertEqual(outfile.getvalue(), expected.getvalue())
+        self.assertIn('[2]', outfile.getvalue())
+
+    @unittest.skipIf(sys.version_info < (3, 10), 'needs match statements')
+    def test_match_patterns(self):
+        text = 'match [1, 2]:\n    case [x, y]: pass\n\nprint(x + y)\n'
+        expected = StringIO()
+        replify(StringIO(text), expected, {})
+        self.assertIn('3\n', expected.getvalue())
+        outfile = StringIO()
+        replify(StringIO(text), outfile, {}, jobs=4)
+        self.assertEqual(outfile.getvalue(), expected.getvalue())
+
+    def test_single_section(self):
+        text = 'a = 1\nb = a\nb\n'
+        expected = StringIO()
+        replify(StringIO(text), expected, {})
+        outfile = StringIO()
+        replify(StringIO(text), outfile, {}, jobs=2)
+        self.assertEqual(outfile.getvalue(), expected.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
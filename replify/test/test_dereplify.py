@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_dereplify
+----------------------------------
+
+Tests for `replify.dereplify` module.
+"""
+
+import sys
+import mmap
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from io import BytesIO
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify.dereplify import dereplify
+
+TRANSCRIPT = (
+    '    >>> def a():\n'
+    '    ...     return 1\n'
+    '    ... \n'
+    '    >>> a()\n'
+    '    1\n'
+    '\n'
+    '    >>> print(2)\n'
+    '    2\n'
+)
+
+SOURCE = (
+    '    def a():\n'
+    '        return 1\n'
+    '    \n'
+    '    a()\n'
+    '    \n'
+    '    print(2)\n'
+)
+
+
+class TestDereplify(unittest.TestCase):
+    def _helper(self, transcript, **kw):
+        outfile = StringIO()
+        dereplify(StringIO(transcript), outfile, **kw)
+        return outfile.getvalue()
+
+    def test_dereplify(self):
+        self.assertEqual(self._helper(TRANSCRIPT), SOURCE)
+
+    def test_chunk_boundaries(self):
+        for chunk_size in range(1, 20):
+            self.assertEqual(
+                self._helper(TRANSCRIPT, chunk_size=chunk_size), SOURCE)
+
+    def test_head(self):
+        first, rest = TRANSCRIPT.split('\n', 1)
+        outfile = StringIO()
+        dereplify(StringIO(rest), outfile, first + '\n')
+        self.assertEqual(outfile.getvalue(), SOURCE)
+
+    def test_iterable(self):
+        outfile = StringIO()
+        dereplify(TRANSCRIPT.splitlines(True), outfile, chunk_size=10)
+        self.assertEqual(outfile.getvalue(), SOURCE)
+
+    def test_last_line_without_newline(self):
+        self.assertEqual(self._helper('  >>> a\n  >>> b'), '  a\n  b')
+        self.assertEqual(self._helper('  >>> a\n  >>> '), '  a\n')
+        self.assertEqual(self._helper('  >>> a\n  out'), '  a\n')
+
+    def test_inconsistent_indent_raises_ValueError(self):
+        self.assertRaises(ValueError, self._helper, '    >>> 1\n2\n')
+
+    def test_mmap(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(TRANSCRIPT.encode('ascii'))
+            f.flush()
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            outfile = BytesIO()
+            dereplify(buf, outfile, chunk_size=7)
+            buf.close()
+        self.assertEqual(outfile.getvalue(), SOURCE.encode('ascii'))
+
+
+if __name__ == '__main__':
+    unittest.main()
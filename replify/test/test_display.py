@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_display
+----------------------------------
+
+Tests for `replify.display` module.
+"""
+
+import os
+import sys
+import json
+import pickle
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify import display
+from replify.display import Display
+from replify.replify import replify
+from replify.results import JSONLinesRenderer
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Slow(object):
+    def __repr__(self):
+        start = display.timer()
+        while display.timer() - start < 0.01:
+            pass
+        return 'Slow()'
+
+
+class TestDisplay(unittest.TestCase):
+    def test_same_as_repr(self):
+        values = [
+            [], (), {}, set(), frozenset(), (1,), [1, (2,), {'a': 3}],
+            {1, 2}, frozenset([1]), 'abc', b'abc', 2 ** 100, 1.5, None,
+            [[[['deep']]]], {'k': ['v', ('w',)]},
+        ]
+        for value in values:
+            self.assertEqual(Display().format(value), repr(value))
+
+    def test_items(self):
+        d = Display(maxitems=3)
+        self.assertEqual(d.format(list(range(10))), '[0, 1, 2, ...]')
+        self.assertEqual(d.format(tuple(range(3))), '(0, 1, 2)')
+        value = dict.fromkeys('abcd', 0)
+        self.assertEqual(d.format(value), '{{{0}, ...}}'.format(
+            ', '.join('{0!r}: 0'.format(key) for key in list(value)[:3])))
+
+    def test_depth(self):
+        d = Display(maxlevel=2)
+        self.assertEqual(d.format([1, [2, [3, [4]]]]), '[1, [2, [...]]]')
+        self.assertEqual(d.format({'a': {'b': {}}}), "{'a': {'b': {}}}")
+
+    def test_strings(self):
+        d = Display(maxstring=9, maxother=9)
+        self.assertEqual(d.format('abcdefghijklmno'), "'ab...no'")
+        self.assertEqual(d.format(Point), repr(Point)[:3] + '...' +
+                         repr(Point)[-3:])
+        self.assertEqual(d.format(10 ** 1000), '<int of 3322 bits>')
+
+    def test_recursion(self):
+        value = [1]
+        value.append(value)
+        self.assertEqual(Display().format(value), '[1, [...]]')
+
+    def test_budget(self):
+        text = Display(budget=0.02).format([Slow()] * 100)
+        self.assertTrue(text.endswith(', ...]'))
+        self.assertLess(text.count('Slow()'), 10)
+
+    def test_register(self):
+        d = Display()
+        d.register(Point, lambda p, d, level: 'Point({0}, {1})'.format(
+            d.format_item(p.x, level - 1), d.format_item(p.y, level - 1)))
+        self.assertEqual(d.format([Point(1, 'a')]), "[Point(1, 'a')]")
+        self.assertNotEqual(Display().format(Point(1, 2)), 'Point(1, 2)')
+
+        name = '{0}.Point'.format(__name__)
+        display.register(name, lambda p, d, level: '<point>')
+        try:
+            self.assertEqual(Display().format(Point(1, 2)), '<point>')
+            self.assertIn(name, repr(Display()))
+        finally:
+            del display._formatters[name]
+
+    def test_subclass(self):
+        class List(list):
+            def __repr__(self):
+                return 'List()'
+        self.assertEqual(Display(maxitems=1).format(List([1, 2])), 'List()')
+
+    def test_pickle(self):
+        d = Display(maxitems=3)
+        d.format([1])
+        self.assertEqual(pickle.loads(pickle.dumps(d)).format([1, 2, 3, 4]),
+                         '[1, 2, 3, ...]')
+
+
+class TestReplify(unittest.TestCase):
+    def test_replify(self):
+        outfile = StringIO()
+        replify(StringIO('x = list(range(10))\nx\nlen(_)\nNone\n'),
+                outfile, {}, display=Display(maxitems=3))
+        self.assertEqual(outfile.getvalue(), (
+            '>>> x = list(range(10))\n'
+            '>>> x\n'
+            '[0, 1, 2, ...]\n'
+            '>>> len(_)\n'
+            '10\n'
+            '>>> None\n'
+        ))
+
+    def _values(self, text, **kwargs):
+        outfile = StringIO()
+        replify(StringIO(text), outfile, {}, display=Display(maxitems=3),
+                renderer_type=JSONLinesRenderer, **kwargs)
+        return [json.loads(line)['value']
+                for line in outfile.getvalue().splitlines()]
+
+    def test_json(self):
+        self.assertEqual(self._values('list(range(10))\n'),
+                         ['[0, 1, 2, ...]'])
+
+    def test_checkpoints(self):
+        store = {}
+
+        class Store(object):
+            def get(self, key):
+                return store.get(key)
+
+            def put(self, key, data):
+                store[key] = data
+
+        text = 'x = list(range(10))\nx\n'
+        for _ in range(2):
+            self.assertEqual(self._values(text, checkpoints=Store()),
+                             [None, '[0, 1, 2, ...]'])
+        self.assertEqual(
+            sorted(json.loads(data)['value'] for data in store.values()
+                   if json.loads(data)['value'] is not None),
+            ['[0, 1, 2, ...]'])
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_jobs(self):
+        self.assertEqual(self._values('list(range(10))\n1\n', jobs=2),
+                         ['[0, 1, 2, ...]', '1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
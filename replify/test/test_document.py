@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_document
+----------------------------------
+
+Tests for `replify.document` module.
+"""
+
+import io
+import os
+import code
+import shutil
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from replify.document import (
+    replify_document, rewrite_document, rst_blocks, markdown_blocks,
+    document_format)
+
+RST = u'''\
+Title
+=====
+
+A literal block::
+
+    $ replify -i snippet.py
+
+.. code-block:: python
+   :linenos:
+
+   def f(n):
+       return n * 2
+
+   x = f(21)
+   x
+
+A doctest block, with stale output:
+
+>>> print('a\\n\\nb')
+old output
+>>> x + 1
+
+.. code-block:: text
+
+   >>> 1 / 0
+
+End.
+'''
+
+RST_OUT = u'''\
+Title
+=====
+
+A literal block::
+
+    $ replify -i snippet.py
+
+.. code-block:: python
+   :linenos:
+
+   >>> def f(n):
+   ...     return n * 2
+   ...
+   >>> x = f(21)
+   >>> x
+   42
+
+A doctest block, with stale output:
+
+>>> print('a\\n\\nb')
+a
+<BLANKLINE>
+b
+>>> x + 1
+43
+
+.. code-block:: text
+
+   >>> 1 / 0
+
+End.
+'''
+
+MARKDOWN = u'''\
+# Title
+
+```python
+a = 1
+a
+```
+
+```sh
+echo a
+```
+
+~~~pycon
+>>> a + 1
+7
+>>> def g():
+...     return a
+~~~
+'''
+
+MARKDOWN_OUT = u'''\
+# Title
+
+```python
+>>> a = 1
+>>> a
+1
+```
+
+```sh
+echo a
+```
+
+~~~pycon
+>>> a + 1
+2
+>>> def g():
+...     return a
+...
+~~~
+'''
+
+
+def _replify(text, format='rst'):
+    outfile = io.StringIO()
+    replify_document(io.StringIO(text), outfile, {}, format)
+    return outfile.getvalue()
+
+
+class TestBlocks(unittest.TestCase):
+    def test_rst_blocks(self):
+        blocks = list(rst_blocks(io.StringIO(RST)))
+        code = [''.join(lines) for lines, is_code in blocks if is_code]
+        self.assertEqual(code, [
+            u'\n   def f(n):\n       return n * 2\n\n   x = f(21)\n   x\n\n',
+            u">>> print('a\\n\\nb')\nold output\n>>> x + 1\n",
+        ])
+        self.assertEqual(''.join(''.join(lines) for lines, _ in blocks), RST)
+
+    def test_markdown_blocks(self):
+        blocks = list(markdown_blocks(io.StringIO(MARKDOWN)))
+        code = [''.join(lines) for lines, is_code in blocks if is_code]
+        self.assertEqual(code, [
+            u'a = 1\na\n',
+            u'>>> a + 1\n7\n>>> def g():\n...     return a\n',
+        ])
+
+    def test_document_format(self):
+        self.assertEqual(document_format('README.md'), 'markdown')
+        self.assertEqual(document_format('docs/usage.rst'), 'rst')
+
+
+class TestReplifyDocument(unittest.TestCase):
+    def test_rst(self):
+        self.assertEqual(_replify(RST), RST_OUT)
+        self.assertEqual(_replify(RST_OUT), RST_OUT)
+
+    def test_markdown(self):
+        self.assertEqual(_replify(MARKDOWN, 'markdown'), MARKDOWN_OUT)
+        self.assertEqual(_replify(MARKDOWN_OUT, 'markdown'), MARKDOWN_OUT)
+
+    def test_inconsistent_indentation(self):
+        text = u'.. code-block:: python\n\n   if 1:\n  2\n'
+        with self.assertRaises(ValueError) as cm:
+            _replify(text)
+        self.assertIn('line 3', str(cm.exception))
+
+    def test_console_is_closed(self):
+        closed = []
+
+        class Console(code.InteractiveConsole):
+            def close(self):
+                closed.append(True)
+
+        for text in (RST, u'>>> if 1:\n  2\n'):
+            del closed[:]
+            try:
+                replify_document(io.StringIO(text), io.StringIO(), {},
+                                 console_type=Console)
+            except ValueError:
+                pass
+            self.assertEqual(closed, [True])
+
+
+class TestRewriteDocument(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'doc.md')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, text):
+        with io.open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _read(self):
+        with io.open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_rewrite(self):
+        self._write(MARKDOWN)
+        self.assertTrue(rewrite_document(self.path, {}))
+        self.assertEqual(self._read(), MARKDOWN_OUT)
+        self.assertFalse(rewrite_document(self.path, {}))
+        self.assertEqual(os.listdir(self.tmpdir), ['doc.md'])
+
+    def test_error_leaves_document(self):
+        text = u'```python\n  1\n2\n```\n'
+        self._write(text)
+        self.assertRaises(ValueError, rewrite_document, self.path, {})
+        self.assertEqual(self._read(), text)
+        self.assertEqual(os.listdir(self.tmpdir), ['doc.md'])
+
+
+if __name__ == '__main__':
+    unittest.main()
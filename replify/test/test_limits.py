@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_limits
+----------------------------------
+
+Tests for `replify.limits` module.
+"""
+
+import sys
+import signal
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify.replify import replify, replify_forked, execute
+from replify.results import TextRenderer, text
+from replify.limits import Limits, LimitExceeded, MB, resource
+
+LOOP = (
+    'a = 1\n'
+    'while True:\n'
+    '    try:\n'
+    '        pass\n'
+    '    except Exception:\n'
+    '        pass\n'
+    '\n'
+    'b = 2\n'
+)
+
+
+class TestLimits(unittest.TestCase):
+    def _helper(self, code, limits, context=None):
+        if context is None:
+            context = {}
+        outfile = StringIO()
+        replify(StringIO(code), outfile, context, limits=limits)
+        return outfile.getvalue()
+
+    def test_no_limit_exceeded(self):
+        self.assertEqual(
+            self._helper('1 + 1\n', Limits(timeout=10, cpu_time=10)),
+            '>>> 1 + 1\n2\n')
+        self.assertEqual(signal.getitimer(signal.ITIMER_REAL), (0.0, 0.0))
+
+    def test_timeout(self):
+        context = {}
+        result = self._helper(LOOP, Limits(timeout=0.05), context)
+        self.assertTrue(result.endswith(
+            '... \n'
+            'Traceback (most recent call last):\n'
+            '  ...\n'
+            'LimitExceeded: statement exceeded the time limit of 0.05s\n'
+            '>>> b = 2\n'
+        ))
+        self.assertEqual(context['b'], 2)
+
+    def test_cpu_time(self):
+        result = self._helper(LOOP, Limits(cpu_time=0.05))
+        self.assertIn(
+            'LimitExceeded: statement exceeded the CPU time limit of 0.05s\n',
+            result)
+
+    def test_other_exceptions_are_shown(self):
+        result = self._helper('1/0\n', Limits(timeout=10))
+        self.assertIn('ZeroDivisionError', result)
+        self.assertNotIn('LimitExceeded', result)
+
+    def test_abort(self):
+        context = {}
+        outfile = StringIO()
+        self.assertRaises(
+            LimitExceeded, replify, StringIO(LOOP), outfile, context,
+            limits=Limits(timeout=0.05, abort=True))
+        self.assertTrue(outfile.getvalue().endswith(
+            'LimitExceeded: statement exceeded the time limit of 0.05s\n'))
+        self.assertNotIn('b', context)
+
+    @unittest.skipIf(resource is None, 'requires the resource module')
+    def test_memory(self):
+        before = resource.getrlimit(resource.RLIMIT_AS)
+        outfile = StringIO()
+        replify_forked(StringIO('x = bytearray(2 ** 40)\nx\n'), outfile, {},
+                       limits=Limits(memory=512 * MB))
+        self.assertIn(
+            'LimitExceeded: statement exceeded the memory limit of 512MB\n'
+            '>>> x\n'
+            'Traceback', outfile.getvalue())
+        self._helper('x = 1\n', Limits(memory=2 ** 40))
+        self.assertEqual(resource.getrlimit(resource.RLIMIT_AS), before)
+
+
+class _Store(dict):
+    def put(self, key, data):
+        self[key] = data
+
+
+class _DependencyStore(_Store):
+    dependencies = True
+
+
+class TestCheckpoints(unittest.TestCase):
+    def _check(self, store):
+        limits = Limits(timeout=0.05)
+        replify(StringIO(LOOP), StringIO(), {}, checkpoints=store,
+                limits=limits)
+        changed = LOOP.replace('b = 2', 'b = 3')
+        expected = StringIO()
+        replify(StringIO(changed), expected, {}, limits=limits)
+        outfile = StringIO()
+        context = {}
+        replify(StringIO(changed), outfile, context, checkpoints=store,
+                limits=limits)
+        self.assertEqual(outfile.getvalue(), expected.getvalue())
+        self.assertEqual(context['b'], 3)
+
+    def test_exceeded_statements_are_run_again(self):
+        self._check(_Store())
+
+    def test_exceeded_statements_are_run_again_with_dependencies(self):
+        self._check(_DependencyStore())
+
+
+class TestOutputLimits(unittest.TestCase):
+    def test_output(self):
+        outfile = StringIO()
+        replify(StringIO('n = sys.stdout.write("a" * 10)\nprint("b")\n'),
+                outfile, {'sys': sys}, limits=Limits(output=5))
+        self.assertEqual(
+            outfile.getvalue(),
+            '>>> n = sys.stdout.write("a" * 10)\n'
+            'aaaaa\n'
+            '[output truncated: 5 characters omitted]\n'
+            '>>> print("b")\n'
+            'b\n')
+
+    def test_total_output(self):
+        outfile = StringIO()
+        code = 'for i in range(3):\n    print("abc")\n\n' * 2
+        replify(StringIO(code), outfile, {}, limits=Limits(total_output=10))
+        lines = outfile.getvalue().splitlines()
+        self.assertEqual(lines[3:7], [
+            'abc', 'abc', 'ab', '[output truncated: 2 characters omitted]'])
+        self.assertEqual(
+            lines[-1], '[output truncated: 12 characters omitted]')
+
+    def test_spill(self):
+        results = list(execute(
+            StringIO('print("x" * 100)\nprint(1)\n'), {},
+            limits=Limits(spill=50)))
+        self.assertTrue(results[0].output.spilled)
+        self.assertEqual(text(results[0].output), 'x' * 100 + '\n')
+        self.assertEqual(text(results[0].stdout), 'x' * 100 + '\n')
+        self.assertEqual(results[1].output, '1\n')
+        outfile = StringIO()
+        TextRenderer(outfile, buffer_size=16).write(results[0])
+        self.assertEqual(outfile.getvalue(),
+                         '>>> print("x" * 100)\n' + 'x' * 100 + '\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_notebook
+----------------------------------
+
+Tests for `replify.notebook` module.
+"""
+
+import sys
+import json
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from io import BytesIO
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify.replify import replify
+from replify.notebook import NotebookRenderer, read_cells, notebook_lines
+
+SNIPPET = (
+    'print(1)\n'
+    'a = 2\n'
+    'a\n'
+    '\n'
+    'def f():\n'
+    '    return a\n'
+    '\n'
+    'f()\n'
+)
+
+
+def _notebook(snippet):
+    outfile = StringIO()
+    notebook = StringIO()
+    replify(StringIO(snippet), outfile, {},
+            renderers=[NotebookRenderer(notebook)])
+    return outfile.getvalue(), json.loads(notebook.getvalue())
+
+
+class TestNotebookRenderer(unittest.TestCase):
+    def test_cells(self):
+        transcript, notebook = _notebook(SNIPPET)
+        self.assertEqual(transcript.count('>>>'), 6)
+        self.assertEqual(notebook['nbformat'], 4)
+        cells = notebook['cells']
+        self.assertEqual(
+            [cell['source'] for cell in cells],
+            [['print(1)\n', 'a = 2\n', 'a'],
+             ['def f():\n', '    return a\n', '\n', 'f()']])
+        self.assertEqual([cell['execution_count'] for cell in cells], [1, 2])
+        self.assertEqual(
+            cells[0]['outputs'],
+            [{'name': 'stdout', 'output_type': 'stream',
+              'text': ['1\n', '2\n']}])
+        self.assertTrue(cells[1]['metadata']['replify']['elapsed'] >= 0)
+
+    def test_stderr(self):
+        _, notebook = _notebook('print(1)\n1/0\n')
+        outputs = notebook['cells'][0]['outputs']
+        self.assertEqual([o['name'] for o in outputs], ['stdout', 'stderr'])
+        self.assertIn('ZeroDivisionError', ''.join(outputs[1]['text']))
+
+    def test_empty(self):
+        notebook = StringIO()
+        NotebookRenderer(notebook).finish()
+        self.assertEqual(json.loads(notebook.getvalue())['cells'], [])
+
+    def test_transcript_input_raises_ValueError(self):
+        self.assertRaises(ValueError, _notebook, '>>> 1\n1\n')
+
+
+class TestReadNotebook(unittest.TestCase):
+    def test_read_cells_in_small_chunks(self):
+        _, notebook = _notebook(SNIPPET)
+        data = json.dumps(notebook, indent=1).encode('utf-8')
+        for chunk_size in (1, 7, 100):
+            cells = list(read_cells(BytesIO(data), chunk_size))
+            self.assertEqual(cells, notebook['cells'])
+
+    def test_notebook_lines(self):
+        notebook = {
+            'metadata': {},
+            'cells': [
+                {'cell_type': 'markdown', 'source': ['# Title']},
+                {'cell_type': 'code', 'source': ['if 1:\n', '    2']},
+                {'cell_type': 'code', 'source': 'print(3)\n'},
+            ],
+        }
+        lines = list(notebook_lines(StringIO(json.dumps(notebook)), 5))
+        self.assertEqual(
+            lines, ['if 1:\n', '    2\n', '\n', 'print(3)\n', '\n'])
+
+    def test_round_trip(self):
+        transcript, notebook = _notebook(SNIPPET)
+        lines = notebook_lines(StringIO(json.dumps(notebook)))
+        transcript2, notebook2 = _notebook(''.join(lines))
+        self.assertEqual(
+            [cell['outputs'] for cell in notebook2['cells']],
+            [cell['outputs'] for cell in notebook['cells']])
+
+    def test_invalid(self):
+        self.assertRaises(
+            ValueError, list, read_cells(StringIO('[]')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_profiling
+----------------------------------
+
+Tests for `replify.profiling` module.
+"""
+
+import sys
+import json
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify.replify import replify, execute
+from replify.profiling import (
+    Profiler, ProfileCollector, report, write_report, tracemalloc)
+
+SNIPPET = (
+    'def f(n):\n'
+    '    return sum(range(n))\n'
+    '\n'
+    'f(10)\n'
+    'f(100000)\n'
+    'x = [0] * 100000\n'
+)
+
+
+def _entries(profiler=None):
+    collector = ProfileCollector('snippet.py')
+    replify(StringIO(SNIPPET), StringIO(), {}, renderers=[collector],
+            profiler=profiler)
+    return collector.entries
+
+
+class TestProfiling(unittest.TestCase):
+    def test_lineno(self):
+        results = list(execute(StringIO(SNIPPET), {}))
+        self.assertEqual([r.lineno for r in results], [1, 4, 5, 6])
+        self.assertEqual([e['lineno'] for e in _entries()], [1, 4, 5, 6])
+
+    def test_calls(self):
+        entries = _entries(Profiler(calls=True))
+        functions = [label for label, time in entries[2]['calls']]
+        self.assertTrue(any(label.endswith('(f)') for label in functions))
+
+    @unittest.skipIf(tracemalloc is None, 'requires tracemalloc')
+    def test_memory(self):
+        profiler = Profiler(memory=True)
+        entries = _entries(profiler)
+        profiler.finish()
+        self.assertFalse(tracemalloc.is_tracing())
+        biggest = report(entries, 1)['allocators'][0]
+        self.assertEqual(biggest['lineno'], 6)
+        self.assertTrue(biggest['memory'] >= 100000 * 8)
+
+    def test_report(self):
+        entries = [
+            {'path': 'a.py', 'lineno': 1, 'source': 'a\n', 'elapsed': 0.5},
+            {'path': 'b.py', 'lineno': 3, 'source': 'b\n', 'elapsed': 1.0,
+             'calls': [['g', 0.75]]},
+            {'path': 'a.py', 'lineno': 2, 'source': 'c\n', 'elapsed': 0.25,
+             'calls': [['g', 0.25]]},
+        ]
+        data = report(entries, 2)
+        self.assertEqual(data['total'], 1.75)
+        self.assertEqual(
+            [(e['path'], e['lineno']) for e in data['statements']],
+            [('b.py', 3), ('a.py', 1)])
+        self.assertEqual(data['functions'], [{'function': 'g', 'time': 1.0}])
+
+        stream = StringIO()
+        write_report(entries, stream, 2)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], '3 statements, 1.750s')
+        self.assertEqual(lines[3], '  1.000000s  b.py:3  b')
+
+        stream = StringIO()
+        write_report(entries, stream, 2, 'json')
+        self.assertEqual(json.loads(stream.getvalue()), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@ Tests for `replify` module.
 """
 
 import sys
+import json
 
 try:
     import unittest2 as unittest
@@ -264,6 +265,242 @@ class TestReplify(unittest.TestCase):
         )
         self.assertEqual(self._helper(result), input)
 
+    def test_syntaxerror_after_compound_statement(self):
+        input = 'def a():\n    return 1\na()\n\n'
+        result = self._helper(input)
+        self.assertTrue(result.startswith(
+            '>>> def a():\n'
+            '...     return 1\n'
+            '... a()\n'
+            '  File "<stdin>", line 3\n'
+        ))
+        self.assertTrue(result.endswith('>>> \n'))
+        self.assertEqual(self._helper(result), input)
+
+    def test_long_statement(self):
+        input = 'a = [\n' + '    1,\n' * 5000 + ']\nlen(a)\n'
+        result = self._helper(input)
+        self.assertTrue(result.endswith('... ]\n>>> len(a)\n5000\n'))
+        self.assertEqual(self._helper(result), input)
+
+    def test_custom_push(self):
+        class Console(replify.code.InteractiveConsole):
+            def push(self, line):
+                self.write('push\n')
+                return replify.code.InteractiveConsole.push(self, line)
+
+        self.assertEqual(
+            self._helper('(\n1)\n', console_type=Console),
+            '>>> (\n'
+            '... 1)\n'
+            'push\n'
+            'push\n'
+            '1\n'
+        )
+
+    def test_multi_line_output_with_indent(self):
+        input = '    print("a\\nb")\n'
+        result = self._helper(input)
+        self.assertEqual(
+            result,
+            '    >>> print("a\\nb")\n'
+            '    a\n'
+            '    b\n'
+        )
+        self.assertEqual(self._helper(result), input)
+
+
+class TestBufferedIndentifier(unittest.TestCase):
+    def test_indents_every_line(self):
+        outfile = StringIO()
+        writer = replify.BufferedIndentifier(outfile, '  ')
+        for data in ['a', '', 'b\nc', '\n', '\nd\n', 'e']:
+            writer.write(data)
+            writer.drain()
+        self.assertEqual(outfile.getvalue(), '  ab\n  c\n  \n  d\n  e')
+
+    def test_buffers_until_buffer_size(self):
+        outfile = StringIO()
+        writer = replify.BufferedIndentifier(outfile, '', buffer_size=4)
+        writer.write('abc')
+        self.assertEqual(outfile.getvalue(), '')
+        writer.write('d')
+        self.assertEqual(outfile.getvalue(), 'abcd')
+        writer.write('e')
+        writer.flush()
+        self.assertEqual(outfile.getvalue(), 'abcde')
+
+
+class TestCheckpoints(unittest.TestCase):
+    def _helper(self, code, checkpoints, context=None):
+        if context is None:
+            context = {}
+        outfile = StringIO()
+        replify.replify(StringIO(code), outfile, context, None, checkpoints)
+        return outfile.getvalue()
+
+    def test_records_each_statement(self):
+        checkpoints = DictCheckpoints()
+        result = self._helper('a = 1\ndef f():\n    return a\n\nf()\n',
+                              checkpoints)
+        results = [json.loads(value) for value in checkpoints.values()]
+        self.assertEqual(
+            sorted((r['source'], r['output']) for r in results),
+            [(['a = 1\n'], ''),
+             (['def f():\n', '    return a\n', '\n'], ''),
+             (['f()\n'], '1\n')])
+        self.assertEqual(
+            self._helper('a = 1\ndef f():\n    return a\n\nf()\n',
+                         DictCheckpoints(checkpoints)),
+            result)
+
+    def test_reuses_unchanged_prefix(self):
+        checkpoints = DictCheckpoints()
+        self._helper('a = 1\nprint(a)\na += 1\na\n', checkpoints)
+        for key, value in checkpoints.items():
+            result = json.loads(value)
+            if result['source'] == ['print(a)\n']:
+                result['output'] = 'cached\n'
+                checkpoints[key] = json.dumps(result)
+        context = {}
+        streams = sys.stdout, sys.stderr
+        result = self._helper(
+            '    a = 1\n    print(a)\n    a += 1\n    a * 10\n',
+            checkpoints, context)
+        self.assertEqual((sys.stdout, sys.stderr), streams)
+        self.assertEqual(
+            result,
+            '    >>> a = 1\n'
+            '    >>> print(a)\n'
+            '    cached\n'
+            '    >>> a += 1\n'
+            '    >>> a * 10\n'
+            '    20\n'
+        )
+        self.assertEqual(context['a'], 2)
+
+    def test_incomplete_statement_at_end(self):
+        checkpoints = DictCheckpoints()
+        self.assertEqual(
+            self._helper('1\nif 1:\n    2\n', checkpoints),
+            '>>> 1\n1\n>>> if 1:\n...     2\n')
+        self.assertEqual(
+            self._helper('1\nif 1:\n    2\n', checkpoints),
+            '>>> 1\n1\n>>> if 1:\n...     2\n')
+
+
+class DictCheckpoints(dict):
+    def put(self, prefix, transcript):
+        self[prefix] = transcript
+
+
+@unittest.skipIf(replify.TOP_LEVEL_AWAIT is None, 'needs python 3.8+')
+class TestAsyncConsole(unittest.TestCase):
+    def _helper(self, code, console_type=None):
+        outfile = StringIO()
+        replify.replify(StringIO(code), outfile, {},
+                        console_type or replify.AsyncConsole)
+        return outfile.getvalue()
+
+    def test_top_level_await(self):
+        result = self._helper(
+            'import asyncio\n'
+            'await asyncio.sleep(0, 1)\n'
+            'async with asyncio.Lock():\n'
+            '    print(2)\n'
+            '\n')
+        self.assertEqual(
+            result,
+            '>>> import asyncio\n'
+            '>>> await asyncio.sleep(0, 1)\n'
+            '1\n'
+            '>>> async with asyncio.Lock():\n'
+            '...     print(2)\n'
+            '... \n'
+            '2\n')
+
+    def test_loop_persists(self):
+        result = self._helper(
+            'import asyncio\n'
+            'loop = asyncio.get_event_loop()\n'
+            'queue = asyncio.Queue()\n'
+            'task = asyncio.ensure_future(queue.put(1))\n'
+            'await queue.get()\n'
+            'await asyncio.sleep(0, asyncio.get_running_loop() is loop)\n')
+        self.assertTrue(result.endswith(
+            '>>> await queue.get()\n'
+            '1\n'
+            '>>> await asyncio.sleep(0, asyncio.get_running_loop() is loop)\n'
+            'True\n'))
+
+    def test_asyncio_run(self):
+        result = self._helper(
+            'import asyncio\n'
+            'asyncio.run(asyncio.sleep(0, 1))\n'
+            'await asyncio.sleep(0, 2)\n')
+        self.assertTrue(result.endswith(
+            '1\n>>> await asyncio.sleep(0, 2)\n2\n'))
+
+    def test_traceback(self):
+        result = self._helper(
+            'async def f():\n'
+            '    raise ValueError(1)\n'
+            '\n'
+            'await f()\n')
+        self.assertTrue(result.endswith(
+            '>>> await f()\n'
+            'Traceback (most recent call last):\n'
+            '  File "<stdin>", line 1, in <module>\n'
+            '  File "<stdin>", line 2, in f\n'
+            'ValueError: 1\n'))
+        result = self._helper(
+            'async def f():\n'
+            '    raise ValueError(1)\n'
+            '\n'
+            'await f()\n', replify.console_class(True, True))
+        self.assertTrue(result.endswith(
+            'Traceback (most recent call last):\n'
+            '  ...\n'
+            'ValueError: 1\n'))
+
+    def test_close(self):
+        session = replify.Session({}, replify.AsyncConsole)
+        for _ in replify.execute(
+                ['import asyncio\n',
+                 'task = asyncio.ensure_future(asyncio.sleep(10))\n',
+                 'await asyncio.sleep(0)\n'],
+                None, session=session):
+            pass
+        session.close()
+        self.assertTrue(session.console.locals['task'].cancelled())
+        self.assertTrue(session.console.loop.is_closed())
+
+
+class TestReplifyForked(unittest.TestCase):
+    def _helper(self, code, context=None, console_type=None):
+        if context is None:
+            context = {}
+        infile = StringIO(code)
+        outfile = StringIO()
+        replify.replify_forked(infile, outfile, context, console_type)
+        return outfile.getvalue()
+
+    def test_transcript(self):
+        result = self._helper('a\nb = 2\nb\n', {'a': 1})
+        self.assertEqual(result, '>>> a\n1\n>>> b = 2\n>>> b\n2\n')
+
+    def test_context_is_not_modified(self):
+        context = {'a': 1}
+        self._helper('a = 2\nb = 3\n', context)
+        self.assertEqual(context, {'a': 1})
+
+    def test_error_is_reraised(self):
+        self.assertRaises(ValueError, self._helper, '    1\n2')
+
+    def test_abnormal_exit_raises_RuntimeError(self):
+        self.assertRaises(
+            RuntimeError, self._helper, 'import os\nos._exit(3)\n')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_results
+----------------------------------
+
+Tests for `replify.results` module.
+"""
+
+import sys
+import json
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify.replify import replify, execute
+from replify.results import StatementResult, TextRenderer, JSONLinesRenderer
+
+
+class TestExecute(unittest.TestCase):
+    def _results(self, code, context=None):
+        if context is None:
+            context = {}
+        return list(execute(StringIO(code), context))
+
+    def test_fields(self):
+        stdout = sys.stdout
+        (result,) = self._results(
+            'import sys; print(1); sys.stderr.write("2\\n"); [3]\n')
+        self.assertEqual(
+            result.source,
+            ['import sys; print(1); sys.stderr.write("2\\n"); [3]\n'])
+        self.assertEqual(result.stdout, '1\n[3]\n')
+        self.assertEqual(result.stderr, '2\n')
+        self.assertEqual(result.output, '1\n2\n[3]\n')
+        self.assertEqual(result.value, [3])
+        self.assertIsNone(result.exception)
+        self.assertTrue(result.elapsed >= 0)
+        self.assertIs(sys.stdout, stdout)
+
+    def test_exception(self):
+        result, = self._results('raise ValueError("x")\n')
+        self.assertEqual(result.exception, ('ValueError', 'x'))
+        self.assertIn('ValueError: x', result.stderr)
+        self.assertIsNone(result.value)
+
+    def test_syntax_error(self):
+        result, = self._results('1 +* 2\n')
+        self.assertEqual(result.exception[0], 'SyntaxError')
+
+    def test_statements(self):
+        results = self._results('a = 1\nif a:\n    a\n\n\n(\n')
+        self.assertEqual([r.source for r in results], [
+            ['a = 1\n'], ['if a:\n', '    a\n', '\n'], ['\n'], ['(\n']])
+        self.assertEqual(results[1].output, '1\n')
+        self.assertEqual(results[3].output, '')
+
+    def test_echo(self):
+        outfile = StringIO()
+        renderer = TextRenderer(outfile)
+        results = list(execute(StringIO('print(1)\n\n1/0\n'), {},
+                               echo=renderer))
+        self.assertEqual([r.output for r in results], ['', '', ''])
+        self.assertEqual(results[2].exception[0], 'ZeroDivisionError')
+        expected = StringIO()
+        replify(StringIO('print(1)\n\n1/0\n'), expected, {},
+                renderers=[TextRenderer(StringIO())])
+        self.assertEqual(outfile.getvalue(), expected.getvalue())
+
+    def test_echo_with_checkpoints_raises_ValueError(self):
+        echo = TextRenderer(StringIO())
+        self.assertRaises(ValueError, list, execute(
+            StringIO('1\n'), {}, checkpoints={}, echo=echo))
+
+    def test_slots(self):
+        result = StatementResult(['a\n'])
+        self.assertRaises(AttributeError, setattr, result, 'other', 1)
+
+    def test_dict_round_trip(self):
+        (result,) = self._results('1/0\n')
+        copy = StatementResult.from_dict(
+            json.loads(json.dumps(result.to_dict())))
+        for name in StatementResult.__slots__:
+            self.assertEqual(getattr(copy, name), getattr(result, name))
+
+
+class TestRenderers(unittest.TestCase):
+    def test_text(self):
+        outfile = StringIO()
+        renderer = TextRenderer(outfile, '  ')
+        renderer.write(StatementResult(['if 1:\n', '    2\n', '\n'], '2\n'))
+        renderer.write(StatementResult(['3\n'], '3\n'))
+        self.assertEqual(
+            outfile.getvalue(),
+            '  >>> if 1:\n  ...     2\n  ... \n  2\n  >>> 3\n  3\n')
+
+    def test_text_is_written_as_statements_run(self):
+        outfile = StringIO()
+        replify(StringIO('print("x"); "x" in out.getvalue()\n'), outfile,
+                {'out': outfile}, buffer_size=1)
+        self.assertEqual(
+            outfile.getvalue(),
+            '>>> print("x"); "x" in out.getvalue()\nx\nTrue\n')
+
+    def test_json_lines(self):
+        outfile = StringIO()
+        replify(StringIO('    x = 1\n    x\n'), outfile, {},
+                renderer_type=JSONLinesRenderer)
+        results = [
+            json.loads(line) for line in outfile.getvalue().splitlines()]
+        self.assertEqual(
+            [(r['source'], r['output'], r['value']) for r in results],
+            [(['x = 1\n'], '', None), (['x\n'], '1\n', '1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
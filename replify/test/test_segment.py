@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_segment
+----------------------------------
+
+Tests for `replify.segment` module.
+"""
+
+import sys
+import code
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify.segment import LineScanner, Segmenter, uses_default_push
+from replify.replify import replify, DoctestTracebackConsole
+
+
+class TestLineScanner(unittest.TestCase):
+    def _scan(self, *lines):
+        scanner = LineScanner()
+        for line in lines:
+            scanner.feed(line)
+        return scanner
+
+    def test_brackets(self):
+        self.assertTrue(self._scan('x = (1,').open)
+        self.assertFalse(self._scan('x = (1,', '[2]{3: 4})').open)
+
+    def test_strings_and_comments(self):
+        self.assertFalse(self._scan('x = "("  # (').open)
+        self.assertFalse(self._scan("x = '\\'('").open)
+        self.assertTrue(self._scan("x = '''(").open)
+        self.assertFalse(self._scan("x = '''(", "'''").open)
+
+    def test_continuation(self):
+        self.assertTrue(self._scan('x = 1 + \\').open)
+        self.assertFalse(self._scan('x = "\\\\"').open)
+
+    def test_uncertain(self):
+        self.assertTrue(self._scan(')').uncertain)
+        self.assertTrue(self._scan('x = f"{x}"').uncertain)
+        self.assertTrue(self._scan('x = "abc').uncertain)
+        self.assertFalse(self._scan('x = rb"abc"').uncertain)
+
+
+class TestSegmenter(unittest.TestCase):
+    def _segments(self, source):
+        segmenter = Segmenter(code.InteractiveConsole({}))
+        segments = []
+        for line in source.splitlines(True):
+            segment = segmenter.feed(line)
+            if segment is not None:
+                segments.append((segment[0], segment[1] is not None))
+        return segments, segmenter.flush()
+
+    def test_simple_statements(self):
+        self.assertEqual(
+            self._segments('a = 1\nb = (\n  2)\n'),
+            ([(['a = 1\n'], True), (['b = (\n', '  2)\n'], True)], []))
+
+    def test_compound_statement_ends_at_empty_line(self):
+        self.assertEqual(
+            self._segments('def f():\n    a\n    \n    b\n\nf()\n'),
+            ([(['def f():\n', '    a\n', '    \n', '    b\n', '\n'], True),
+              (['f()\n'], True)], []))
+
+    def test_blank_line_and_comment_are_pushed(self):
+        self.assertEqual(
+            self._segments('\n# a\n'),
+            ([(['\n'], False), (['# a\n'], False)], []))
+
+    def test_syntax_error_is_pushed(self):
+        self.assertEqual(
+            self._segments('def f():\n    a\nf()\n\n'),
+            ([(['def f():\n', '    a\n', 'f()\n', '\n'], False)], []))
+
+    def test_unfinished_statement(self):
+        self.assertEqual(
+            self._segments('if 1:\n    a\n'),
+            ([], ['if 1:\n', '    a\n']))
+
+    def test_statements_are_compiled_once(self):
+        console = code.InteractiveConsole({})
+        compiler = console.compile.compiler
+        calls = []
+
+        def compile(source, filename, symbol):
+            calls.append(source)
+            return compiler(source, filename, symbol)
+
+        console.compile.compiler = compile
+        segmenter = Segmenter(console)
+        namespace = {}
+        for line in ('from __future__ import division\n', 'x = 1 / 2\n'):
+            exec(segmenter.feed(line)[1], namespace)
+        self.assertEqual(len(calls), 2)
+        # __future__ imports still apply to the statements after them
+        self.assertEqual(namespace['x'], 0.5)
+
+    def test_uses_default_push(self):
+        class Console(code.InteractiveConsole):
+            def push(self, line):
+                return code.InteractiveConsole.push(self, line)
+
+        self.assertTrue(uses_default_push(code.InteractiveConsole()))
+        self.assertTrue(uses_default_push(DoctestTracebackConsole()))
+        self.assertFalse(uses_default_push(Console()))
+
+    def test_old_style_console(self):
+        # code.InteractiveConsole is an old-style class on python 2, whose
+        # instances all have the type ``instance``
+        class Console(code.InteractiveConsole):
+            pass
+
+        self.assertTrue(uses_default_push(Console()))
+        outfile = StringIO()
+        replify(StringIO('x = 1\nx\n'), outfile, {}, Console)
+        self.assertEqual(outfile.getvalue(), '>>> x = 1\n>>> x\n1\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
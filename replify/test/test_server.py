@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_server
+----------------------------------
+
+Tests for `replify.server` module.
+"""
+
+import os
+import sys
+import shutil
+import socket
+import tempfile
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify import server
+from replify.replify import TOP_LEVEL_AWAIT
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'replify.sock')
+        self.server = server.ReplifyServer(self.path)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def _request(self, snippet, **kw):
+        outfile = StringIO()
+        server.request(self.path, snippet, outfile, **kw)
+        return outfile.getvalue()
+
+    def _write_context(self, text, mtime):
+        path = os.path.join(self.tmpdir, 'ctx.py')
+        with open(path, 'w') as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_request(self):
+        self.assertEqual(self._request('1\n'), '>>> 1\n1\n')
+
+    def test_doctest_tb(self):
+        result = self._request('a\n', doctest_tb=True)
+        self.assertEqual(
+            result,
+            '>>> a\n'
+            'Traceback (most recent call last):\n'
+            '  ...\n'
+            "NameError: name 'a' is not defined\n"
+        )
+
+    @unittest.skipIf(TOP_LEVEL_AWAIT is None, 'needs python 3.8+')
+    def test_top_level_await(self):
+        result = self._request(
+            'import asyncio\nawait asyncio.sleep(0, 1)\n',
+            top_level_await=True)
+        self.assertEqual(
+            result,
+            '>>> import asyncio\n'
+            '>>> await asyncio.sleep(0, 1)\n'
+            '1\n'
+        )
+
+    def test_error(self):
+        self.assertRaises(RuntimeError, self._request, '    1\n2\n')
+
+    def test_context_is_cached_and_reloaded(self):
+        path = self._write_context('a = 1\n', 1000000000)
+        self.assertEqual(
+            self._request('a\n', context_file=path), '>>> a\n1\n')
+        context = self.server.contexts[(path, None)]
+        self.assertEqual(
+            self._request('a = 2\n', context_file=path), '>>> a = 2\n')
+        self.assertIs(self.server.contexts[(path, None)], context)
+        self.assertEqual(
+            self._request('a\n', context_file=path), '>>> a\n1\n')
+        self._write_context('a = 3\n', 1000000010)
+        self.assertEqual(
+            self._request('a\n', context_file=path), '>>> a\n3\n')
+
+
+
+class TestSocketPath(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'replify.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_stale_socket_is_replaced(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        sock.close()
+        server.ReplifyServer(self.path).server_close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_other_files_are_kept(self):
+        with open(self.path, 'w') as f:
+            f.write('data\n')
+        self.assertRaises(EnvironmentError, server.ReplifyServer, self.path)
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'data\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
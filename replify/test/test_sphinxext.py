@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_sphinxext
+----------------------------------
+
+Tests for `replify.sphinxext` module.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+try:
+    from docutils import nodes
+    from sphinx.application import Sphinx
+except ImportError:
+    Sphinx = None
+
+CONF = '''\
+extensions = ['replify.sphinxext']
+replify_context_file = 'context.py'
+'''
+
+CONTEXT = '''\
+def log(name):
+    with open({0!r}, 'a') as f:
+        f.write(name + '\\n')
+'''
+
+DOCUMENT = '''\
+:orphan:
+
+{0}
+=====
+
+.. replify::
+
+   log({0!r})
+   x = 21
+
+{1}
+
+.. replify::
+
+   x * 2
+'''
+
+
+@unittest.skipIf(Sphinx is None, 'sphinx is not installed')
+class TestSphinxExtension(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.srcdir = os.path.join(self.tmpdir, 'src')
+        os.mkdir(self.srcdir)
+        self.log = os.path.join(self.tmpdir, 'log')
+        self._write('conf.py', CONF)
+        self._write('context.py', CONTEXT.format(self.log))
+        self.docnames = ['index'] + ['doc{0}'.format(i) for i in range(6)]
+        for docname in self.docnames:
+            self._write_doc(docname, 'Text.')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.srcdir, name), 'w') as f:
+            f.write(text)
+
+    def _write_doc(self, docname, text):
+        self._write(docname + '.rst', DOCUMENT.format(docname, text))
+
+    def _build(self, parallel=0):
+        warnings = StringIO()
+        app = Sphinx(self.srcdir, self.srcdir,
+                     os.path.join(self.tmpdir, 'out'),
+                     os.path.join(self.tmpdir, 'doctrees'), 'xml',
+                     status=None, warning=warnings, parallel=parallel)
+        app.build()
+        self.assertNotIn('ERROR', warnings.getvalue())
+        return app
+
+    def _logged(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            names = f.read().split()
+        os.remove(self.log)
+        return sorted(names)
+
+    def _transcripts(self, app, docname):
+        doctree = app.env.get_doctree(docname)
+        return [node.astext() for node in doctree.findall(nodes.literal_block)]
+
+    def test_build(self):
+        app = self._build()
+        self.assertEqual(self._logged(), sorted(self.docnames))
+        self.assertEqual(self._transcripts(app, 'doc0'), [
+            ">>> log('doc0')\n>>> x = 21",
+            '>>> x * 2\n42',
+        ])
+
+        # nothing changed, so nothing is read again
+        self._build()
+        self.assertEqual(self._logged(), [])
+
+        # the blocks did not change, so they are not executed
+        self._write_doc('doc1', 'Other text.')
+        app = self._build()
+        self.assertEqual(self._logged(), [])
+        self.assertEqual(self._transcripts(app, 'doc1')[1], '>>> x * 2\n42')
+
+        # the first block is run again, silently, before a changed block
+        self._write('doc2.rst', DOCUMENT.format('doc2', 'Text.') +
+                    '\n.. replify::\n\n   x + 1\n')
+        app = self._build()
+        self.assertEqual(self._logged(), ['doc2'])
+        self.assertEqual(self._transcripts(app, 'doc2')[2], '>>> x + 1\n22')
+
+        # all documents are read again when the context changes
+        self._write('context.py', CONTEXT.format(self.log) + 'y = 1\n')
+        self._build()
+        self.assertEqual(self._logged(), sorted(self.docnames))
+
+    def test_parallel(self):
+        self._build(parallel=2)
+        self.assertEqual(self._logged(), sorted(self.docnames))
+        self._write_doc('doc3', 'Other text.')
+        app = self._build(parallel=2)
+        self.assertEqual(self._logged(), [])
+        self.assertEqual(sorted(app.env.replify_transcripts),
+                         sorted(self.docnames))
+
+    def test_error(self):
+        self._write('index.rst', 'Index\n=====\n\n.. replify::\n\n'
+                    '   1\n  2\n')
+        warnings = StringIO()
+        Sphinx(self.srcdir, self.srcdir, os.path.join(self.tmpdir, 'out'),
+               os.path.join(self.tmpdir, 'doctrees'), 'xml', status=None,
+               warning=warnings).build()
+        self.assertIn('replify: line', warnings.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_trace
+----------------------------------
+
+Tests for `replify.trace` module.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from cStringIO import StringIO
+
+from replify import trace
+from replify.batch import replify_batch
+from replify.replify import replify, Context
+
+
+class TraceMixin(object):
+    def setUp(self):
+        self.tracer = trace.install(trace.Tracer())
+
+    def tearDown(self):
+        trace.uninstall()
+
+    def names(self, events=None):
+        if events is None:
+            events = self.tracer.events
+        return [event['name'] for event in events if event['ph'] == 'X']
+
+
+class TestTracer(TraceMixin, unittest.TestCase):
+    def test_span(self):
+        with trace.span('work', 'test', {'n': 1}):
+            pass
+        event, = self.tracer.events
+        self.assertEqual(event['name'], 'work')
+        self.assertEqual(event['cat'], 'test')
+        self.assertEqual(event['args'], {'n': 1})
+        self.assertEqual(event['pid'], os.getpid())
+        self.assertGreaterEqual(event['dur'], 0)
+
+    def test_uninstalled_span_does_nothing(self):
+        trace.uninstall()
+        with trace.span('work', 'test'):
+            pass
+        self.assertEqual(self.tracer.events, [])
+
+    def test_write(self):
+        with trace.span('work', 'test'):
+            pass
+        outfile = StringIO()
+        self.tracer.write(outfile)
+        events = json.loads(outfile.getvalue())['traceEvents']
+        metadata = dict((event['name'], event['args']['name'])
+                        for event in events if event['ph'] == 'M')
+        self.assertTrue(metadata['process_name'].startswith('replify'))
+        self.assertIn('thread_name', metadata)
+        self.assertEqual(self.names(events), ['work'])
+
+    def test_drain_and_add(self):
+        other = trace.Tracer('replify worker')
+        other.record('work', 'test', 1.0, 2.0)
+        events = other.drain()
+        self.assertEqual(other.events, [])
+        self.tracer.add(events)
+        self.assertEqual(self.names(), ['work'])
+        self.assertEqual(self.tracer.events[0]['dur'], 1000000)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_not_active_in_forked_child(self):
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if trace.active() is None else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+
+
+class TestInstrumentation(TraceMixin, unittest.TestCase):
+    def test_snippet(self):
+        replify(StringIO('x = 1\n1/0\n'), StringIO(), {})
+        names = self.names()
+        self.assertEqual(names.count('run'), 2)
+        self.assertIn('showtraceback', names)
+        self.assertIn('write output', names)
+
+    def test_batch_workers(self):
+        try:
+            import concurrent.futures
+        except ImportError:
+            self.skipTest('requires concurrent.futures')
+        tmpdir = tempfile.mkdtemp()
+        try:
+            indir = os.path.join(tmpdir, 'in')
+            os.mkdir(indir)
+            for name in ('a.py', 'b.py'):
+                with open(os.path.join(indir, name), 'w') as f:
+                    f.write('x = 1\n')
+            results = replify_batch(
+                [indir], os.path.join(tmpdir, 'out'), Context(), jobs=2)
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertTrue(all(result.ok for result in results))
+        events = [event for event in self.tracer.events
+                  if event['name'] == 'replify file']
+        self.assertEqual(len(events), 2)
+        self.assertNotIn(os.getpid(), [event['pid'] for event in events])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_watch
+----------------------------------
+
+Tests for `replify.watch` module.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from replify.replify import Context
+from replify.watch import watch, PollingWatcher, InotifyWatcher
+
+
+class WatchMixin(object):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.indir = os.path.join(self.tmpdir, 'in')
+        os.mkdir(self.indir)
+        self.rendered = []
+        self.values = []
+        self.stop = threading.Event()
+        self.thread = None
+
+    def tearDown(self):
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join()
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, path, text):
+        path = os.path.join(self.tmpdir, path)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def _render(self, inputs):
+        self.rendered.append(sorted(os.path.basename(path)
+                                    for path, _ in inputs))
+        if self.context is not None:
+            self.values.append(self.context.namespace().get('X'))
+
+    def _start(self, context=None):
+        self.context = context
+        self.thread = threading.Thread(target=watch, args=(
+            [self.indir], self._render, context, 0.1, 0.05,
+            self.watcher(), self.stop))
+        self.thread.start()
+        self._settle()
+
+    def _settle(self):
+        # let the watcher see the changes and render them
+        time.sleep(0.5)
+
+    def test_changed_inputs(self):
+        self._write('in/a.py', '1\n')
+        self._write('in/b.py', '2\n')
+        self._write('in/.a.py.swp', '')
+        self._start()
+        self._write('in/a.py', '3\n')
+        self._write('in/a.py', '4\n')
+        self._write('in/c.py', '5\n')
+        self._settle()
+        os.utime(os.path.join(self.indir, 'b.py'), None)
+        self._settle()
+        self.assertEqual(self.rendered, [['a.py', 'b.py'], ['a.py', 'c.py']])
+
+    def test_context(self):
+        self._write('in/a.py', 'X\n')
+        path = self._write('ctx.py', 'X = 1\n')
+        self._start(Context(path))
+        self._write('ctx.py', 'X = 2 +\n')
+        self._settle()
+        self._write('ctx.py', 'X = 3\n')
+        self._settle()
+        self.assertEqual(self.rendered, [['a.py'], ['a.py']])
+        self.assertEqual(self.values, [1, 3])
+
+
+class TestPolling(WatchMixin, unittest.TestCase):
+    watcher = PollingWatcher
+
+
+class TestInotify(WatchMixin, unittest.TestCase):
+    def watcher(self):
+        try:
+            return InotifyWatcher()
+        except OSError:
+            raise unittest.SkipTest('inotify is not available')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Timelines of replify runs, in the Chrome trace event format.
+
+Once a :class:`Tracer` is installed with :func:`install`, the spans around
+importing contexts, replifying files, pushing lines to the console, running
+statements, formatting tracebacks and writing output are recorded as
+complete events, on one track per process and thread. :meth:`Tracer.write`
+writes them as JSON that ``chrome://tracing`` and Perfetto can open.
+"""
+from __future__ import absolute_import
+
+import os
+import json
+import time
+import threading
+
+_lock = threading.Lock()
+_tracer = None
+
+
+class Tracer(object):
+    """Records trace events for the process that created it.
+
+    Timestamps are wall-clock microseconds, so events recorded by several
+    processes line up on one timeline once they are merged with
+    :meth:`add`. ``name`` labels the track of this process.
+    """
+
+    def __init__(self, name='replify'):
+        self.name = name
+        self.pid = os.getpid()
+        self.events = []
+        # metadata events naming each process and thread, by track
+        self._tracks = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, category, start, end, args=None):
+        """Record a span from ``start`` to ``end``, in seconds since epoch."""
+        thread = threading.current_thread()
+        pid = os.getpid()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': int(start * 1e6),
+            'dur': int((end - start) * 1e6),
+            'pid': pid,
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            if (pid, thread.ident) not in self._tracks:
+                self._track(pid, thread.ident, thread.name)
+            self.events.append(event)
+
+    def _track(self, pid, tid, thread_name):
+        if (pid, None) not in self._tracks:
+            name = self.name if pid == self.pid else 'replify'
+            self._tracks[pid, None] = _metadata(
+                'process_name', pid, 0, '{0} ({1})'.format(name, pid))
+        self._tracks[pid, tid] = _metadata(
+            'thread_name', pid, tid, thread_name)
+
+    def drain(self):
+        """Return and forget the events recorded so far, with metadata."""
+        with self._lock:
+            events = list(self._tracks.values()) + self.events
+            self.events = []
+            self._tracks = {}
+        return events
+
+    def add(self, events):
+        """Add events drained from another process's tracer."""
+        with self._lock:
+            for event in events:
+                if event['ph'] == 'M':
+                    tid = event['tid'] if event['name'] == 'thread_name' \
+                        else None
+                    self._tracks[event['pid'], tid] = event
+                else:
+                    self.events.append(event)
+
+    def write(self, stream):
+        """Write all the events as a JSON trace to ``stream``."""
+        with self._lock:
+            events = list(self._tracks.values()) + self.events
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, stream)
+        stream.write('\n')
+
+
+def _metadata(name, pid, tid, value):
+    return {'name': name, 'ph': 'M', 'pid': pid, 'tid': tid,
+            'args': {'name': value}}
+
+
+class _Span(object):
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, self.category, self.start, time.time(),
+                           self.args)
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_span = _NullSpan()
+
+
+def active():
+    """Return the installed tracer, or None.
+
+    A tracer installed before this process was forked from the one that
+    installed it does not count.
+    """
+    tracer = _tracer
+    if tracer is None or tracer.pid != os.getpid():
+        return None
+    return tracer
+
+
+def install(tracer=None):
+    """Install ``tracer``, or a new :class:`Tracer`, for this process.
+
+    Returns the installed tracer. If a tracer is already installed in this
+    process, it is kept and returned instead.
+    """
+    global _tracer
+    with _lock:
+        if active() is None:
+            _tracer = tracer if tracer is not None else Tracer()
+        return _tracer
+
+
+def uninstall():
+    """Stop tracing, returning the tracer that was installed, if any."""
+    global _tracer
+    with _lock:
+        tracer = active()
+        _tracer = None
+        return tracer
+
+
+def span(name, category, args=None):
+    """Return a context manager recording a span around its block.
+
+    Does nothing unless a tracer is installed.
+    """
+    tracer = active()
+    if tracer is None:
+        return _null_span
+    return _Span(tracer, name, category, args)
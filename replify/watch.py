@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import hashlib
+from timeit import default_timer as timer
+
+from replify.batch import expand_inputs, glob_root
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+         IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_event = struct.Struct('iIII')
+
+
+def _libc():
+    if ctypes is None or not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, 'inotify_init1'):
+        return None
+    return libc
+
+
+class PollingWatcher(object):
+    """Waits for changes by polling: every wait may have seen a change."""
+
+    def watch(self, directories):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return True
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Waits for changes to the files in some directories with inotify.
+
+    Raises OSError if inotify is not available.
+    """
+
+    def __init__(self):
+        self._libc = _libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._watches = {}
+
+    def watch(self, directories):
+        """Watch ``directories`` too, unless they are already watched."""
+        encoding = sys.getfilesystemencoding()
+        for directory in directories:
+            if directory in self._watches:
+                continue
+            path = directory
+            if not isinstance(path, bytes):
+                path = path.encode(encoding)
+            wd = self._libc.inotify_add_watch(self.fd, path, _MASK)
+            # a directory removed since it was listed is not watched
+            if wd >= 0:
+                self._watches[directory] = wd
+
+    def wait(self, timeout):
+        """Wait up to ``timeout`` seconds, returning True on any event."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        self._read()
+        return True
+
+    def _read(self):
+        ignored = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError as err:
+                if err.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _event.unpack_from(data, offset)
+                offset += _event.size + length
+                if mask & IN_IGNORED:
+                    ignored.add(wd)
+        if ignored:
+            # the directory is gone; watch it again if it comes back
+            for directory, wd in list(self._watches.items()):
+                if wd in ignored:
+                    del self._watches[directory]
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def default_watcher():
+    """Return an :class:`InotifyWatcher`, or a :class:`PollingWatcher`."""
+    try:
+        return InotifyWatcher()
+    except OSError:
+        return PollingWatcher()
+
+
+def _directories(patterns, paths):
+    directories = set()
+    for pattern in patterns:
+        if not os.path.isdir(pattern):
+            if os.path.isfile(pattern):
+                pattern = os.path.dirname(pattern) or os.curdir
+            else:
+                pattern = glob_root(pattern)
+        for dirpath, dirnames, _ in os.walk(pattern):
+            directories.add(dirpath)
+    for path in paths:
+        directories.add(os.path.dirname(path) or os.curdir)
+    return directories
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size, st.st_ino
+
+
+def _digest(path):
+    h = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                h.update(block)
+    except (IOError, OSError):
+        return None
+    return h.hexdigest()
+
+
+def _is_temporary(path):
+    # editors save through hidden swap files and leave backups ending in ~
+    name = os.path.basename(path)
+    return name.startswith(('.', '#')) or name.endswith('~')
+
+
+class _Files(object):
+    """Stat signatures and content digests of the watched files."""
+
+    def __init__(self):
+        self.signatures = {}
+        self.digests = {}
+
+    def touched(self, paths):
+        """Record and return the paths whose signature has changed."""
+        touched = set()
+        for path in paths:
+            signature = _signature(path)
+            if signature != self.signatures.get(path):
+                self.signatures[path] = signature
+                touched.add(path)
+        return touched
+
+    def changed(self, path):
+        """Record the digest of ``path``, returning whether it changed."""
+        digest = _digest(path)
+        if digest == self.digests.get(path):
+            return False
+        self.digests[path] = digest
+        return True
+
+    def forget(self, paths):
+        for path in list(self.signatures):
+            if path not in paths:
+                del self.signatures[path]
+                self.digests.pop(path, None)
+
+    def record(self, paths):
+        self.touched(paths)
+        for path in paths:
+            self.changed(path)
+
+
+def watch(patterns, render, context=None, debounce=0.2, interval=1.0,
+          watcher=None, stop=None, stream=None):
+    """Render the inputs matching ``patterns``, and again when they change.
+
+    ``patterns`` are expanded like those of
+    :func:`replify.batch.replify_batch`, leaving out the hidden, swap and
+    backup files of editors. ``render`` is called with a list of
+    ``(path, relpath)`` pairs to render: all the inputs at first, and after
+    that the inputs that were added or whose content changed. Files are
+    only compared once they have been left alone for ``debounce`` seconds,
+    so a burst of saves is rendered once.
+
+    ``context`` is a :class:`replify.replify.Context`, which stays imported
+    between renders. When the content of its source file changes, it is
+    imported again and all the inputs are rendered; if that fails, the
+    error is written to ``stream`` and nothing is rendered until the file
+    changes again. Modules imported by the context are not watched.
+
+    ``watcher`` waits for changes; by default an :class:`InotifyWatcher`,
+    or a :class:`PollingWatcher` checking every ``interval`` seconds where
+    inotify is not available. Files written by ``render``, such as
+    documents rewritten in place, do not trigger another render. Runs until
+    ``stop``, a :class:`threading.Event`, is set, or until interrupted.
+    """
+    if watcher is None:
+        watcher = default_watcher()
+    files = _Files()
+
+    def scan():
+        inputs = [(path, relpath) for path, relpath in expand_inputs(patterns)
+                  if not _is_temporary(path)]
+        paths = [path for path, _ in inputs]
+        if context is not None and context.path is not None:
+            paths.append(context.path)
+        files.forget(set(paths))
+        return inputs, paths
+
+    inputs, paths = scan()
+    files.record(paths)
+    watcher.watch(_directories(patterns, paths))
+    render(inputs)
+    files.record([path for path, _ in inputs])
+    broken = False
+    try:
+        while stop is None or not stop.is_set():
+            if not watcher.wait(interval):
+                continue
+            inputs, paths = scan()
+            touched = files.touched(paths)
+            if not touched:
+                watcher.watch(_directories(patterns, paths))
+                continue
+            # wait until the files have been left alone for a while
+            quiet = timer() + debounce
+            while timer() < quiet:
+                watcher.wait(quiet - timer())
+                inputs, paths = scan()
+                more = files.touched(paths)
+                if more:
+                    touched |= more
+                    quiet = timer() + debounce
+            watcher.watch(_directories(patterns, paths))
+            changed = set(path for path in touched if files.changed(path))
+            if context is not None and context.path in changed:
+                try:
+                    context.load()
+                except Exception as err:
+                    broken = True
+                    if stream is not None:
+                        stream.write('{0}: {1}: {2}\n'.format(
+                            context.path, type(err).__name__, err))
+                    continue
+                broken = False
+                selected = inputs
+            elif broken:
+                continue
+            else:
+                selected = [(path, relpath) for path, relpath in inputs
+                            if path in changed]
+            if selected:
+                render(selected)
+                files.record([path for path, _ in selected])
+    finally:
+        watcher.close()
@@ -64,6 +64,12 @@ setup_args = dict(
 )
 
 
+if sys.version_info[0] < 3:
+    setup_args['install_requires'].extend([
+        'futures'
+    ])
+
+
 if sys.version_info[:2] < (2, 7):
     setup_args['install_requires'].extend([
         'argparse'